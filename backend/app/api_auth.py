@@ -1,10 +1,13 @@
 """Auth: register, login (JWT sub=user id), logout (blacklist)."""
-from fastapi import APIRouter, Depends, Form, HTTPException, status
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from jose import jwt
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .auth_cache import get_auth_cache, token_hash
 from .db import get_db_session
+from .metrics import TimedRoute
 from .models import BlacklistedToken, User
 from .schemas import Token, UserRead, UserRegister
 from .security import (
@@ -12,12 +15,12 @@ from .security import (
     get_current_user,
     get_jwt_algorithm,
     get_jwt_secret,
-    hash_password,
+    get_password_hasher,
     oauth2_scheme,
-    verify_password,
 )
+from .user_search import index_user
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
@@ -25,20 +28,23 @@ async def register(
     payload: UserRegister,
     db: AsyncSession = Depends(get_db_session),
 ) -> UserRead:
-    result = await db.execute(select(User).where(User.username == payload.username))
-    if result.scalar_one_or_none() is not None:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already exists")
-    result = await db.execute(select(User).where(User.email == payload.email))
-    if result.scalar_one_or_none() is not None:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
     user = User(
         username=payload.username,
         name=payload.name,
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=await get_password_hasher().hash(payload.password),
     )
     db.add(user)
-    await db.commit()
+    try:
+        await db.flush()
+        await index_user(db, user, replace=False)
+        await db.commit()
+    except IntegrityError:
+        # The unique constraints are the check; only a conflict pays for finding out which one.
+        await db.rollback()
+        result = await db.execute(select(User.username).where(User.username == payload.username))
+        detail = "Username already exists" if result.first() is not None else "Email already exists"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
     await db.refresh(user)
     return UserRead(
         id=user.id,
@@ -59,14 +65,21 @@ async def login(
 ) -> Token:
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
-    if user is None or not verify_password(password, user.password_hash):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await get_password_hasher().verify_and_update(password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash is not None:
+        user.password_hash = new_hash
+        await db.commit()
     access_token = create_access_token(data={"sub": str(user.id)})
     return Token(access_token=access_token, token_type="bearer")
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
 async def logout(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -74,7 +87,8 @@ async def logout(
     payload = jwt.decode(token, get_jwt_secret(), algorithms=[get_jwt_algorithm()])
     exp = payload.get("exp")
     expiration_time = int(exp) if exp is not None else None
-    blacklisted = BlacklistedToken(token=token[:512], expiration_time=expiration_time)
+    blacklisted = BlacklistedToken(token_hash=token_hash(token), expiration_time=expiration_time)
     db.add(blacklisted)
     await db.commit()
+    get_auth_cache(request).revoke(token, expiration_time)
     return None
@@ -1,14 +1,16 @@
 """Comments: POST /tweets/{id}/comments, GET /tweets/{id}/comments."""
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import desc, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import desc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db_session
+from .db import get_db_session, get_read_db_session
+from .metrics import TimedRoute
 from .models import Comment, Tweet, User
+from .responses import FastJSONResponse
 from .schemas import CommentCreate, CommentRead
 from .security import get_current_user
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 100
@@ -30,6 +32,11 @@ async def create_comment(
         contents=payload.contents,
     )
     db.add(comment)
+    await db.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(comment_count=Tweet.comment_count + 1, version=Tweet.version + 1)
+    )
     await db.commit()
     await db.refresh(comment)
     return CommentRead(
@@ -45,15 +52,15 @@ async def create_comment(
 @router.get("/{tweet_id}/comments", response_model=list[CommentRead])
 async def list_comments(
     tweet_id: int,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_db_session),
     limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
     before_id: int | None = Query(None),
-) -> list[CommentRead]:
-    result = await db.execute(select(Tweet).where(Tweet.id == tweet_id))
+) -> Response:
+    result = await db.execute(select(Tweet.id).where(Tweet.id == tweet_id))
     if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
     stmt = (
-        select(Comment, User.username)
+        select(Comment.id, Comment.user_id, User.username, Comment.tweet_id, Comment.contents, Comment.created_at)
         .join(User, User.id == Comment.user_id)
         .where(Comment.tweet_id == tweet_id)
         .order_by(desc(Comment.created_at), desc(Comment.id))
@@ -62,15 +69,5 @@ async def list_comments(
     if before_id is not None:
         stmt = stmt.where(Comment.id < before_id)
     result = await db.execute(stmt)
-    rows = result.all()
-    return [
-        CommentRead(
-            id=c.id,
-            user_id=c.user_id,
-            username=uname,
-            tweet_id=c.tweet_id,
-            contents=c.contents,
-            created_at=c.created_at,
-        )
-        for c, uname in rows
-    ]
+    # Columns are selected in CommentRead field order, so each row maps straight to a dict.
+    return FastJSONResponse([row._asdict() for row in result.all()])
@@ -1,16 +1,33 @@
-"""Feed: GET /feed — global feed excluding blocked users, cursor pagination."""
+"""Feed: GET /feed — home timeline (followed users and self, blocks excluded), cursor pagination, ETags;
+GET /feed/new-count — cheap "N new posts" probe; GET /feed/stream — live updates as server-sent events
+(see feed_stream)."""
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import and_, desc, func, or_, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db_session
-from .models import Block, Follow, Like, Tweet, User
-from .schemas import FeedResponse, TweetRead
+from .block_cache import get_block_cache
+from .conditional import (
+    compute_etag,
+    get_timeline_version,
+    if_none_match,
+    last_modified,
+    not_modified,
+    tweet_signature,
+    validator_headers,
+)
+from .db import get_db_session, get_read_db_session
+from .feed_stream import HubFull, feed_stream_enabled, get_feed_hub, load_followees, stream_events
+from .hydration import hydrate_tweet_dicts
+from .metrics import TimedRoute
+from .models import User
+from .responses import FastJSONResponse
+from .schemas import FeedNewCountResponse, FeedResponse
 from .security import get_current_user
+from .timeline import count_new_entries, get_new_count_max, read_home_timeline
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 100
@@ -18,95 +35,36 @@ MAX_LIMIT = 100
 
 @router.get("/feed", response_model=FeedResponse)
 async def get_feed(
-    db: AsyncSession = Depends(get_db_session),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db_session),
+    primary: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
     limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
     before_created_at: str | None = Query(None, description="Cursor: ISO timestamp"),
     before_id: int | None = Query(None, description="Cursor: tweet id tie-breaker"),
-) -> FeedResponse:
-    blocked_by_me = select(Block.blocked_id).where(Block.blocker_id == current_user.id)
-    blocking_me = select(Block.blocker_id).where(Block.blocked_id == current_user.id)
-
-    stmt = (
-        select(Tweet, User.username)
-        .join(User, User.id == Tweet.user_id)
-        .where(~Tweet.user_id.in_(blocked_by_me))
-        .where(~Tweet.user_id.in_(blocking_me))
-        .order_by(desc(Tweet.created_at), desc(Tweet.id))
-        .limit(limit + 1)
-    )
+) -> Response:
+    before = None
     if before_created_at is not None and before_id is not None:
         try:
-            before_ts = datetime.fromisoformat(before_created_at.replace("Z", "+00:00"))
+            before = (datetime.fromisoformat(before_created_at.replace("Z", "+00:00")), before_id)
         except ValueError:
-            before_ts = None
-        if before_ts is not None:
-            stmt = stmt.where(
-                or_(
-                    Tweet.created_at < before_ts,
-                    (Tweet.created_at == before_ts) & (Tweet.id < before_id),
-                )
-            )
-    result = await db.execute(stmt)
-    rows = result.all()
+            before = None
+    hidden = await get_block_cache(request).hidden_ids(primary, current_user.id)
+    rows = await read_home_timeline(db, current_user.id, limit, before, hidden)
     has_more = len(rows) > limit
     if has_more:
         rows = rows[:limit]
-    items: list[TweetRead] = []
-    for tweet, username in rows:
-        original_id = tweet.retweeted_from if tweet.retweeted_from is not None else tweet.id
-
-        retweeted_from_username = None
-        retweeted_from_text = None
-        if tweet.retweeted_from is not None:
-            orig = await db.execute(
-                select(Tweet, User.username)
-                .join(User, User.id == Tweet.user_id)
-                .where(Tweet.id == tweet.retweeted_from)
-            )
-            orig_row = orig.first()
-            if orig_row is not None:
-                orig_tweet, orig_username = orig_row
-                retweeted_from_username = orig_username
-                retweeted_from_text = orig_tweet.text
-
-        retweet_exists = await db.execute(
-            select(Tweet.id).where(
-                and_(
-                    Tweet.user_id == current_user.id,
-                    Tweet.retweeted_from == original_id,
-                )
-            )
-        )
-        retweeted_by_me = retweet_exists.first() is not None
-
-        like_count_result = await db.execute(
-            select(func.count()).select_from(Like).where(Like.tweet_id == tweet.id)
-        )
-        like_count = like_count_result.scalar() or 0
-        liked = await db.execute(
-            select(Like).where(
-                and_(Like.tweet_id == tweet.id, Like.user_id == current_user.id)
-            )
-        )
-        liked_by_me = liked.scalar_one_or_none() is not None
-        items.append(
-            TweetRead(
-                id=tweet.id,
-                text=tweet.text,
-                created_at=tweet.created_at,
-                user_id=tweet.user_id,
-                username=username,
-                retweeted_from=tweet.retweeted_from,
-                retweeted_from_username=retweeted_from_username,
-                retweeted_from_text=retweeted_from_text,
-                retweeted_by_me=retweeted_by_me,
-                like_count=like_count,
-                liked_by_me=liked_by_me,
-                sentiment_label=tweet.sentiment_label,
-                sentiment_score=tweet.sentiment_score,
-            )
-        )
+    etag = compute_etag(
+        "feed",
+        current_user.id,
+        await get_timeline_version(db, current_user.id),
+        (limit, before_created_at, before_id, has_more),
+        tweet_signature(rows),
+    )
+    modified = last_modified(rows)
+    if if_none_match(request, etag):
+        return not_modified(etag, modified)
+    items = await hydrate_tweet_dicts(db, rows, current_user.id)
     next_cursor = None
     if has_more and rows:
         last = rows[-1]
@@ -114,4 +72,58 @@ async def get_feed(
             "before_created_at": last[0].created_at.isoformat(),
             "before_id": last[0].id,
         }
-    return FeedResponse(items=items, next_cursor=next_cursor)
+    return FastJSONResponse(
+        {"items": items, "next_cursor": next_cursor}, headers=validator_headers(etag, modified)
+    )
+
+
+@router.get("/feed/new-count", response_model=FeedNewCountResponse)
+async def get_feed_new_count(
+    request: Request,
+    after_id: int = Query(..., description="Id of the newest tweet the client has"),
+    after_created_at: str | None = Query(None, description="Its ISO timestamp, used if that tweet was deleted"),
+    db: AsyncSession = Depends(get_read_db_session),
+    primary: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user),
+) -> FeedNewCountResponse:
+    after_ts = None
+    if after_created_at is not None:
+        try:
+            after_ts = datetime.fromisoformat(after_created_at.replace("Z", "+00:00"))
+        except ValueError:
+            after_ts = None
+    cap = get_new_count_max()
+    hidden = await get_block_cache(request).hidden_ids(primary, current_user.id)
+    count = await count_new_entries(db, current_user.id, after_id, after_ts, cap, hidden)
+    return FeedNewCountResponse(count=count, capped=count >= cap)
+
+
+@router.get("/feed/stream", response_class=StreamingResponse)
+async def feed_stream(
+    request: Request,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """Server-sent events: "tweet" (new tweets and retweets in the viewer's feed), "counts"
+    (like/retweet deltas on them) and "resync" (events were dropped; refetch GET /feed)."""
+    if not feed_stream_enabled():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    hub = get_feed_hub(request)
+    block_cache = get_block_cache(request)
+    followees = await load_followees(db, current_user.id)
+    hidden = await block_cache.hidden_ids(db, current_user.id)
+    # Give the connection back to the pool: the stream may stay open for hours.
+    await db.close()
+    try:
+        sub = hub.connect(current_user.id, followees, hidden)
+    except HubFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live connections",
+            headers={"Retry-After": "30"},
+        )
+    return StreamingResponse(
+        stream_events(hub, sub, db, block_cache),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,122 +1,61 @@
-"""Tweets: create, delete, feed (followed only, blocks, cursor), retweet/unretweet, like/unlike."""
-from datetime import datetime, timezone
-import json
+"""Tweets: create, delete, feed (followed only, blocks, cursor), retweet/unretweet, like/unlike, full-text search,
+batch lookup by id."""
 import logging
-import os
-from typing import Any, Tuple
+from typing import Any
 
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import and_, delete, desc, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, delete, desc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db_session
+from .batch import batch_ids
+from .block_cache import get_block_cache
+from .conditional import (
+    bump_timeline_version,
+    compute_etag,
+    get_timeline_version,
+    if_none_match,
+    last_modified,
+    not_modified,
+    set_validators,
+    tweet_signature,
+)
+from .db import get_db_session, get_read_db_session
+from .feed_stream import counts_event, feed_stream_enabled, publish_feed_event, tweet_event
+from .hydration import hydrate_tweet_dicts, hydrate_tweets
+from .metrics import TimedRoute
 from .models import Block, Follow, Like, Tweet, User
-from .schemas import FeedResponse, LikeResponse, SentimentPreviewRequest, SentimentPreviewResponse, TweetCreate, TweetRead
+from .responses import FastJSONResponse
+from .schemas import (
+    FeedResponse,
+    LikeResponse,
+    SentimentPreviewRequest,
+    SentimentPreviewResponse,
+    TweetBatchResponse,
+    TweetCreate,
+    TweetRead,
+    TweetSearchResponse,
+)
 from .security import get_current_user
+from .sentiment import sentiment_enabled
+from .sentiment_cache import get_sentiment_cache
+from .sentiment_worker import enqueue_sentiment, notify_sentiment_worker
+from .timeline import fan_out_tweet, remove_tweets
+from .tweet_search import index_tweet, search_tweets, unindex_tweets
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 logger = logging.getLogger(__name__)
 
 # Default and max page size for feed
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 100
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-# Use the public Gemini REST model name that supports generateContent.
-# You can override this via the GEMINI_MODEL env var if needed.
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
-
-
-async def analyze_sentiment_with_gemini(text: str) -> Tuple[str | None, float | None, str | None]:
-  """Call Gemini to analyze sentiment for the given text.
-
-  Returns (label, score, model) or (None, None, None) on failure or if not configured.
-  """
-  if not text:
-      return None, None, None
-  if not GEMINI_API_KEY:
-      logger.info("GEMINI_API_KEY not set; skipping sentiment analysis")
-      return None, None, None
-
-  system_instruction = (
-      "You are a sentiment analysis assistant. "
-      "Given a short social media post, respond with a single line of strict JSON in the form:\n"
-      '{"label": "positive" | "neutral" | "negative", "score": float}\n'
-      "Label should be the overall sentiment; score should be between -1.0 (very negative) and 1.0 (very positive). "
-      "Do not include any explanation or extra text."
-  )
-
-  payload = {
-      "contents": [
-          {
-              "parts": [
-                  {"text": system_instruction},
-                  {"text": f"Post:\n{text}"}
-              ]
-          }
-      ]
-  }
-
-  url = GEMINI_ENDPOINT.format(model=GEMINI_MODEL)
-  try:
-      async with httpx.AsyncClient(timeout=8.0) as client:
-          resp = await client.post(url, params={"key": GEMINI_API_KEY}, json=payload)
-      if resp.status_code != 200:
-          logger.error(
-              "Gemini sentiment request failed: status=%s body=%s",
-              resp.status_code,
-              resp.text[:500],
-          )
-          return None, None, None
-      data = resp.json()
-      candidates = data.get("candidates") or []
-      if not candidates:
-          logger.warning("Gemini sentiment response had no candidates: %s", data)
-          return None, None, None
-      parts = candidates[0].get("content", {}).get("parts") or []
-      if not parts:
-          logger.warning("Gemini sentiment candidate had no parts: %s", candidates[0])
-          return None, None, None
-      raw_text = parts[0].get("text", "").strip()
-
-      # Gemini sometimes wraps JSON in markdown code fences like ```json ... ```.
-      # Strip any leading/trailing fences before attempting to parse.
-      if raw_text.startswith("```"):
-          lines = raw_text.splitlines()
-          inner_lines: list[str] = []
-          for line in lines:
-              stripped = line.strip()
-              if stripped.startswith("```"):
-                  continue
-              inner_lines.append(line)
-          raw_text = "\n".join(inner_lines).strip()
-
-      try:
-          sentiment = json.loads(raw_text)
-      except json.JSONDecodeError as exc:
-          logger.error("Failed to parse Gemini sentiment JSON. raw_text=%r error=%s", raw_text, exc)
-          return None, None, None
-      label = str(sentiment.get("label")) if sentiment.get("label") is not None else None
-      score_value = sentiment.get("score")
-      try:
-          score = float(score_value) if score_value is not None else None
-      except (TypeError, ValueError):
-          logger.error("Gemini sentiment score was not a float: %r", score_value)
-          score = None
-      return label, score, GEMINI_MODEL
-  except Exception as exc:  # pragma: no cover - defensive
-      logger.exception("Error calling Gemini sentiment API: %s", exc)
-      return None, None, None
-
 
 @router.post("/sentiment-preview", response_model=SentimentPreviewResponse)
 async def sentiment_preview(
     payload: SentimentPreviewRequest,
     current_user: User = Depends(get_current_user),
 ) -> SentimentPreviewResponse:
-    label, score, model = await analyze_sentiment_with_gemini(payload.text)
+    label, score, model = await get_sentiment_cache().analyze(payload.text)
     return SentimentPreviewResponse(
         sentiment_label=label,
         sentiment_score=score,
@@ -126,78 +65,103 @@ async def sentiment_preview(
 
 @router.post("", response_model=TweetRead, status_code=status.HTTP_201_CREATED)
 async def create_tweet(
+    request: Request,
     payload: TweetCreate,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
 ) -> TweetRead:
     tweet = Tweet(user_id=current_user.id, text=payload.text or "")
     db.add(tweet)
+    await db.flush()
+    await fan_out_tweet(db, tweet.id, current_user)
+    await index_tweet(db, tweet)
+    if feed_stream_enabled():
+        await db.refresh(tweet, ["created_at"])
+        publish_feed_event(request, db, tweet_event(tweet, current_user.username))
+    # Sentiment is filled in later by the background worker; see sentiment_worker. Only queue
+    # when that worker runs (main.lifespan starts it under the same condition).
+    analyze = bool(tweet.text) and sentiment_enabled()
+    if analyze:
+        enqueue_sentiment(db, tweet.id)
     await db.commit()
     await db.refresh(tweet)
-
-    label, score, model = await analyze_sentiment_with_gemini(tweet.text or "")
-    if label is not None or score is not None:
-        tweet.sentiment_label = label
-        tweet.sentiment_score = score
-        tweet.sentiment_model = model
-        tweet.sentiment_analyzed_at = datetime.now(timezone.utc)
-        await db.commit()
-        await db.refresh(tweet)
+    if analyze:
+        notify_sentiment_worker()
 
     return _tweet_to_read(tweet, current_user.username, like_count=0, liked_by_me=False)
 
 
+@router.get("", response_model=TweetBatchResponse)
+async def get_tweets(
+    ids: list[int] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    """Hydrate many tweets at once: one page query plus hydration's fixed queries, keyed by id.
+
+    Items follow the requested order; ids that do not exist are listed under "missing".
+    """
+    result = await db.execute(select(Tweet, User.username).join(User, User.id == Tweet.user_id).where(Tweet.id.in_(ids)))
+    by_id = {tweet.id: (tweet, username) for tweet, username in result.all()}
+    rows = [by_id[i] for i in ids if i in by_id]
+    items = await hydrate_tweet_dicts(db, rows, current_user.id)
+    return FastJSONResponse(
+        {"items": {item["id"]: item for item in items}, "missing": [i for i in ids if i not in by_id]}
+    )
+
+
+@router.get("/search", response_model=TweetSearchResponse)
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    author: str | None = Query(None, description="Only tweets by this username"),
+    sentiment: str | None = Query(None, pattern="^(positive|negative|neutral)$"),
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    before_score: int | None = Query(None, description="Cursor: score of the last item"),
+    before_id: int | None = Query(None, description="Cursor: tweet id of the last item"),
+    db: AsyncSession = Depends(get_read_db_session),
+    primary: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user),
+) -> TweetSearchResponse:
+    author_id = None
+    if author is not None:
+        result = await db.execute(select(User.id).where(User.username == author))
+        author_id = result.scalar_one_or_none()
+        if author_id is None:
+            return TweetSearchResponse(items=[])
+    before = (before_score, before_id) if before_score is not None and before_id is not None else None
+    hidden = await get_block_cache(request).hidden_ids(primary, current_user.id)
+    rows = await search_tweets(db, q, current_user.id, limit, author_id, sentiment, before, hidden)
+    page = rows[:limit]
+    items = await hydrate_tweets(db, [(tweet, username) for tweet, username, _score in page], current_user.id)
+    next_cursor = None
+    if len(rows) > limit:
+        last_tweet, _username, last_score = page[-1]
+        next_cursor = {"before_score": last_score, "before_id": last_tweet.id}
+    return TweetSearchResponse(items=items, next_cursor=next_cursor)
+
+
 @router.get("/{tweet_id}", response_model=TweetRead)
 async def get_tweet(
+    request: Request,
+    response: Response,
     tweet_id: int,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_db_session),
     current_user: User = Depends(get_current_user),
-) -> TweetRead:
+) -> TweetRead | Response:
     result = await db.execute(select(Tweet, User.username).join(User, User.id == Tweet.user_id).where(Tweet.id == tweet_id))
     row = result.first()
     if row is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
-    tweet, username = row
-    original_id = tweet.retweeted_from if tweet.retweeted_from is not None else tweet.id
-    like_count_result = await db.execute(
-        select(func.count()).select_from(Like).where(Like.tweet_id == tweet.id)
-    )
-    like_count = like_count_result.scalar() or 0
-    liked = await db.execute(
-        select(Like).where(and_(Like.tweet_id == tweet.id, Like.user_id == current_user.id))
-    )
-    liked_by_me = liked.scalar_one_or_none() is not None
-    retweet_exists = await db.execute(
-        select(Tweet.id).where(
-            and_(
-                Tweet.user_id == current_user.id,
-                Tweet.retweeted_from == original_id,
-            )
-        )
-    )
-    retweeted_by_me = retweet_exists.first() is not None
-    retweeted_from_username = None
-    retweeted_from_text = None
-    if tweet.retweeted_from is not None:
-        orig = await db.execute(
-            select(Tweet, User.username)
-            .join(User, User.id == Tweet.user_id)
-            .where(Tweet.id == tweet.retweeted_from)
-        )
-        orig_row = orig.first()
-        if orig_row is not None:
-            orig_tweet, orig_username = orig_row
-            retweeted_from_username = orig_username
-            retweeted_from_text = orig_tweet.text
-    return _tweet_to_read(
-        tweet,
-        username,
-        like_count=like_count,
-        liked_by_me=liked_by_me,
-        retweeted_from_username=retweeted_from_username,
-        retweeted_from_text=retweeted_from_text,
-        retweeted_by_me=retweeted_by_me,
+    etag = compute_etag(
+        "tweet", current_user.id, await get_timeline_version(db, current_user.id), tweet_signature([row])
     )
+    modified = last_modified([row])
+    if if_none_match(request, etag):
+        return not_modified(etag, modified)
+    set_validators(response, etag, modified)
+    items = await hydrate_tweets(db, [row], current_user.id)
+    return items[0]
 
 
 @router.delete("/{tweet_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -210,12 +174,21 @@ async def delete_tweet(
     tweet = result.scalar_one_or_none()
     if tweet is None or tweet.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if tweet.retweeted_from is not None:
+        await db.execute(
+            update(Tweet)
+            .where(Tweet.id == tweet.retweeted_from)
+            .values(retweet_count=Tweet.retweet_count - 1, version=Tweet.version + 1)
+        )
+    await remove_tweets(db, [tweet_id])
+    await unindex_tweets(db, [tweet_id])
     await db.execute(delete(Tweet).where(Tweet.id == tweet_id))
     await db.commit()
 
 
 @router.post("/{tweet_id}/retweet", response_model=TweetRead, status_code=status.HTTP_201_CREATED)
 async def retweet(
+    request: Request,
     tweet_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -234,8 +207,14 @@ async def retweet(
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Already retweeted")
     retweet_row = Tweet(user_id=current_user.id, retweeted_from=tweet_id, text=None)
     db.add(retweet_row)
-    await db.commit()
-    await db.refresh(retweet_row)
+    await db.flush()
+    await db.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(retweet_count=Tweet.retweet_count + 1, version=Tweet.version + 1)
+    )
+    await bump_timeline_version(db, current_user.id)
+    await fan_out_tweet(db, retweet_row.id, current_user)
     # Include original tweet details so the frontend can render retweets without extra requests.
     orig = await db.execute(
         select(Tweet, User.username)
@@ -245,6 +224,16 @@ async def retweet(
     orig_row = orig.first()
     retweeted_from_username = orig_row[1] if orig_row is not None else None
     retweeted_from_text = orig_row[0].text if orig_row is not None else None
+    if feed_stream_enabled():
+        await db.refresh(retweet_row, ["created_at"])
+        publish_feed_event(
+            request,
+            db,
+            tweet_event(retweet_row, current_user.username, retweeted_from_username, retweeted_from_text),
+        )
+        publish_feed_event(request, db, counts_event(tweet_id, original.user_id, retweet_delta=1))
+    await db.commit()
+    await db.refresh(retweet_row)
     return _tweet_to_read(
         retweet_row,
         current_user.username,
@@ -258,28 +247,48 @@ async def retweet(
 
 @router.delete("/{tweet_id}/retweet", status_code=status.HTTP_204_NO_CONTENT)
 async def unretweet(
+    request: Request,
     tweet_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
 ) -> None:
+    retweet_ids = await db.execute(
+        select(Tweet.id).where(
+            and_(Tweet.user_id == current_user.id, Tweet.retweeted_from == tweet_id)
+        )
+    )
+    await remove_tweets(db, retweet_ids.scalars().all())
     result = await db.execute(
         delete(Tweet).where(
             and_(Tweet.user_id == current_user.id, Tweet.retweeted_from == tweet_id)
         )
     )
-    await db.commit()
     if result.rowcount == 0:
+        await db.commit()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Retweet not found")
+    await db.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(retweet_count=Tweet.retweet_count - result.rowcount, version=Tweet.version + 1)
+    )
+    await bump_timeline_version(db, current_user.id)
+    if feed_stream_enabled():
+        author_id = await db.scalar(select(Tweet.user_id).where(Tweet.id == tweet_id))
+        if author_id is not None:
+            publish_feed_event(request, db, counts_event(tweet_id, author_id, retweet_delta=-result.rowcount))
+    await db.commit()
 
 
 @router.post("/{tweet_id}/like", response_model=LikeResponse, status_code=status.HTTP_201_CREATED)
 async def like_tweet(
+    request: Request,
     tweet_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
 ) -> LikeResponse:
     result = await db.execute(select(Tweet).where(Tweet.id == tweet_id))
-    if result.scalar_one_or_none() is None:
+    tweet = result.scalar_one_or_none()
+    if tweet is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
     existing = await db.execute(
         select(Like).where(
@@ -290,19 +299,39 @@ async def like_tweet(
         return LikeResponse(tweet_id=tweet_id, liked=True)
     like = Like(tweet_id=tweet_id, user_id=current_user.id)
     db.add(like)
+    await db.flush()
+    await db.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(like_count=Tweet.like_count + 1, version=Tweet.version + 1)
+    )
+    await bump_timeline_version(db, current_user.id)
+    publish_feed_event(request, db, counts_event(tweet_id, tweet.user_id, like_delta=1))
     await db.commit()
     return LikeResponse(tweet_id=tweet_id, liked=True)
 
 
 @router.delete("/{tweet_id}/like", status_code=status.HTTP_204_NO_CONTENT)
 async def unlike_tweet(
+    request: Request,
     tweet_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
 ) -> None:
-    await db.execute(
+    result = await db.execute(
         delete(Like).where(and_(Like.tweet_id == tweet_id, Like.user_id == current_user.id))
     )
+    if result.rowcount:
+        await db.execute(
+            update(Tweet)
+            .where(Tweet.id == tweet_id)
+            .values(like_count=Tweet.like_count - 1, version=Tweet.version + 1)
+        )
+        await bump_timeline_version(db, current_user.id)
+        if feed_stream_enabled():
+            author_id = await db.scalar(select(Tweet.user_id).where(Tweet.id == tweet_id))
+            if author_id is not None:
+                publish_feed_event(request, db, counts_event(tweet_id, author_id, like_delta=-1))
     await db.commit()
 
 
@@ -327,6 +356,8 @@ def _tweet_to_read(
         retweeted_by_me=retweeted_by_me,
         like_count=like_count,
         liked_by_me=liked_by_me,
+        retweet_count=tweet.retweet_count,
+        comment_count=tweet.comment_count,
         sentiment_label=tweet.sentiment_label,
         sentiment_score=tweet.sentiment_score,
     )
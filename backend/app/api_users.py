@@ -1,14 +1,44 @@
-"""Users: profile GET, update profile PUT /users/me, follow/unfollow, block/unblock."""
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import and_, delete, desc, select
+"""Users: profile GET, update profile PUT /users/me, follow/unfollow, block/unblock, batch relationship lookup."""
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import DateTime, and_, delete, desc, exists, func, literal, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db_session
+from .auth_cache import get_auth_cache
+from .batch import batch_ids
+from .block_cache import CHANNEL as BLOCKS_CHANNEL
+from .block_cache import get_block_cache
+from .conditional import (
+    bump_retweets_of_author,
+    compute_etag,
+    if_none_match,
+    last_modified,
+    not_modified,
+    tweet_signature,
+    validator_headers,
+)
+from .db import get_db_session, get_read_db_session
+from .feed_stream import publish_follow
+from .hydration import hydrate_tweet_dicts
+from .metrics import TimedRoute
 from .models import Block, Follow, Tweet, User
-from .schemas import FollowResponse, TweetRead, UserRead, UserReadMinimal, UserUpdate
+from .pubsub import get_pubsub
+from .responses import FastJSONResponse
+from .schemas import (
+    FollowResponse,
+    ProfileResponse,
+    RelationshipsResponse,
+    UserRead,
+    UserReadMinimal,
+    UserUpdate,
+)
 from .security import get_current_user, get_current_user_optional
+from .timeline import backfill_author, remove_author
+from .user_search import index_user
+from .user_search import search_users as search_users_index
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 100
@@ -31,22 +61,46 @@ async def get_me(current_user: User = Depends(get_current_user)) -> UserRead:
 async def search_users(
     q: str = Query(..., min_length=1, max_length=50),
     limit: int = Query(20, ge=1, le=50),
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_db_session),
 ) -> list[UserReadMinimal]:
-    like_pattern = f"%{q}%"
-    stmt = (
-        select(User)
-        .where(User.username.ilike(like_pattern))
-        .order_by(User.username.asc())
-        .limit(limit)
+    users = await search_users_index(db, q, limit)
+    return [UserReadMinimal(id=u.id, username=u.username, name=u.name, bio=u.bio) for u in users]
+
+
+@router.get("/relationships", response_model=RelationshipsResponse)
+async def get_relationships(
+    request: Request,
+    ids: list[int] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_read_db_session),
+    primary: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    """The viewer's profile relationship flags for many users, keyed by user id.
+
+    Two queries (existence, follows); block flags come from the viewer's cached block sets.
+    """
+    result = await db.execute(select(User.id).where(User.id.in_(ids)))
+    found = set(result.scalars().all())
+    result = await db.execute(
+        select(Follow.followee_id).where(Follow.follower_id == current_user.id, Follow.followee_id.in_(ids))
     )
-    result = await db.execute(stmt)
-    users = result.scalars().all()
-    return [UserReadMinimal(id=u.id, username=u.username) for u in users]
+    following = set(result.scalars().all())
+    blocks = await get_block_cache(request).get(primary, current_user.id)
+    items = {
+        i: {
+            "is_following": i in following,
+            "is_blocked_by_me": i in blocks.blocking,
+            "has_blocked_me": i in blocks.blocked_by,
+        }
+        for i in ids
+        if i in found
+    }
+    return FastJSONResponse({"items": items, "missing": [i for i in ids if i not in found]})
 
 
 @router.put("/me", response_model=UserRead)
 async def update_profile(
+    request: Request,
     payload: UserUpdate,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -59,6 +113,8 @@ async def update_profile(
         )
         if result.scalar_one_or_none() is not None:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username taken")
+        if payload.username != current_user.username:
+            await bump_retweets_of_author(db, current_user.id)
         current_user.username = payload.username
     if payload.bio is not None:
         current_user.bio = payload.bio
@@ -66,7 +122,10 @@ async def update_profile(
         current_user.profile_picture = payload.profile_picture
     if payload.name is not None:
         current_user.name = payload.name
+    if payload.username is not None or payload.name is not None:
+        await index_user(db, current_user)
     await db.commit()
+    get_auth_cache(request).invalidate_user(current_user.id)
     await db.refresh(current_user)
     return UserRead(
         id=current_user.id,
@@ -79,14 +138,17 @@ async def update_profile(
     )
 
 
-@router.get("/{username}", response_model=dict)
+@router.get("/{username}", response_model=ProfileResponse)
 async def get_profile(
+    request: Request,
     username: str,
-    db: AsyncSession = Depends(get_db_session),
+    db: AsyncSession = Depends(get_read_db_session),
+    primary: AsyncSession = Depends(get_db_session),
     current_user: User | None = Depends(get_current_user_optional),
     limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
-    before_id: int | None = Query(None),
-) -> dict:
+    before_created_at: str | None = Query(None, description="Cursor: ISO timestamp"),
+    before_id: int | None = Query(None, description="Cursor: tweet id tie-breaker"),
+) -> Response:
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
     if user is None:
@@ -94,31 +156,20 @@ async def get_profile(
     is_following = False
     is_blocked_by_me = False
     has_blocked_me = False
+    viewer_version = 0
     if current_user is not None:
+        # Follow flag and the viewer's timeline version in one round trip; block flags are cached.
         r = await db.execute(
-            select(Follow).where(
-                and_(
-                    Follow.follower_id == current_user.id,
-                    Follow.followee_id == user.id,
-                )
+            select(
+                exists().where(Follow.follower_id == current_user.id, Follow.followee_id == user.id),
+                select(User.timeline_version).where(User.id == current_user.id).scalar_subquery(),
             )
         )
-        is_following = r.scalar_one_or_none() is not None
-
-        # Determine block relationship between the viewing user and the profile user.
-        rb = await db.execute(
-            select(Block).where(
-                and_(Block.blocker_id == current_user.id, Block.blocked_id == user.id)
-            )
-        )
-        is_blocked_by_me = rb.scalar_one_or_none() is not None
-
-        rb2 = await db.execute(
-            select(Block).where(
-                and_(Block.blocker_id == user.id, Block.blocked_id == current_user.id)
-            )
-        )
-        has_blocked_me = rb2.scalar_one_or_none() is not None
+        following, viewer_version = r.one()
+        blocks = await get_block_cache(request).get(primary, current_user.id)
+        is_following = bool(following)
+        is_blocked_by_me = user.id in blocks.blocking
+        has_blocked_me = user.id in blocks.blocked_by
     stmt = (
         select(Tweet)
         .where(Tweet.user_id == user.id)
@@ -126,54 +177,63 @@ async def get_profile(
         .limit(limit + 1)
     )
     if before_id is not None:
-        stmt = stmt.where(Tweet.id < before_id)
-    result = await db.execute(stmt)
-    tweets = result.scalars().all()
-    has_more = len(tweets) > limit
-    if has_more:
-        tweets = list(tweets)[:limit]
-    items: list[TweetRead] = []
-    for t in tweets:
-        retweeted_from_username = None
-        retweeted_from_text = None
-        if t.retweeted_from is not None:
-            orig = await db.execute(
-                select(Tweet, User.username)
-                .join(User, User.id == Tweet.user_id)
-                .where(Tweet.id == t.retweeted_from)
-            )
-            orig_row = orig.first()
-            if orig_row is not None:
-                orig_tweet, orig_username = orig_row
-                retweeted_from_username = orig_username
-                retweeted_from_text = orig_tweet.text
-        items.append(
-            TweetRead(
-                id=t.id,
-                text=t.text,
-                created_at=t.created_at,
-                user_id=t.user_id,
-                username=user.username,
-                retweeted_from=t.retweeted_from,
-                retweeted_from_username=retweeted_from_username,
-                retweeted_from_text=retweeted_from_text,
-                like_count=0,
-                liked_by_me=False,
-                sentiment_label=t.sentiment_label,
-                sentiment_score=t.sentiment_score,
+        # Compare against the cursor tweet's stored created_at when it still exists, so the
+        # (created_at, id) keyset is exact on every dialect; fall back to the client's timestamp,
+        # and to plain id order when the tweet is gone and no timestamp was sent.
+        fallback_ts = None
+        if before_created_at is not None:
+            try:
+                fallback_ts = datetime.fromisoformat(before_created_at.replace("Z", "+00:00"))
+            except ValueError:
+                fallback_ts = None
+        cursor_ts = func.coalesce(
+            select(Tweet.created_at).where(Tweet.id == before_id).scalar_subquery(),
+            literal(fallback_ts, DateTime),
+        )
+        stmt = stmt.where(
+            or_(
+                Tweet.created_at < cursor_ts,
+                and_(Tweet.created_at == cursor_ts, Tweet.id < before_id),
+                and_(cursor_ts.is_(None), Tweet.id < before_id),
             )
         )
-    return {
-        "user": UserReadMinimal(id=user.id, username=user.username, bio=user.bio, name=user.name),
-        "tweets": items,
-        "is_following": is_following,
-        "is_blocked_by_me": is_blocked_by_me,
-        "has_blocked_me": has_blocked_me,
-    }
+    result = await db.execute(stmt)
+    tweets = list(result.scalars().all())
+    has_more = len(tweets) > limit
+    tweets = tweets[:limit]
+    rows = [(t, user.username) for t in tweets]
+    etag = compute_etag(
+        "profile",
+        current_user.id if current_user is not None else None,
+        viewer_version,
+        (user.id, user.username, user.name, user.bio),
+        (is_following, is_blocked_by_me, has_blocked_me),
+        (limit, before_created_at, before_id, has_more),
+        tweet_signature(rows),
+    )
+    modified = last_modified(rows)
+    if if_none_match(request, etag):
+        return not_modified(etag, modified)
+    items = await hydrate_tweet_dicts(db, rows, current_user.id if current_user is not None else None)
+    next_cursor = None
+    if has_more and tweets:
+        next_cursor = {"before_created_at": tweets[-1].created_at.isoformat(), "before_id": tweets[-1].id}
+    return FastJSONResponse(
+        {
+            "user": {"id": user.id, "username": user.username, "bio": user.bio, "name": user.name},
+            "tweets": items,
+            "is_following": is_following,
+            "is_blocked_by_me": is_blocked_by_me,
+            "has_blocked_me": has_blocked_me,
+            "next_cursor": next_cursor,
+        },
+        headers=validator_headers(etag, modified),
+    )
 
 
 @router.post("/{user_id}/follow", response_model=FollowResponse)
 async def follow_user(
+    request: Request,
     user_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -181,7 +241,8 @@ async def follow_user(
     if user_id == current_user.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot follow self")
     result = await db.execute(select(User).where(User.id == user_id))
-    if result.scalar_one_or_none() is None:
+    followee = result.scalar_one_or_none()
+    if followee is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     existing = await db.execute(
         select(Follow).where(
@@ -194,12 +255,19 @@ async def follow_user(
     if existing.scalar_one_or_none() is not None:
         return FollowResponse(follower_id=current_user.id, followed_id=user_id)
     db.add(Follow(follower_id=current_user.id, followee_id=user_id))
+    await db.execute(
+        update(User).where(User.id == user_id).values(follower_count=User.follower_count + 1)
+    )
+    await backfill_author(db, current_user.id, followee)
+    publish_follow(request, db, current_user.id, user_id, following=True)
     await db.commit()
+    get_auth_cache(request).invalidate_user(user_id)
     return FollowResponse(follower_id=current_user.id, followed_id=user_id)
 
 
 @router.delete("/{user_id}/follow", status_code=status.HTTP_204_NO_CONTENT)
 async def unfollow_user(
+    request: Request,
     user_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -212,13 +280,21 @@ async def unfollow_user(
             )
         )
     )
-    await db.commit()
     if result.rowcount == 0:
+        await db.commit()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not following")
+    await db.execute(
+        update(User).where(User.id == user_id).values(follower_count=User.follower_count - 1)
+    )
+    await remove_author(db, current_user.id, user_id)
+    publish_follow(request, db, current_user.id, user_id, following=False)
+    await db.commit()
+    get_auth_cache(request).invalidate_user(user_id)
 
 
 @router.post("/{user_id}/block", status_code=status.HTTP_204_NO_CONTENT)
 async def block_user(
+    request: Request,
     user_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -236,12 +312,16 @@ async def block_user(
     if existing.scalar_one_or_none() is not None:
         return None
     db.add(Block(blocker_id=current_user.id, blocked_id=user_id))
+    await remove_author(db, current_user.id, user_id)
+    await remove_author(db, user_id, current_user.id)
+    get_pubsub(request).publish(db, BLOCKS_CHANNEL, {"users": [current_user.id, user_id]})
     await db.commit()
     return None
 
 
 @router.delete("/{user_id}/block", status_code=status.HTTP_204_NO_CONTENT)
 async def unblock_user(
+    request: Request,
     user_id: int,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user),
@@ -251,6 +331,24 @@ async def unblock_user(
             and_(Block.blocker_id == current_user.id, Block.blocked_id == user_id)
         )
     )
-    await db.commit()
     if result.rowcount == 0:
+        await db.commit()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Block not found")
+    # Restore timelines for any follow relationship the block had hidden.
+    follows = await db.execute(
+        select(Follow).where(
+            or_(
+                and_(Follow.follower_id == current_user.id, Follow.followee_id == user_id),
+                and_(Follow.follower_id == user_id, Follow.followee_id == current_user.id),
+            )
+        )
+    )
+    for follow in follows.scalars().all():
+        if follow.follower_id == current_user.id:
+            other = await db.get(User, user_id)
+            if other is not None:
+                await backfill_author(db, current_user.id, other)
+        else:
+            await backfill_author(db, user_id, current_user)
+    get_pubsub(request).publish(db, BLOCKS_CHANNEL, {"users": [current_user.id, user_id]})
+    await db.commit()
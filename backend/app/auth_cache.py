@@ -0,0 +1,149 @@
+"""In-process auth cache so authenticated requests can skip the blacklist and users lookups.
+
+Three parts, all keyed by sha256(token) so raw tokens are never kept in memory longer than needed:
+- revoked token hashes: logout adds to it directly; other workers pick revocations up from
+  blacklisted_tokens at most AUTH_CACHE_SYNC_SECONDS later (one query per interval, not per request);
+- decoded claims (user id + exp) with a short TTL, so the JWT is not re-verified on every request;
+- user rows as detached snapshots, merged into the request's session without a SELECT.
+  update_profile and follow/unfollow invalidate them; other workers see changes after the TTL.
+
+One AuthCache lives on app.state (created in main.create_app).
+"""
+import asyncio
+from collections import OrderedDict
+import hashlib
+import os
+import time
+from typing import Any
+
+from fastapi import Request
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from .models import BlacklistedToken, User
+
+
+def get_sync_seconds() -> float:
+    return float(os.getenv("AUTH_CACHE_SYNC_SECONDS", "5"))
+
+
+def get_claims_ttl_seconds() -> float:
+    return float(os.getenv("AUTH_CACHE_CLAIMS_TTL_SECONDS", "60"))
+
+
+def get_user_ttl_seconds() -> float:
+    return float(os.getenv("AUTH_CACHE_USER_TTL_SECONDS", "30"))
+
+
+def get_max_entries() -> int:
+    return int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class AuthCache:
+    def __init__(
+        self,
+        sync_seconds: float | None = None,
+        claims_ttl_seconds: float | None = None,
+        user_ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+    ) -> None:
+        self._sync_seconds = sync_seconds if sync_seconds is not None else get_sync_seconds()
+        self._claims_ttl = claims_ttl_seconds if claims_ttl_seconds is not None else get_claims_ttl_seconds()
+        self._user_ttl = user_ttl_seconds if user_ttl_seconds is not None else get_user_ttl_seconds()
+        self._max_entries = max_entries if max_entries is not None else get_max_entries()
+        # token hash -> exp (unix seconds, None if the token had no exp)
+        self._revoked: dict[str, int | None] = {}
+        self._synced_at: float | None = None
+        self._sync_lock = asyncio.Lock()
+        # token hash -> (cached at, user id, exp)
+        self._claims: OrderedDict[str, tuple[float, int, int | None]] = OrderedDict()
+        # user id -> (cached at, column values)
+        self._users: OrderedDict[int, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    # Revocations
+
+    def needs_sync(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at >= self._sync_seconds
+
+    async def sync(self, db: AsyncSession) -> None:
+        """Merge unexpired blacklisted tokens from the database and drop expired ones.
+
+        Until the first sync has finished the revoked set is empty, so concurrent callers wait for
+        it; afterwards they go ahead with the current set while one refresh is in flight.
+        """
+        if self._sync_lock.locked() and self._synced_at is not None:
+            return
+        async with self._sync_lock:
+            if not self.needs_sync():
+                return
+            now = int(time.time())
+            result = await db.execute(
+                select(BlacklistedToken.token_hash, BlacklistedToken.expiration_time).where(
+                    or_(BlacklistedToken.expiration_time.is_(None), BlacklistedToken.expiration_time >= now)
+                )
+            )
+            self._revoked.update((h, exp) for h, exp in result.all())
+            self._revoked = {h: exp for h, exp in self._revoked.items() if exp is None or exp >= now}
+            self._synced_at = time.monotonic()
+
+    def revoke(self, token: str, exp: int | None) -> None:
+        key = token_hash(token)
+        self._revoked[key] = exp
+        self._claims.pop(key, None)
+
+    def is_revoked(self, token: str) -> bool:
+        return token_hash(token) in self._revoked
+
+    # Claims
+
+    def get_claims(self, token: str) -> int | None:
+        """Cached user id for a verified, unexpired token, or None."""
+        key = token_hash(token)
+        entry = self._claims.get(key)
+        if entry is None:
+            return None
+        cached_at, user_id, exp = entry
+        if time.monotonic() - cached_at > self._claims_ttl or (exp is not None and exp <= time.time()):
+            del self._claims[key]
+            return None
+        return user_id
+
+    def put_claims(self, token: str, user_id: int, exp: int | None) -> None:
+        key = token_hash(token)
+        self._claims[key] = (time.monotonic(), user_id, exp)
+        self._claims.move_to_end(key)
+        while len(self._claims) > self._max_entries:
+            self._claims.popitem(last=False)
+
+    # User rows
+
+    async def get_user(self, db: AsyncSession, user_id: int) -> User | None:
+        """Attach the user to `db`, from the snapshot when fresh, else with one SELECT."""
+        entry = self._users.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] <= self._user_ttl:
+            snapshot = User(**entry[1])
+            make_transient_to_detached(snapshot)
+            return await db.merge(snapshot, load=False)
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if user is not None:
+            self._users[user_id] = (
+                time.monotonic(),
+                {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs},
+            )
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._max_entries:
+                self._users.popitem(last=False)
+        return user
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._users.pop(user_id, None)
+
+
+def get_auth_cache(request: Request) -> AuthCache:
+    return request.app.state.auth_cache
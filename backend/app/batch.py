@@ -0,0 +1,26 @@
+"""Shared ?ids= parsing for the batch lookup endpoints (GET /tweets?ids=, GET /users/relationships?ids=)."""
+from fastapi import HTTPException, Query, status
+
+MAX_BATCH_IDS = 500
+
+
+def batch_ids(
+    ids: str = Query(..., min_length=1, description=f"Comma-separated ids, at most {MAX_BATCH_IDS}"),
+) -> list[int]:
+    """Parse "1,2,3" into distinct ints, keeping the caller's order."""
+    parsed: dict[int, None] = {}
+    for part in ids.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            parsed[int(part)] = None
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid id: {part[:20]}")
+    if not parsed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No ids given")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BATCH_IDS} ids per request"
+        )
+    return list(parsed)
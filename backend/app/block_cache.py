@@ -0,0 +1,107 @@
+"""In-process block graph: for each active user, who they block and who blocks them.
+
+Loaded lazily with one query per user, kept for BLOCK_CACHE_TTL_SECONDS (LRU-bounded by
+BLOCK_CACHE_MAX_ENTRIES). block_user/unblock_user publish on the "blocks" pubsub channel, which
+drops both users' entries here on commit and on other workers at their next pubsub poll; the TTL
+only bounds staleness if a message is lost. Most users block nobody, so read paths can skip
+block filtering entirely when hidden_ids() is empty.
+
+Pass the primary session (get_db_session), also on read-only endpoints: an entry reloaded from a
+lagging replica right after a block would be cached without it for the whole TTL.
+
+One BlockCache lives on app.state (created in main.create_app).
+"""
+from collections import OrderedDict
+from collections.abc import Iterable
+import os
+import time
+from typing import Any
+
+from fastapi import Request
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Block
+
+CHANNEL = "blocks"
+
+EMPTY: frozenset[int] = frozenset()
+
+
+def get_ttl_seconds() -> float:
+    return float(os.getenv("BLOCK_CACHE_TTL_SECONDS", "300"))
+
+
+def get_max_entries() -> int:
+    return int(os.getenv("BLOCK_CACHE_MAX_ENTRIES", "10000"))
+
+
+class BlockSets:
+    __slots__ = ("blocking", "blocked_by", "hidden")
+
+    def __init__(self, blocking: frozenset[int], blocked_by: frozenset[int]) -> None:
+        self.blocking = blocking
+        self.blocked_by = blocked_by
+        # Users whose content this user must not see (and who must not see theirs).
+        self.hidden = blocking | blocked_by
+
+
+class BlockCache:
+    def __init__(self, ttl_seconds: float | None = None, max_entries: int | None = None) -> None:
+        self._ttl = ttl_seconds if ttl_seconds is not None else get_ttl_seconds()
+        self._max_entries = max_entries if max_entries is not None else get_max_entries()
+        # user id -> (cached at, sets)
+        self._entries: OrderedDict[int, tuple[float, BlockSets]] = OrderedDict()
+        # Invalidation generations: a load that started before the user's last invalidation may
+        # predate a block, so it is returned but not cached. _invalidated maps user id -> generation
+        # of their last invalidation; past max_entries it is cleared, and loads started before
+        # that point are not cached either.
+        self._generation = 0
+        self._invalidated: dict[int, int] = {}
+        self._pruned_at = 0
+
+    async def get(self, db: AsyncSession, user_id: int) -> BlockSets:
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] <= self._ttl:
+            self._entries.move_to_end(user_id)
+            return entry[1]
+        started = self._generation
+        result = await db.execute(
+            select(Block.blocker_id, Block.blocked_id).where(
+                or_(Block.blocker_id == user_id, Block.blocked_id == user_id)
+            )
+        )
+        blocking: set[int] = set()
+        blocked_by: set[int] = set()
+        for blocker_id, blocked_id in result.all():
+            if blocker_id == user_id:
+                blocking.add(blocked_id)
+            else:
+                blocked_by.add(blocker_id)
+        sets = BlockSets(frozenset(blocking) or EMPTY, frozenset(blocked_by) or EMPTY)
+        if self._invalidated.get(user_id, 0) > started or self._pruned_at > started:
+            return sets
+        self._entries[user_id] = (time.monotonic(), sets)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return sets
+
+    async def hidden_ids(self, db: AsyncSession, user_id: int) -> frozenset[int]:
+        return (await self.get(db, user_id)).hidden
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        self._generation += 1
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+            self._invalidated[user_id] = self._generation
+        if len(self._invalidated) > self._max_entries:
+            self._invalidated.clear()
+            self._pruned_at = self._generation
+
+    def on_message(self, message: dict[str, Any]) -> None:
+        self.invalidate(int(i) for i in message.get("users", []))
+
+
+def get_block_cache(request: Request) -> BlockCache:
+    return request.app.state.block_cache
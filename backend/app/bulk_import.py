@@ -0,0 +1,334 @@
+"""Bulk-load users, tweets, follows, blocks, likes and comments from CSV or NDJSON files.
+
+Usage: python -m app.bulk_import --users users.csv --tweets tweets.ndjson.gz --follows follows.csv
+           [--likes ...] [--comments ...] [--blocks ...] [--batch-size 5000] [--drop-indexes] [--skip-derived]
+
+Files are read as streams and written in --batch-size chunks (one transaction per chunk), so
+memory stays bounded whatever the input size. Chunks go through executemany, or COPY when the
+database is PostgreSQL on asyncpg. Format comes from the extension (.csv, .ndjson/.jsonl,
+optionally .gz); "-" reads CSV from stdin. Column names are the table's column names; the
+header (CSV) or the first record (NDJSON) fixes the column set for the whole file: later records
+may leave keys out (NULL) but not add new ones.
+
+Users must carry a precomputed password_hash (any scheme passlib's pwd_context recognizes, e.g.
+from `python -c "from app.security import hash_password; print(hash_password('...'))"`); plain
+passwords are rejected rather than hashed here. Tables load in foreign-key order, and retweets
+must come after the tweets they point at. Rows with explicit ids keep them; PostgreSQL sequences
+are moved past the imported ids afterwards.
+
+--drop-indexes drops the non-unique secondary indexes of the tables being loaded and recreates
+them at the end; worth it for large loads into empty or small tables. Afterwards (unless
+--skip-derived) tweet counters, follower counts, home timelines and both search indexes are
+rebuilt, as python -m app.counters / app.timeline rebuild / app.user_search rebuild /
+app.tweet_search rebuild would.
+"""
+import argparse
+import asyncio
+from collections.abc import Callable, Iterator
+import csv
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import gzip
+import io
+import json
+from pathlib import Path
+import sys
+import time
+from typing import IO, Any
+
+from sqlalchemy import DateTime, Float, Index, Integer, Table, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, async_sessionmaker
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from . import db as db_module
+from . import tweet_search, user_search
+from .counters import reconcile_counters
+from .models import Block, Comment, Follow, Like, Tweet, User
+from .security import pwd_context
+from .timeline import rebuild_timelines
+
+DEFAULT_BATCH_SIZE = 5000
+PROGRESS_SECONDS = 5.0
+
+# Load order respects foreign keys.
+TABLES: dict[str, Table] = {
+    "users": User.__table__,
+    "tweets": Tweet.__table__,
+    "follows": Follow.__table__,
+    "blocks": Block.__table__,
+    "likes": Like.__table__,
+    "comments": Comment.__table__,
+}
+
+
+class BulkImportError(ValueError):
+    """Bad input: unknown column, unparsable value or missing password hash (reported with file and line)."""
+
+
+@dataclass
+class TableStats:
+    table: str
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def _parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    # Stored naive in UTC, like func.now() defaults.
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _converter(column: Any) -> Callable[[Any], Any]:
+    if isinstance(column.type, DateTime):
+        return _parse_datetime
+    if isinstance(column.type, Integer):
+        return int
+    if isinstance(column.type, Float):
+        return float
+    return str
+
+
+def _open(path: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    suffix = Path(name).suffix.lower()
+    if suffix in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if suffix == ".csv" or path == "-":
+        return "csv"
+    raise BulkImportError(f"{path}: unknown format (use .csv, .ndjson or .jsonl, optionally .gz)")
+
+
+def read_records(path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """(line number, record) for each row of a CSV or NDJSON file, streamed."""
+    fmt = _format(path)
+    stream = _open(path)
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def read_rows(table: Table, path: str) -> Iterator[tuple]:
+    """The column names, then one typed tuple per record; empty CSV cells and missing keys become NULL."""
+    columns: list[str] | None = None
+    converters: list[Callable[[Any], Any]] = []
+    for line_no, record in read_records(path):
+        if columns is None:
+            columns = list(record)
+            unknown = [name for name in columns if name not in table.c]
+            if unknown:
+                raise BulkImportError(f"{path}: unknown {table.name} columns {unknown}")
+            converters = [_converter(table.c[name]) for name in columns]
+            yield tuple(columns)
+        elif record.keys() - set(columns):
+            raise BulkImportError(f"{path}:{line_no}: fields {sorted(map(str, record.keys() - set(columns)))} not in the first record")
+        values = []
+        for name, convert in zip(columns, converters):
+            value = record.get(name)
+            if value is None or value == "":
+                values.append(None)
+                continue
+            try:
+                values.append(convert(value))
+            except (TypeError, ValueError) as exc:
+                raise BulkImportError(f"{path}:{line_no}: bad {name} {value!r}: {exc}") from None
+        if table.name == "users":
+            _check_password_hash(path, line_no, dict(zip(columns, values)))
+        yield tuple(values)
+
+
+def _check_password_hash(path: str, line_no: int, row: dict[str, Any]) -> None:
+    hashed = row.get("password_hash")
+    if not hashed or pwd_context.identify(hashed) is None:
+        raise BulkImportError(f"{path}:{line_no}: password_hash must be a precomputed passlib hash")
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    chunk: list[tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _uses_copy(conn: AsyncConnection) -> bool:
+    return conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg"
+
+
+async def _write_chunk(conn: AsyncConnection, table: Table, columns: list[str], chunk: list[tuple]) -> None:
+    if _uses_copy(conn):
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=chunk, columns=columns)
+    else:
+        await conn.execute(insert(table), [dict(zip(columns, row)) for row in chunk])
+
+
+async def load_table(
+    conn: AsyncConnection, table: Table, path: str, batch_size: int = DEFAULT_BATCH_SIZE
+) -> TableStats:
+    """Stream one file into `table`, committing after each chunk."""
+    stats = TableStats(table.name)
+    started = last_report = time.perf_counter()
+    rows = read_rows(table, path)
+    columns = list(next(rows, ()))
+    for chunk in _chunks(rows, batch_size):
+        await _write_chunk(conn, table, columns, chunk)
+        await conn.commit()
+        stats.rows += len(chunk)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_SECONDS:
+            last_report = now
+            print(f"  {table.name}: {stats.rows} rows, {stats.rows / (now - started):.0f} rows/s", file=sys.stderr)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def secondary_indexes(tables: list[Table]) -> list[Index]:
+    """Non-unique indexes; primary keys and unique indexes stay, so duplicates still fail fast."""
+    return [index for table in tables for index in sorted(table.indexes, key=lambda i: i.name) if not index.unique]
+
+
+async def _reset_sequences(conn: AsyncConnection, tables: list[Table]) -> None:
+    """Move PostgreSQL id sequences past explicitly imported ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        if "id" in table.c and table.c.id.autoincrement is True:
+            await conn.execute(
+                text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 1)) FROM {table.name}")
+            )
+    await conn.commit()
+
+
+async def rebuild_derived(engine: AsyncEngine, loaded: set[str]) -> dict[str, float]:
+    """Recompute what the API maintains incrementally on writes. Returns seconds per step."""
+    timings: dict[str, float] = {}
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    steps = []
+    if loaded & {"tweets", "likes", "comments"}:
+        steps.append(("counters", reconcile_counters))
+    if loaded & {"users", "tweets", "follows", "blocks"}:
+        steps.append(("timelines", rebuild_timelines))
+    if "users" in loaded:
+        steps.append(("user_search", user_search.rebuild_index))
+    if "tweets" in loaded:
+        steps.append(("tweet_search", tweet_search.rebuild_index))
+    for name, step in steps:
+        started = time.perf_counter()
+        async with session_factory() as db:
+            await step(db)
+            await db.commit()
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+async def run_import(
+    engine: AsyncEngine,
+    sources: dict[str, str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    drop_indexes: bool = False,
+    derived: bool = True,
+) -> dict[str, Any]:
+    """Load `sources` ({table name: path}) in foreign-key order. Returns per-table stats and timings."""
+    unknown = set(sources) - set(TABLES)
+    if unknown:
+        raise BulkImportError(f"unknown tables {sorted(unknown)}")
+    tables = [TABLES[name] for name in TABLES if name in sources]
+    started = time.perf_counter()
+    stats: list[TableStats] = []
+    dropped = secondary_indexes(tables) if drop_indexes else []
+    async with engine.connect() as conn:
+        # IF [NOT] EXISTS rather than checkfirst: reflection does not see expression indexes.
+        for index in dropped:
+            await conn.execute(DropIndex(index, if_exists=True))
+        await conn.commit()
+        try:
+            for table in tables:
+                stats.append(await load_table(conn, table, sources[table.name], batch_size))
+                print(format_stats(stats[-1]), file=sys.stderr)
+        finally:
+            await conn.rollback()
+            index_started = time.perf_counter()
+            for index in dropped:
+                await conn.execute(CreateIndex(index, if_not_exists=True))
+            await conn.commit()
+            index_seconds = round(time.perf_counter() - index_started, 3)
+        await _reset_sequences(conn, tables)
+    derived_timings = await rebuild_derived(engine, set(sources)) if derived else {}
+    total_rows = sum(s.rows for s in stats)
+    total_seconds = time.perf_counter() - started
+    return {
+        "tables": {s.table: {"rows": s.rows, "seconds": round(s.seconds, 3), "rows_per_second": round(s.rows_per_second)} for s in stats},
+        "index_rebuild_seconds": index_seconds if dropped else 0.0,
+        "derived_seconds": derived_timings,
+        "rows": total_rows,
+        "seconds": round(total_seconds, 3),
+        "rows_per_second": round(total_rows / total_seconds) if total_seconds > 0 else 0,
+    }
+
+
+def format_stats(stats: TableStats) -> str:
+    return f"{stats.table}: {stats.rows} rows in {stats.seconds:.2f}s ({stats.rows_per_second:.0f} rows/s)"
+
+
+async def _run(args: argparse.Namespace) -> None:
+    sources = {name: getattr(args, name) for name in TABLES if getattr(args, name)}
+    if not sources:
+        raise SystemExit("nothing to import; pass at least one of --" + " / --".join(TABLES))
+    db_module.init_engine()
+    assert db_module.engine is not None
+    try:
+        summary = await run_import(
+            db_module.engine,
+            sources,
+            batch_size=args.batch_size,
+            drop_indexes=args.drop_indexes,
+            derived=not args.skip_derived,
+        )
+    except BulkImportError as exc:
+        raise SystemExit(f"import failed: {exc}") from None
+    finally:
+        await db_module.engine.dispose()
+    print(json.dumps(summary, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load CSV/NDJSON data into the database.")
+    for name in TABLES:
+        parser.add_argument(f"--{name}", metavar="PATH", help=f"{name} file (.csv, .ndjson, .jsonl, optionally .gz)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per insert/commit")
+    parser.add_argument("--drop-indexes", action="store_true", help="drop non-unique indexes during the load")
+    parser.add_argument("--skip-derived", action="store_true", help="do not rebuild counters, timelines and search")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
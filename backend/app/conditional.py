@@ -0,0 +1,88 @@
+"""Conditional GET support: strong ETags and Last-Modified for feed, tweet and profile reads.
+
+A page's ETag is a hash of what its rendering depends on: the viewer's timeline_version (bumped
+by their likes and retweets, which change liked_by_me/retweeted_by_me), and for each tweet its
+id, version (bumped whenever counters or sentiment change) and author username, plus the request
+parameters. Endpoints compute it right after the cheap page query and answer a matching
+If-None-Match with 304 before hydration or serialization.
+"""
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Tweet, User
+
+
+def compute_etag(*parts: Any) -> str:
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def tweet_signature(rows: Iterable[tuple[Tweet, str]]) -> list[tuple[int, int, str]]:
+    return [(tweet.id, tweet.version, username) for tweet, username in rows]
+
+
+def last_modified(rows: Iterable[tuple[Tweet, str]]) -> datetime | None:
+    stamps = [stamp for tweet, _ in rows for stamp in (tweet.created_at, tweet.updated_at) if stamp is not None]
+    return max(stamps) if stamps else None
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match matches `etag` (weak comparison, as RFC 9110 requires)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def validator_headers(etag: str, modified: datetime | None) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if modified is not None:
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def set_validators(response: Response, etag: str, modified: datetime | None) -> None:
+    response.headers.update(validator_headers(etag, modified))
+
+
+def not_modified(etag: str, modified: datetime | None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, modified))
+
+
+async def get_timeline_version(db: AsyncSession, user_id: int) -> int:
+    """Read fresh from the database: the cached current_user snapshot may predate a bump."""
+    result = await db.execute(select(User.timeline_version).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+async def bump_timeline_version(db: AsyncSession, user_id: int) -> None:
+    await db.execute(
+        update(User).where(User.id == user_id).values(timeline_version=User.timeline_version + 1)
+    )
+
+
+async def bump_retweets_of_author(db: AsyncSession, author_id: int) -> None:
+    """After a rename, invalidate retweets that display the author's old username.
+
+    Two statements rather than UPDATE ... WHERE IN (SELECT FROM tweets), which MySQL rejects.
+    """
+    result = await db.execute(select(Tweet.id).where(Tweet.user_id == author_id, Tweet.retweet_count > 0))
+    original_ids = result.scalars().all()
+    for start in range(0, len(original_ids), 500):
+        await db.execute(
+            update(Tweet)
+            .where(Tweet.retweeted_from.in_(original_ids[start:start + 500]))
+            .values(version=Tweet.version + 1)
+        )
@@ -0,0 +1,89 @@
+"""Reconcile denormalized Tweet counters (like_count, retweet_count, comment_count) with source rows.
+
+Usage: python -m app.counters [--batch-size N]
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import db as db_module
+from .models import Comment, Like, Tweet
+
+
+async def reconcile_counters(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Recount likes, retweets and comments in id-ordered batches and repair drifted rows.
+
+    Uses grouped counts per batch rather than a correlated UPDATE so it also works on MySQL
+    (which cannot UPDATE tweets with a subquery over tweets). Returns the number of tweets fixed.
+    """
+    repaired = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Tweet.id, Tweet.like_count, Tweet.retweet_count, Tweet.comment_count)
+            .where(Tweet.id > last_id)
+            .order_by(Tweet.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        last_id = ids[-1]
+        likes = dict(
+            (await db.execute(
+                select(Like.tweet_id, func.count()).where(Like.tweet_id.in_(ids)).group_by(Like.tweet_id)
+            )).all()
+        )
+        retweets = dict(
+            (await db.execute(
+                select(Tweet.retweeted_from, func.count())
+                .where(Tweet.retweeted_from.in_(ids))
+                .group_by(Tweet.retweeted_from)
+            )).all()
+        )
+        comments = dict(
+            (await db.execute(
+                select(Comment.tweet_id, func.count())
+                .where(Comment.tweet_id.in_(ids))
+                .group_by(Comment.tweet_id)
+            )).all()
+        )
+        for tweet_id, like_count, retweet_count, comment_count in rows:
+            actual = (likes.get(tweet_id, 0), retweets.get(tweet_id, 0), comments.get(tweet_id, 0))
+            if actual != (like_count, retweet_count, comment_count):
+                await db.execute(
+                    update(Tweet)
+                    .where(Tweet.id == tweet_id)
+                    .values(
+                        like_count=actual[0],
+                        retweet_count=actual[1],
+                        comment_count=actual[2],
+                        version=Tweet.version + 1,
+                    )
+                )
+                repaired += 1
+        await db.commit()
+    return repaired
+
+
+async def _run(batch_size: int) -> None:
+    db_module.init_engine()
+    assert db_module.SessionLocal is not None and db_module.engine is not None
+    async with db_module.SessionLocal() as session:
+        repaired = await reconcile_counters(session, batch_size)
+    await db_module.engine.dispose()
+    print(f"repaired {repaired} tweets")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Repair drift in denormalized tweet counters.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
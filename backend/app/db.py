@@ -1,12 +1,23 @@
-"""Database connection and session (async SQLAlchemy). Supports PostgreSQL, MySQL, and SQLite (tests)."""
+"""Database connection and session (async SQLAlchemy). Supports PostgreSQL, MySQL, and SQLite (tests).
+Optional read replicas for read-only endpoints (get_read_db_session)."""
+import asyncio
 from collections.abc import AsyncIterator
+import math
 import os
+import time
+from typing import Any
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .metrics import record_pool_wait
 
 
 def get_database_url() -> str:
@@ -31,6 +42,150 @@ def get_database_url_sync() -> str:
     return url
 
 
+def get_pool_size() -> int:
+    return int(os.getenv("DB_POOL_SIZE", "5"))
+
+
+def get_max_overflow() -> int:
+    return int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def get_pool_timeout_seconds() -> float:
+    return float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+
+def get_pool_recycle_seconds() -> int:
+    """Recycle connections older than this (-1 disables); keep below the server's idle timeout."""
+    return int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+
+
+def get_pool_pre_ping() -> bool:
+    return os.getenv("DB_POOL_PRE_PING", "0").lower() in ("1", "true", "yes")
+
+
+def get_pool_warm_connections() -> int:
+    """Connections opened at startup so the first requests do not pay for connecting."""
+    return int(os.getenv("DB_POOL_WARM", str(get_pool_size())))
+
+
+def get_query_cache_size() -> int:
+    """SQLAlchemy compiled-statement cache entries per engine."""
+    return int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+
+def get_statement_cache_size() -> int:
+    """asyncpg prepared statements cached per connection; 0 when behind pgbouncer in transaction mode."""
+    return int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+
+def get_sqlite_pragmas() -> dict[str, str]:
+    return {
+        "journal_mode": os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": os.getenv("DB_SQLITE_MMAP_SIZE", "268435456"),
+        "busy_timeout": os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    }
+
+
+class PoolStats:
+    """Checkout counters for one pool; wait time includes opening a new connection when needed."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.stats.timeouts += 1
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats.record(elapsed)
+        record_pool_wait(elapsed)
+        return conn
+
+
+def _set_sqlite_pragmas(dbapi_connection: Any, _connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in get_sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """Create an async engine tuned for the URL's dialect from the DB_* settings."""
+    kwargs: dict[str, Any] = {"echo": False, "future": True, "query_cache_size": get_query_cache_size()}
+    connect_args: dict[str, Any] = {}
+    is_sqlite = url.startswith("sqlite")
+    if is_sqlite:
+        connect_args["check_same_thread"] = False
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = get_statement_cache_size()
+    if not (is_sqlite and (":memory:" in url or url.rstrip("/").endswith(":"))):
+        kwargs.update(
+            poolclass=TimedQueuePool,
+            pool_size=get_pool_size(),
+            max_overflow=get_max_overflow(),
+            pool_timeout=get_pool_timeout_seconds(),
+            pool_recycle=get_pool_recycle_seconds(),
+            pool_pre_ping=get_pool_pre_ping(),
+        )
+    new_engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+    if is_sqlite:
+        event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+
+async def warm_pool(target: AsyncEngine, connections: int | None = None) -> None:
+    """Open `connections` pooled connections concurrently, then return them to the pool."""
+    count = connections if connections is not None else get_pool_warm_connections()
+    pool = target.sync_engine.pool
+    if isinstance(pool, TimedQueuePool):
+        count = min(count, pool.size())
+    if count <= 0:
+        return
+
+    conns = [target.connect() for _ in range(count)]
+    try:
+        await asyncio.gather(*(conn.start() for conn in conns))
+    finally:
+        for conn in conns:
+            await conn.close()
+
+
+def pool_status(target: AsyncEngine) -> dict[str, Any]:
+    pool = target.sync_engine.pool
+    status: dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, TimedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            checkouts=pool.stats.checkouts,
+            checkout_wait_seconds_total=round(pool.stats.wait_seconds_total, 6),
+            checkout_wait_seconds_max=round(pool.stats.wait_seconds_max, 6),
+            checkout_timeouts=pool.stats.timeouts,
+        )
+    return status
+
+
 engine: AsyncEngine | None = None
 SessionLocal: async_sessionmaker[AsyncSession] | None = None
 
@@ -38,11 +193,7 @@ SessionLocal: async_sessionmaker[AsyncSession] | None = None
 def init_engine() -> None:
     global engine, SessionLocal
     if engine is None:
-        url = get_database_url()
-        connect_args = {}
-        if "sqlite" in url:
-            connect_args["check_same_thread"] = False
-        engine = create_async_engine(url, echo=False, future=True, connect_args=connect_args)
+        engine = build_engine(get_database_url())
         SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
@@ -52,3 +203,214 @@ async def get_db_session() -> AsyncIterator[AsyncSession]:
     assert SessionLocal is not None
     async with SessionLocal() as session:
         yield session
+
+
+# Read replicas. Read-only endpoints use get_read_db_session, which spreads load over
+# DATABASE_REPLICA_URLS and falls back to the primary session when no healthy replica is
+# available, the replica fails, or the caller wrote recently (read-your-writes).
+
+
+def get_replica_urls() -> list[str]:
+    raw = os.getenv("DATABASE_REPLICA_URLS", "")
+    return [url.strip() for url in raw.split(",") if url.strip()]
+
+
+def get_replica_retry_seconds() -> float:
+    """How long a failed replica is skipped before it is tried again."""
+    return float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+
+def get_read_sticky_seconds() -> float:
+    """After a write, that caller's reads go to the primary for this long; keep above replica lag."""
+    return float(os.getenv("DB_READ_STICKY_SECONDS", "5"))
+
+
+# Errors that mean the replica itself is unreachable, not that the query was wrong.
+REPLICA_FAILURES = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.engine = build_engine(url)
+        self.failed_at: float | None = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.failed_at is None or time.monotonic() - self.failed_at >= get_replica_retry_seconds()
+
+    def mark_failed(self) -> None:
+        self.failed_at = time.monotonic()
+
+    def mark_ok(self) -> None:
+        self.failed_at = None
+
+
+class ReplicaSet:
+    """Round-robin over replicas that have not failed recently."""
+
+    def __init__(self, urls: list[str]) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self._next = 0
+
+    def pick(self) -> Replica | None:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check(self) -> None:
+        """Probe every replica with SELECT 1 and update its health."""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except REPLICA_FAILURES:
+                replica.mark_failed()
+            else:
+                replica.mark_ok()
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replicas: ReplicaSet | None = None
+
+
+def init_replicas() -> ReplicaSet:
+    global replicas
+    if replicas is None:
+        replicas = ReplicaSet(get_replica_urls())
+    return replicas
+
+
+async def dispose_replicas() -> None:
+    global replicas
+    if replicas is not None:
+        current, replicas = replicas, None
+        await current.dispose()
+
+
+# Read-your-writes marker, carried by the client so it holds whichever worker serves the next
+# request: a successful authenticated write sets a cookie (same-origin browsers) and a response
+# header with the write time in unix milliseconds. Cross-origin callers never send the cookie
+# (CORS runs without credentials); they must send the header back, as frontend/src/api/client.ts
+# does. A client that does neither reads from replicas right after its own writes.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+def mark_write(response: Response) -> None:
+    stamp = str(int(time.time() * 1000))
+    response.headers[LAST_WRITE_HEADER] = stamp
+    response.set_cookie(
+        LAST_WRITE_COOKIE, stamp, max_age=math.ceil(get_read_sticky_seconds()), httponly=True, samesite="lax"
+    )
+
+
+def wrote_recently(request: Request) -> bool:
+    """True if an authenticated caller reports a write within DB_READ_STICKY_SECONDS.
+
+    Anonymous reads are never pinned. A stamp further in the future than one window (beyond any
+    sane clock skew between workers) is ignored, so a client cannot pin itself to the primary.
+    """
+    if not request.headers.get("authorization"):
+        return False
+    raw = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        written_at = int(raw) / 1000 if raw is not None else None
+    except ValueError:
+        return False
+    if written_at is None:
+        return False
+    window = get_read_sticky_seconds()
+    now = time.time()
+    return now - window <= written_at <= now + window
+
+
+class ReplicaSession(AsyncSession):
+    """Session bound to a replica that moves to the primary if the replica fails mid-request.
+
+    The failing statement is re-run on the primary (these sessions only serve read-only
+    endpoints, so that is safe) and the replica is skipped for DB_REPLICA_RETRY_SECONDS.
+    """
+
+    def __init__(self, replica: Replica, primary_bind: AsyncEngine) -> None:
+        super().__init__(bind=replica.engine, expire_on_commit=False)
+        self.replica = replica
+        self._primary_bind = primary_bind
+        self.on_primary = False
+
+    async def _fail_over(self) -> bool:
+        if self.on_primary:
+            return False
+        self.replica.mark_failed()
+        try:
+            await self.close()
+        except REPLICA_FAILURES:
+            pass
+        self.bind = self._primary_bind
+        self.sync_session.bind = self._primary_bind.sync_engine
+        self.on_primary = True
+        return True
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await super().execute(*args, **kwargs)
+        except REPLICA_FAILURES:
+            if not await self._fail_over():
+                raise
+        return await super().execute(*args, **kwargs)
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await super().scalar(*args, **kwargs)
+        except REPLICA_FAILURES:
+            if not await self._fail_over():
+                raise
+        return await super().scalar(*args, **kwargs)
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await super().scalars(*args, **kwargs)
+        except REPLICA_FAILURES:
+            if not await self._fail_over():
+                raise
+        return await super().scalars(*args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await super().get(*args, **kwargs)
+        except REPLICA_FAILURES:
+            if not await self._fail_over():
+                raise
+        return await super().get(*args, **kwargs)
+
+
+async def get_read_db_session(
+    request: Request,
+    primary: AsyncSession = Depends(get_db_session),
+) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints: a healthy replica, or the primary session when none is
+    configured/healthy or the caller wrote within DB_READ_STICKY_SECONDS."""
+    replica = init_replicas().pick()
+    if replica is None or wrote_recently(request):
+        yield primary
+        return
+    async with ReplicaSession(replica, primary.bind) as session:
+        yield session
+
+
+def get_replica_check_seconds() -> float:
+    return float(os.getenv("DB_REPLICA_CHECK_SECONDS", "10"))
+
+
+async def run_replica_checks(replica_set: ReplicaSet) -> None:
+    """Probe replicas every DB_REPLICA_CHECK_SECONDS so failures and recoveries are noticed
+    without waiting for a request to hit them."""
+    while True:
+        await replica_set.check()
+        await asyncio.sleep(get_replica_check_seconds())
@@ -0,0 +1,238 @@
+"""Live feed push: GET /feed/stream sends new tweets, retweets and like/retweet count deltas as SSE.
+
+Off unless FEED_STREAM_ENABLED=1. Write endpoints publish events on the "feed" pubsub channel,
+delivered in-process on commit (see pubsub). With FEED_STREAM_BACKEND=local (the default) events
+stay on the worker that handled the write, and are not published at all while it has no streams
+connected: enough for one worker, or for clients pinned to a worker. FEED_STREAM_BACKEND=pubsub
+also records them in the pubsub table for other workers' polls. Each worker's FeedHub routes an event only to
+the connected viewers who follow its author (or are the author), indexed by author id, so a
+dispatch costs O(interested viewers) rather than O(connections). Block filtering uses the
+viewer's BlockCache sets; follow/unfollow and block/unblock update connected viewers through the
+"follows" and "blocks" channels.
+
+Every connection has a bounded queue (FEED_STREAM_QUEUE_SIZE). A consumer that falls behind has
+its backlog dropped and gets a single "resync" event, after which it should refetch GET /feed.
+A stream holds no database connection while idle.
+"""
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+import os
+from typing import Any
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .block_cache import BlockCache
+from .models import Follow, Tweet
+from .pubsub import get_pubsub
+from .responses import dumps
+
+CHANNEL = "feed"
+FOLLOWS_CHANNEL = "follows"
+
+RESYNC: dict[str, Any] = {"type": "resync"}
+
+
+def feed_stream_enabled() -> bool:
+    return os.getenv("FEED_STREAM_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+
+def get_feed_stream_backend() -> str:
+    """"local" (this worker's streams only) or "pubsub" (every worker, through the pubsub table)."""
+    return os.getenv("FEED_STREAM_BACKEND", "local").strip().lower()
+
+
+def get_queue_size() -> int:
+    return int(os.getenv("FEED_STREAM_QUEUE_SIZE", "100"))
+
+
+def get_max_connections() -> int:
+    """Per worker; beyond this GET /feed/stream answers 503 and clients fall back to polling."""
+    return int(os.getenv("FEED_STREAM_MAX_CONNECTIONS", "10000"))
+
+
+def get_heartbeat_seconds() -> float:
+    return float(os.getenv("FEED_STREAM_HEARTBEAT_SECONDS", "15"))
+
+
+class HubFull(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, viewer_id: int, followees: Iterable[int], hidden: frozenset[int], queue_size: int) -> None:
+        self.viewer_id = viewer_id
+        self.followees = set(followees)
+        self.hidden = hidden
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=queue_size)
+        # Set when the viewer's block sets changed; the stream reloads them before the next event.
+        self.stale = False
+        self.dropped = 0
+
+    def offer(self, event: dict[str, Any]) -> None:
+        """Queue without waiting; when full, replace the backlog with one resync event."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                if self.queue.get_nowait() is not RESYNC:
+                    self.dropped += 1
+            self.dropped += 1
+            self.queue.put_nowait(RESYNC)
+
+
+class FeedHub:
+    def __init__(self, queue_size: int | None = None, max_connections: int | None = None) -> None:
+        self._queue_size = queue_size if queue_size is not None else get_queue_size()
+        self._max_connections = max_connections if max_connections is not None else get_max_connections()
+        # author id -> subscribers whose feed includes that author
+        self._by_author: dict[int, set[Subscriber]] = {}
+        self._by_viewer: dict[int, set[Subscriber]] = {}
+        self.connections = 0
+
+    def connect(self, viewer_id: int, followees: Iterable[int], hidden: frozenset[int]) -> Subscriber:
+        if self.connections >= self._max_connections:
+            raise HubFull()
+        sub = Subscriber(viewer_id, followees, hidden, self._queue_size)
+        for author_id in sub.followees | {viewer_id}:
+            self._by_author.setdefault(author_id, set()).add(sub)
+        self._by_viewer.setdefault(viewer_id, set()).add(sub)
+        self.connections += 1
+        return sub
+
+    def disconnect(self, sub: Subscriber) -> None:
+        for author_id in sub.followees | {sub.viewer_id}:
+            self._remove(self._by_author, author_id, sub)
+        self._remove(self._by_viewer, sub.viewer_id, sub)
+        self.connections -= 1
+
+    @staticmethod
+    def _remove(index: dict[int, set[Subscriber]], key: int, sub: Subscriber) -> None:
+        subs = index.get(key)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del index[key]
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        author_id = event.get("author_id")
+        for sub in list(self._by_author.get(author_id, ())):
+            if author_id not in sub.hidden:
+                sub.offer(event)
+
+    def on_follow(self, message: dict[str, Any]) -> None:
+        follower_id, followee_id = message["follower_id"], message["followee_id"]
+        for sub in self._by_viewer.get(follower_id, ()):
+            if message.get("following"):
+                sub.followees.add(followee_id)
+                self._by_author.setdefault(followee_id, set()).add(sub)
+            elif followee_id in sub.followees:
+                sub.followees.discard(followee_id)
+                if followee_id != sub.viewer_id:
+                    self._remove(self._by_author, followee_id, sub)
+
+    def on_blocks(self, message: dict[str, Any]) -> None:
+        for user_id in message.get("users", []):
+            for sub in self._by_viewer.get(int(user_id), ()):
+                sub.stale = True
+
+
+def format_event(event: dict[str, Any]) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+
+
+async def load_followees(db: AsyncSession, viewer_id: int) -> list[int]:
+    result = await db.execute(select(Follow.followee_id).where(Follow.follower_id == viewer_id))
+    return list(result.scalars().all())
+
+
+async def stream_events(
+    hub: FeedHub,
+    sub: Subscriber,
+    db: AsyncSession,
+    block_cache: BlockCache,
+    heartbeat_seconds: float | None = None,
+) -> AsyncIterator[bytes]:
+    """SSE body for one connection; unregisters the subscriber when the client goes away."""
+    heartbeat = heartbeat_seconds if heartbeat_seconds is not None else get_heartbeat_seconds()
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if sub.stale:
+                sub.stale = False
+                sub.hidden = await block_cache.hidden_ids(db, sub.viewer_id)
+                await db.close()
+            if event.get("author_id") in sub.hidden:
+                continue
+            yield format_event(event)
+    finally:
+        hub.disconnect(sub)
+
+
+def tweet_event(
+    tweet: Tweet,
+    username: str,
+    retweeted_from_username: str | None = None,
+    retweeted_from_text: str | None = None,
+) -> dict[str, Any]:
+    """A TweetRead-shaped "tweet" event (JSON-ready); viewer flags are left for the client."""
+    return {
+        "type": "tweet",
+        "author_id": tweet.user_id,
+        "tweet": {
+            "id": tweet.id,
+            "text": tweet.text,
+            "created_at": tweet.created_at.isoformat() if tweet.created_at is not None else None,
+            "user_id": tweet.user_id,
+            "username": username,
+            "retweeted_from": tweet.retweeted_from,
+            "retweeted_from_username": retweeted_from_username,
+            "retweeted_from_text": retweeted_from_text,
+            "retweeted_by_me": False,
+            "like_count": tweet.like_count or 0,
+            "liked_by_me": False,
+            "retweet_count": tweet.retweet_count or 0,
+            "comment_count": tweet.comment_count or 0,
+            "sentiment_label": tweet.sentiment_label,
+            "sentiment_score": tweet.sentiment_score,
+        },
+    }
+
+
+def counts_event(tweet_id: int, author_id: int, like_delta: int = 0, retweet_delta: int = 0) -> dict[str, Any]:
+    return {
+        "type": "counts",
+        "author_id": author_id,
+        "tweet_id": tweet_id,
+        "like_delta": like_delta,
+        "retweet_delta": retweet_delta,
+    }
+
+
+def _publish(request: Request, db: AsyncSession, channel: str, message: dict[str, Any]) -> None:
+    if not feed_stream_enabled():
+        return
+    if get_feed_stream_backend() == "pubsub":
+        get_pubsub(request).publish(db, channel, message)
+    elif get_feed_hub(request).connections:
+        get_pubsub(request).publish(db, channel, message, local=True)
+
+
+def publish_feed_event(request: Request, db: AsyncSession, event: dict[str, Any]) -> None:
+    """Send a feed event when `db` commits; a no-op unless some stream could receive it."""
+    _publish(request, db, CHANNEL, event)
+
+
+def publish_follow(request: Request, db: AsyncSession, follower_id: int, followee_id: int, following: bool) -> None:
+    message = {"follower_id": follower_id, "followee_id": followee_id, "following": following}
+    _publish(request, db, FOLLOWS_CHANNEL, message)
+
+
+def get_feed_hub(request: Request) -> FeedHub:
+    return request.app.state.feed_hub
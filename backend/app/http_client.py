@@ -0,0 +1,176 @@
+"""App-scoped outbound HTTP client for model calls: pooled keep-alive connections, optional HTTP/2,
+per-host concurrency limits and a per-host circuit breaker.
+
+The lifespan in main.create_app opens the client on startup and closes it on shutdown; code running
+outside the app (CLIs, tests) gets one lazily via get_outbound_client().
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+try:  # HTTP/2 needs the optional h2 package (httpx[http2]).
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on environment
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_connections() -> int:
+    return int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "100"))
+
+
+def get_max_per_host() -> int:
+    return int(os.getenv("OUTBOUND_MAX_PER_HOST", "16"))
+
+
+def get_timeout_seconds() -> float:
+    return float(os.getenv("OUTBOUND_TIMEOUT_SECONDS", "8"))
+
+
+def get_breaker_threshold() -> int:
+    return int(os.getenv("OUTBOUND_BREAKER_FAILURES", "5"))
+
+
+def get_breaker_reset_seconds() -> float:
+    return float(os.getenv("OUTBOUND_BREAKER_RESET_SECONDS", "30"))
+
+
+def http2_enabled() -> bool:
+    return HTTP2_AVAILABLE and os.getenv("OUTBOUND_HTTP2", "1").lower() in ("1", "true", "yes")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_seconds` lets one probe through
+    (half-open) and closes again if it succeeds."""
+
+    def __init__(self, threshold: int, reset_seconds: float) -> None:
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without an outcome (the call was cancelled)."""
+        self._probing = False
+
+
+class OutboundClient:
+    def __init__(self) -> None:
+        self._client = httpx.AsyncClient(
+            http2=http2_enabled(),
+            timeout=get_timeout_seconds(),
+            limits=httpx.Limits(
+                max_connections=get_max_connections(),
+                max_keepalive_connections=get_max_connections(),
+                keepalive_expiry=60.0,
+            ),
+        )
+        self._loop = asyncio.get_running_loop()
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(get_breaker_threshold(), get_breaker_reset_seconds())
+        return self._breakers[host]
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        """POST through the pool. Exceptions, 429 and 5xx count as breaker failures. Cancellation
+        (a client gone, a preview abandoned) says nothing about the host: it only releases a
+        half-open probe, so the probe slot is never stuck."""
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(host)
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(get_max_per_host())
+        try:
+            async with self._host_limits[host]:
+                resp = await self._client.post(url, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        if resp.status_code == 429 or resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return resp
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_client: OutboundClient | None = None
+
+
+async def start_outbound_client() -> OutboundClient:
+    global _client
+    await close_outbound_client()
+    _client = OutboundClient()
+    return _client
+
+
+async def close_outbound_client() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        try:
+            await client.aclose()
+        except RuntimeError:  # pragma: no cover - created on a loop that is already closed
+            pass
+
+
+def get_outbound_client() -> OutboundClient:
+    """Return the shared client, creating one if none exists for the running event loop."""
+    global _client
+    if _client is None or _client.loop is not asyncio.get_running_loop():
+        _client = OutboundClient()
+    return _client
@@ -0,0 +1,86 @@
+"""Set-based hydration of Tweet rows into TweetRead (fixed number of queries per page)."""
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Like, Tweet, User
+from .schemas import TweetRead
+
+
+async def hydrate_tweets(
+    db: AsyncSession,
+    rows: Sequence[tuple[Tweet, str]],
+    viewer_id: int | None,
+) -> list[TweetRead]:
+    """hydrate_tweet_dicts as TweetRead models; model_construct skips validation, so the dicts must match TweetRead."""
+    return [TweetRead.model_construct(**item) for item in await hydrate_tweet_dicts(db, rows, viewer_id)]
+
+
+async def hydrate_tweet_dicts(
+    db: AsyncSession,
+    rows: Sequence[tuple[Tweet, str]],
+    viewer_id: int | None,
+) -> list[dict[str, Any]]:
+    """Fill every TweetRead field for a page of (tweet, author username) rows, as plain dicts
+    in TweetRead field order (ready for FastJSONResponse without a Pydantic round trip).
+
+    Issues at most three queries regardless of page size: retweet originals (one join)
+    and two IN-list membership checks for the viewer. Counts come from the Tweet counters.
+    """
+    if not rows:
+        return []
+    tweet_ids = [tweet.id for tweet, _ in rows]
+    original_ids = {
+        tweet.retweeted_from if tweet.retweeted_from is not None else tweet.id for tweet, _ in rows
+    }
+    retweeted_ids = {tweet.retweeted_from for tweet, _ in rows if tweet.retweeted_from is not None}
+
+    originals: dict[int, tuple[str | None, str]] = {}
+    if retweeted_ids:
+        result = await db.execute(
+            select(Tweet.id, Tweet.text, User.username)
+            .join(User, User.id == Tweet.user_id)
+            .where(Tweet.id.in_(retweeted_ids))
+        )
+        originals = {tweet_id: (text, username) for tweet_id, text, username in result.all()}
+
+    liked: set[int] = set()
+    retweeted: set[int] = set()
+    if viewer_id is not None:
+        result = await db.execute(
+            select(Like.tweet_id).where(Like.user_id == viewer_id, Like.tweet_id.in_(tweet_ids))
+        )
+        liked = set(result.scalars().all())
+        result = await db.execute(
+            select(Tweet.retweeted_from).where(
+                Tweet.user_id == viewer_id, Tweet.retweeted_from.in_(original_ids)
+            )
+        )
+        retweeted = set(result.scalars().all())
+
+    items: list[dict[str, Any]] = []
+    for tweet, username in rows:
+        original_id = tweet.retweeted_from if tweet.retweeted_from is not None else tweet.id
+        retweeted_from_text, retweeted_from_username = originals.get(tweet.retweeted_from, (None, None))
+        items.append(
+            {
+                "id": tweet.id,
+                "text": tweet.text,
+                "created_at": tweet.created_at,
+                "user_id": tweet.user_id,
+                "username": username,
+                "retweeted_from": tweet.retweeted_from,
+                "retweeted_from_username": retweeted_from_username,
+                "retweeted_from_text": retweeted_from_text,
+                "retweeted_by_me": original_id in retweeted,
+                "like_count": tweet.like_count,
+                "liked_by_me": tweet.id in liked,
+                "retweet_count": tweet.retweet_count,
+                "comment_count": tweet.comment_count,
+                "sentiment_label": tweet.sentiment_label,
+                "sentiment_score": tweet.sentiment_score,
+            }
+        )
+    return items
@@ -1,15 +1,87 @@
 """Chirper Backend — FastAPI + Chirper schema."""
-from fastapi import Depends, FastAPI
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import api_auth, api_comments, api_feed, api_tweets, api_users
-from .db import get_db_session
+from . import db as db_module
+from .auth_cache import AuthCache
+from .block_cache import CHANNEL as BLOCKS_CHANNEL
+from .block_cache import BlockCache
+from .feed_stream import CHANNEL as FEED_CHANNEL
+from .feed_stream import FOLLOWS_CHANNEL, FeedHub
+from .db import (
+    LAST_WRITE_HEADER,
+    dispose_replicas,
+    get_db_session,
+    init_replicas,
+    mark_write,
+    pool_status,
+    run_replica_checks,
+    warm_pool,
+)
+from .http_client import close_outbound_client, start_outbound_client
+from .metrics import MetricsMiddleware, Registry, TimedRoute, install_db_hooks
+from .pubsub import PubSub, run_pubsub_poll
+from .security import run_token_purge, shutdown_password_hasher
+from .sentiment import sentiment_enabled, shutdown_sentiment_backend
+from .sentiment_cache import get_sentiment_cache
+from .sentiment_worker import SentimentWorker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await start_outbound_client()
+    db_module.init_engine()
+    assert db_module.engine is not None and db_module.SessionLocal is not None
+    await warm_pool(db_module.engine)
+    purge = asyncio.create_task(run_token_purge(db_module.SessionLocal))
+    replica_set = init_replicas()
+    for replica in replica_set.replicas:
+        await warm_pool(replica.engine)
+    replica_checks = asyncio.create_task(run_replica_checks(replica_set)) if replica_set.replicas else None
+    pubsub_poll = None
+    if app.state.pubsub.backend != "local":
+        pubsub_poll = asyncio.create_task(run_pubsub_poll(app.state.pubsub, db_module.SessionLocal))
+    worker = None
+    if sentiment_enabled():
+        worker = SentimentWorker(db_module.SessionLocal)
+        worker.start()
+    yield
+    if worker is not None:
+        await worker.stop()
+    purge.cancel()
+    await asyncio.gather(purge, return_exceptions=True)
+    if replica_checks is not None:
+        replica_checks.cancel()
+        await asyncio.gather(replica_checks, return_exceptions=True)
+    if pubsub_poll is not None:
+        pubsub_poll.cancel()
+        await asyncio.gather(pubsub_poll, return_exceptions=True)
+    await dispose_replicas()
+    shutdown_sentiment_backend()
+    shutdown_password_hasher()
+    await close_outbound_client()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Chirper Backend", debug=True)
+    app = FastAPI(title="Chirper Backend", debug=True, lifespan=lifespan)
+    app.router.route_class = TimedRoute
+    app.state.auth_cache = AuthCache()
+    app.state.pubsub = PubSub()
+    app.state.block_cache = BlockCache()
+    app.state.pubsub.subscribe(BLOCKS_CHANNEL, app.state.block_cache.on_message)
+    app.state.feed_hub = FeedHub()
+    app.state.metrics = Registry()
+    install_db_hooks()
+    app.state.pubsub.subscribe(FEED_CHANNEL, app.state.feed_hub.dispatch)
+    app.state.pubsub.subscribe(FOLLOWS_CHANNEL, app.state.feed_hub.on_follow)
+    app.state.pubsub.subscribe(BLOCKS_CHANNEL, app.state.feed_hub.on_blocks)
 
     # Allow the React dev server to call the API (CORS preflight uses OPTIONS).
     app.add_middleware(
@@ -20,13 +92,50 @@ def create_app() -> FastAPI:
         allow_credentials=False,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Cross-origin clients echo this back so their reads see their own writes (see db).
+        expose_headers=[LAST_WRITE_HEADER],
     )
 
+    @app.middleware("http")
+    async def mark_writes(request: Request, call_next):
+        """Successful authenticated writes pin the caller's reads to the primary for a short window."""
+        response = await call_next(request)
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+            and request.headers.get("authorization")
+        ):
+            mark_write(response)
+        return response
+
+    # Added last so it is outermost and times everything below it.
+    app.add_middleware(MetricsMiddleware, registry=app.state.metrics)
+
     @app.get("/health")
     async def health(db: AsyncSession = Depends(get_db_session)) -> dict:
         await db.execute(text("SELECT 1"))
         return {"status": "ok"}
 
+    @app.get("/health/db")
+    async def health_db() -> dict:
+        """Connection pool occupancy and checkout wait times for the primary engine."""
+        db_module.init_engine()
+        assert db_module.engine is not None
+        return pool_status(db_module.engine)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        """Prometheus text format: per-route request, query, pool-wait, serialization and model-call metrics, plus gauges."""
+        gauges: dict[str, float] = {"feed_stream_connections": app.state.feed_hub.connections}
+        if db_module.engine is not None:
+            status = pool_status(db_module.engine)
+            for key in ("size", "checked_out", "overflow", "checkout_timeouts"):
+                if key in status:
+                    gauges[f"db_pool_{key}"] = status[key]
+        for key, value in get_sentiment_cache().stats().items():
+            gauges[f"sentiment_cache_{key}"] = value
+        return Response(app.state.metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
+
     app.include_router(api_auth.router, prefix="/auth", tags=["auth"])
     app.include_router(api_feed.router, tags=["feed"])
     app.include_router(api_tweets.router, prefix="/tweets", tags=["tweets"])
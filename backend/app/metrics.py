@@ -0,0 +1,357 @@
+"""Per-request instrumentation: query count, DB time, pool wait, serialization and model-call time.
+
+MetricsMiddleware (pure ASGI, outermost) puts a RequestTimings in a context variable for each
+HTTP request. SQLAlchemy cursor events on every Engine, TimedQueuePool checkouts, serialization
+(FastJSONResponse rendering, and FastAPI's response_model validation and rendering via TimedRoute)
+and sentiment model calls add to it. SQLAlchemy runs driver calls in greenlets that share the
+request's context, so no session plumbing is needed. At the end of the request the timings go to
+a Server-Timing response header and to a per-route Registry, exposed in Prometheus text format at
+GET /metrics. Server-sent event streams stay open for as long as the client listens, so their
+durations go to http_stream_duration_seconds rather than http_request_duration_seconds.
+
+Metrics are per worker process; scrape each worker or aggregate upstream. Label values are
+route templates ("/tweets/{tweet_id}"), never raw paths, so cardinality stays bounded.
+"""
+import asyncio
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import os
+import time
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+STREAM_DURATION_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+def server_timing_enabled() -> bool:
+    return os.getenv("METRICS_SERVER_TIMING", "1").strip().lower() not in ("0", "false", "no")
+
+
+class RequestTimings:
+    __slots__ = (
+        "db_queries",
+        "db_seconds",
+        "pool_wait_seconds",
+        "serialize_seconds",
+        "model_seconds",
+        "model_calls",
+        "endpoint_returned_at",
+    )
+
+    def __init__(self) -> None:
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.model_seconds = 0.0
+        self.model_calls = 0
+        # Set by TimedRoute when an endpoint returns content for FastAPI to serialize.
+        self.endpoint_returned_at: float | None = None
+
+    def server_timing(self, total_seconds: float) -> str:
+        return ", ".join(
+            [
+                f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries"',
+                f"pool;dur={self.pool_wait_seconds * 1000:.2f}",
+                f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+                f"model;dur={self.model_seconds * 1000:.2f}",
+                f"total;dur={total_seconds * 1000:.2f}",
+            ]
+        )
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current.get()
+
+
+@contextmanager
+def timed(kind: str) -> Iterator[None]:
+    """Add the block's wall time to the current request's "serialize" or "model" time."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if kind == "model":
+            timings.model_seconds += elapsed
+            timings.model_calls += 1
+        else:
+            timings.serialize_seconds += elapsed
+
+
+def record_pool_wait(seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.pool_wait_seconds += seconds
+
+
+def _returned(result: Any) -> Any:
+    timings = _current.get()
+    # A Response (e.g. FastJSONResponse) is already rendered and timed; FastAPI passes it through.
+    if timings is not None and not isinstance(result, Response):
+        timings.endpoint_returned_at = time.perf_counter()
+    return result
+
+
+def _mark_return(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # FastAPI unwraps the endpoint to pick the threadpool or not, so keep it sync or async.
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+            return _returned(await endpoint(*args, **kwargs))
+
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(*args: Any, **kwargs: Any) -> Any:
+        return _returned(endpoint(*args, **kwargs))
+
+    return sync_endpoint
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that counts FastAPI's own response work as serialization: response_model
+    validation, encoding and rendering, i.e. from the endpoint returning to the Response existing.
+
+    Use as route_class on every APIRouter (include_router keeps the included routes' class).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _mark_return(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response = await handler(request)
+            timings = _current.get()
+            if timings is not None and timings.endpoint_returned_at is not None:
+                timings.serialize_seconds += time.perf_counter() - timings.endpoint_returned_at
+                timings.endpoint_returned_at = None
+            return response
+
+        return timed_handler
+
+
+# SQLAlchemy hooks
+
+
+def _before_cursor_execute(conn: Any, *_args: Any) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, *_args: Any) -> None:
+    timings = _current.get()
+    starts = conn.info.get("metrics_query_start")
+    if timings is None or not starts:
+        return
+    timings.db_queries += 1
+    timings.db_seconds += time.perf_counter() - starts.pop()
+
+
+def _handle_error(exception_context: Any) -> None:
+    conn = exception_context.connection
+    starts = conn.info.get("metrics_query_start") if conn is not None else None
+    timings = _current.get()
+    if timings is not None and starts:
+        timings.db_queries += 1
+        timings.db_seconds += time.perf_counter() - starts.pop()
+
+
+_hooks_installed = False
+
+
+def install_db_hooks() -> None:
+    """Listen on the Engine class, so the primary, replicas and test engines are all covered."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _hooks_installed = True
+
+
+# Registry and Prometheus text format
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _labels(**labels: Any) -> str:
+    parts = []
+    for name, value in labels.items():
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{text}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.requests: dict[tuple[str, str, int], int] = {}
+        self.durations: dict[tuple[str, str], Histogram] = {}
+        self.stream_durations: dict[tuple[str, str], Histogram] = {}
+        self.queries: dict[str, Histogram] = {}
+        # (metric name, route) -> running total
+        self.totals: dict[tuple[str, str], float] = {}
+
+    def observe(
+        self, method: str, route: str, status: int, seconds: float, timings: RequestTimings, stream: bool = False
+    ) -> None:
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if stream:
+            self.stream_durations.setdefault((method, route), Histogram(STREAM_DURATION_BUCKETS)).observe(seconds)
+        else:
+            self.durations.setdefault((method, route), Histogram(DURATION_BUCKETS)).observe(seconds)
+        self.queries.setdefault(route, Histogram(QUERY_COUNT_BUCKETS)).observe(timings.db_queries)
+        for name, value in (
+            ("db_query_seconds_total", timings.db_seconds),
+            ("db_pool_wait_seconds_total", timings.pool_wait_seconds),
+            ("serialize_seconds_total", timings.serialize_seconds),
+            ("model_call_seconds_total", timings.model_seconds),
+            ("model_calls_total", timings.model_calls),
+        ):
+            self.totals[(name, route)] = self.totals.get((name, route), 0) + value
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        lines = ["# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), hist in sorted(self.durations.items()):
+            lines.extend(self._histogram("http_request_duration_seconds", hist, method=method, route=route))
+        lines.append("# TYPE http_stream_duration_seconds histogram")
+        for (method, route), hist in sorted(self.stream_durations.items()):
+            lines.extend(self._histogram("http_stream_duration_seconds", hist, method=method, route=route))
+        lines.append("# TYPE db_queries_per_request histogram")
+        for route, hist in sorted(self.queries.items()):
+            lines.extend(self._histogram("db_queries_per_request", hist, route=route))
+        for name in (
+            "db_query_seconds_total",
+            "db_pool_wait_seconds_total",
+            "serialize_seconds_total",
+            "model_call_seconds_total",
+            "model_calls_total",
+        ):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, route), value in sorted(self.totals.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(route=route)} {_number(value)}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram(name: str, hist: Histogram, **labels: Any) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**labels, le=_number(float(bound)))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {_number(hist.sum)}")
+        lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+        return lines
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no extra task per request, streaming bodies pass straight through)."""
+
+    def __init__(self, app: ASGIApp, registry: Registry) -> None:
+        self.app = app
+        self.registry = registry
+        self.enabled = metrics_enabled()
+        self.server_timing = server_timing_enabled()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+        stream = False
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                stream = headers.get("content-type", "").startswith("text/event-stream")
+                if self.server_timing:
+                    headers.append("Server-Timing", timings.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.registry.observe(
+                scope["method"], route_label(scope), status, time.perf_counter() - start, timings, stream
+            )
+
+
+def route_label(scope: Scope) -> str:
+    """The matched route's full template, e.g. "/tweets/{tweet_id}", or "unmatched".
+
+    Routes of included routers may only know their own part of the path ("/{tweet_id}"), so
+    the prefix is recovered from the request path with the route's own part substituted.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    path = scope.get("path", "")
+    if rendered and not path.endswith(rendered):
+        return path_format
+    prefix = path[: len(path) - len(rendered)] if rendered else path
+    return prefix + path_format
@@ -1,8 +1,8 @@
-"""ORM models matching chirper_full_schema.sql (users, tweets, likes, comments, follows, blocks, blacklisted_tokens)."""
+"""ORM models matching chirper_full_schema.sql (users, tweets, likes, comments, follows, blocks, blacklisted_tokens) plus derived tables (timeline_entries, sentiment_jobs, sentiment_cache, user_search_tokens, tweet_search_terms, pubsub_messages)."""
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, Float, ForeignKey, Index, String, Text, func
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -21,6 +21,12 @@ class User(Base):
     bio: Mapped[str | None] = mapped_column(Text, nullable=True)
     profile_picture: Mapped[str | None] = mapped_column(String(255), nullable=True)
     name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    follower_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by the user's likes/retweets; part of the ETag of pages they view (see conditional).
+    timeline_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    # Case-insensitive username prefix lookups in user search (see user_search).
+    __table_args__ = (Index("ix_users_username_lower", func.lower(username)),)
 
     if TYPE_CHECKING:
         tweets: list["Tweet"]
@@ -43,6 +49,13 @@ class Tweet(Base):
     sentiment_score: Mapped[float | None] = mapped_column(Float, nullable=True)
     sentiment_model: Mapped[str | None] = mapped_column(String(64), nullable=True)
     sentiment_analyzed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Denormalized engagement counters; repaired by python -m app.counters.
+    like_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    retweet_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    comment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped on every change to counters or sentiment; part of page ETags (see conditional).
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, onupdate=func.now())
 
     __table_args__ = (Index("ix_tweets_user_created", "user_id", "created_at", "id"),)
 
@@ -90,9 +103,88 @@ class Block(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
 
+class TimelineEntry(Base):
+    """Materialized home timeline row: tweet_id is visible in user_id's feed (fan-out on write)."""
+
+    __tablename__ = "timeline_entries"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_timeline_user_created", "user_id", "created_at", "tweet_id"),
+        Index("ix_timeline_user_author", "user_id", "author_id"),
+    )
+
+
+class SentimentJob(Base):
+    """Durable queue entry: tweet_id still needs sentiment analysis (see sentiment_worker)."""
+
+    __tablename__ = "sentiment_jobs"
+
+    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    last_error: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
+class SentimentCacheEntry(Base):
+    """Shared tier of the sentiment cache, keyed by sha256(model + normalized text)."""
+
+    __tablename__ = "sentiment_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    label: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    score: Mapped[float | None] = mapped_column(Float, nullable=True)
+    model: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class UserSearchToken(Base):
+    """Search index posting: user_id has a word in username or name producing `token` (see user_search)."""
+
+    __tablename__ = "user_search_tokens"
+
+    token: Mapped[str] = mapped_column(String(16), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (Index("ix_user_search_tokens_user_id", "user_id"),)
+
+
+class TweetSearchTerm(Base):
+    """Inverted index posting: `term` occurs `tf` times in tweet_id's text (see tweet_search)."""
+
+    __tablename__ = "tweet_search_terms"
+
+    term: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    tf: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    __table_args__ = (Index("ix_tweet_search_terms_tweet_id", "tweet_id"),)
+
+
 class BlacklistedToken(Base):
     __tablename__ = "blacklisted_tokens"
 
-    token: Mapped[str] = mapped_column(String(512), primary_key=True)
-    expiration_time: Mapped[int | None] = mapped_column(nullable=True)
+    # sha256 hex of the revoked JWT; fixed width regardless of token size.
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    expiration_time: Mapped[int | None] = mapped_column(nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
+class PubSubMessage(Base):
+    """Cross-worker message (cache invalidations etc.); see pubsub. Pruned after PUBSUB_RETENTION_SECONDS."""
+
+    __tablename__ = "pubsub_messages"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    channel: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    # Publishing process, so a worker skips its own messages (already delivered on commit).
+    origin: Mapped[str] = mapped_column(String(32), nullable=False)
+    # Unix seconds; integer so the poll window compares the same way on every dialect.
+    sent_at: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
@@ -0,0 +1,144 @@
+"""Cross-worker messages for in-process caches (and other subscribers) without extra infrastructure.
+
+publish() records a message in the caller's transaction and delivers it to this process's
+subscribers once that transaction commits, so nobody reloads state the database does not have yet.
+Other workers receive it from the pubsub_messages table, polled every PUBSUB_POLL_SECONDS by
+run_pubsub_poll (started in main.lifespan). PUBSUB_BACKEND=local skips the table for single-worker
+deployments. Rows older than PUBSUB_RETENTION_SECONDS are pruned by the poller.
+
+One PubSub lives on app.state (created in main.create_app).
+"""
+import asyncio
+from collections.abc import Callable
+import json
+import logging
+import os
+import time
+from typing import Any
+import uuid
+
+from fastapi import Request
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import PubSubMessage
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict[str, Any]], None]
+
+# Each poll re-reads this many seconds before the previous poll: a transaction that took its id
+# earlier but committed later is still picked up.
+POLL_LOOKBACK_SECONDS = 30
+
+
+def get_backend_name() -> str:
+    return os.getenv("PUBSUB_BACKEND", "database").strip().lower()
+
+
+def get_poll_seconds() -> float:
+    return float(os.getenv("PUBSUB_POLL_SECONDS", "1"))
+
+
+def get_retention_seconds() -> int:
+    return int(os.getenv("PUBSUB_RETENTION_SECONDS", "300"))
+
+
+class PubSub:
+    def __init__(self, backend: str | None = None, retention_seconds: int | None = None) -> None:
+        self.backend = backend if backend is not None else get_backend_name()
+        self.origin = uuid.uuid4().hex
+        self._retention = retention_seconds if retention_seconds is not None else get_retention_seconds()
+        self._handlers: dict[str, list[Handler]] = {}
+        # Message ids already delivered, with their sent_at; rows can commit out of id order,
+        # so the poller re-reads a time window and skips what it has seen.
+        self._seen: dict[int, int] = {}
+        self._since: int | None = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self._handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def deliver(self, channel: str, message: dict[str, Any]) -> None:
+        """Run this process's handlers for a message; a failing handler does not stop the others."""
+        for handler in list(self._handlers.get(channel, [])):
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("pubsub handler failed on channel %s", channel)
+
+    def publish(self, db: AsyncSession, channel: str, message: dict[str, Any], local: bool = False) -> None:
+        """Send `message` on `channel` when `db`'s transaction commits (dropped on rollback).
+        With local=True only this process's subscribers get it, whatever the backend."""
+        if self.backend != "local" and not local:
+            db.add(
+                PubSubMessage(
+                    channel=channel, payload=json.dumps(message), origin=self.origin, sent_at=int(time.time())
+                )
+            )
+        session = db.sync_session
+
+        def on_commit(_session: Any) -> None:
+            event.remove(session, "after_rollback", on_rollback)
+            self.deliver(channel, message)
+
+        def on_rollback(_session: Any) -> None:
+            # Otherwise the message would go out on the session's next, unrelated commit.
+            event.remove(session, "after_commit", on_commit)
+
+        event.listen(session, "after_commit", on_commit, once=True)
+        event.listen(session, "after_rollback", on_rollback, once=True)
+
+    async def poll(self, db: AsyncSession) -> int:
+        """Deliver messages published by other workers since the last poll; returns how many."""
+        now = int(time.time())
+        if self._since is None:
+            # Start from "now": earlier messages concern state this process never cached.
+            self._since = now
+            return 0
+        window_start = self._since - POLL_LOOKBACK_SECONDS
+        result = await db.execute(
+            select(PubSubMessage)
+            .where(PubSubMessage.sent_at >= window_start)
+            .order_by(PubSubMessage.id)
+        )
+        delivered = 0
+        for row in result.scalars().all():
+            if row.id in self._seen:
+                continue
+            self._seen[row.id] = row.sent_at
+            if row.origin == self.origin:
+                continue
+            try:
+                message = json.loads(row.payload)
+            except ValueError:
+                logger.warning("pubsub message %s is not valid JSON", row.id)
+                continue
+            self.deliver(row.channel, message)
+            delivered += 1
+        self._seen = {i: sent for i, sent in self._seen.items() if sent >= window_start}
+        self._since = now
+        await db.execute(delete(PubSubMessage).where(PubSubMessage.sent_at < now - self._retention))
+        await db.commit()
+        return delivered
+
+
+async def run_pubsub_poll(pubsub: PubSub, session_factory: async_sessionmaker[AsyncSession]) -> None:
+    interval = get_poll_seconds()
+    while True:
+        try:
+            async with session_factory() as session:
+                await pubsub.poll(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("pubsub poll failed")
+        await asyncio.sleep(interval)
+
+
+def get_pubsub(request: Request) -> PubSub:
+    return request.app.state.pubsub
@@ -0,0 +1,41 @@
+"""FastJSONResponse: encode plain dicts/lists once with orjson, skipping response_model validation.
+
+Hot list endpoints build rows as dicts in their schema's field order and return this response
+directly; tests/test_responses.py checks the output matches what the Pydantic models would emit.
+Falls back to the stdlib encoder when orjson is not installed.
+"""
+from datetime import date, datetime
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from .metrics import timed
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on environment
+    ORJSON_AVAILABLE = False
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        # OPT_UTC_Z renders UTC offsets as "Z", as Pydantic does.
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
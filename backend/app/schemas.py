@@ -77,6 +77,8 @@ class TweetRead(BaseModel):
     retweeted_by_me: bool = False
     like_count: int = 0
     liked_by_me: bool = False
+    retweet_count: int = 0
+    comment_count: int = 0
     sentiment_label: str | None = None
     sentiment_score: float | None = None
 
@@ -96,6 +98,42 @@ class FeedResponse(BaseModel):
     next_cursor: dict[str, Any] | None = None
 
 
+class FeedNewCountResponse(BaseModel):
+    count: int
+    # True when count stopped at FEED_NEW_COUNT_MAX.
+    capped: bool = False
+
+
+class ProfileResponse(BaseModel):
+    user: UserReadMinimal
+    tweets: list[TweetRead]
+    is_following: bool = False
+    is_blocked_by_me: bool = False
+    has_blocked_me: bool = False
+    next_cursor: dict[str, Any] | None = None
+
+
+class TweetSearchResponse(BaseModel):
+    items: list[TweetRead]
+    next_cursor: dict[str, Any] | None = None
+
+
+class TweetBatchResponse(BaseModel):
+    items: dict[int, TweetRead]
+    missing: list[int] = []
+
+
+class RelationshipRead(BaseModel):
+    is_following: bool = False
+    is_blocked_by_me: bool = False
+    has_blocked_me: bool = False
+
+
+class RelationshipsResponse(BaseModel):
+    items: dict[int, RelationshipRead]
+    missing: list[int] = []
+
+
 # ----- Comments -----
 class CommentCreate(BaseModel):
     contents: str = Field(..., max_length=240)
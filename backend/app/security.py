@@ -1,20 +1,46 @@
-"""Password hashing and JWT (sub=user id). Token blacklist check for logout."""
+"""Password hashing and JWT (sub=user id). Token blacklist check for logout, served from the auth cache."""
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import logging
 import os
+import time
+import uuid
 from typing import Any
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from .auth_cache import get_auth_cache, token_hash
 from .db import get_db_session
 from .models import BlacklistedToken, User
 
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+def get_password_hash_rounds() -> int | None:
+    """PASSWORD_HASH_ROUNDS; hashes with fewer rounds are upgraded on the next successful login."""
+    raw = os.getenv("PASSWORD_HASH_ROUNDS")
+    return int(raw) if raw else None
+
+
+def make_crypt_context(rounds: int | None = None) -> CryptContext:
+    if rounds is None:
+        return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+    )
+
+
+pwd_context = make_crypt_context(get_password_hash_rounds())
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
@@ -34,6 +60,15 @@ def get_access_token_exp_minutes() -> int:
     return int(raw)
 
 
+def get_hash_workers() -> int:
+    return int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+
+def get_hash_max_queue() -> int:
+    """Hash jobs allowed to wait for a worker before register/login shed load with 503."""
+    return int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -42,43 +77,135 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasher:
+    """Runs pbkdf2 off the event loop in a thread pool (hashlib releases the GIL while hashing),
+    with a bound on queued jobs so a login burst is rejected quickly instead of piling up."""
+
+    def __init__(self, workers: int | None = None, max_queue: int | None = None) -> None:
+        self._workers = workers if workers is not None else get_hash_workers()
+        self._max_pending = self._workers + (max_queue if max_queue is not None else get_hash_max_queue())
+        self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="password-hash")
+        self._pending = 0
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self._max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, try again",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """(valid, new hash or None); a new hash is returned when the stored one uses old parameters."""
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: PasswordHasher | None = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher()
+    return _hasher
+
+
+def shutdown_password_hasher() -> None:
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
+
+
 def create_access_token(data: dict[str, Any]) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=get_access_token_exp_minutes())
     to_encode["exp"] = expire
+    # Unique per token, so two logins in the same second never share (and co-revoke) a token.
+    to_encode["jti"] = uuid.uuid4().hex
     encoded = jwt.encode(to_encode, get_jwt_secret(), algorithm=get_jwt_algorithm())
     return encoded
 
 
+def get_token_purge_interval_seconds() -> float:
+    return float(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+
+
 async def is_token_blacklisted(token: str, db: AsyncSession) -> bool:
-    result = await db.execute(select(BlacklistedToken).where(BlacklistedToken.token == token))
-    row = result.scalar_one_or_none()
-    return row is not None
+    result = await db.execute(
+        select(BlacklistedToken.token_hash).where(BlacklistedToken.token_hash == token_hash(token))
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def purge_expired_tokens(db: AsyncSession) -> int:
+    """Delete blacklist rows whose token has expired anyway. Returns the number removed."""
+    result = await db.execute(
+        delete(BlacklistedToken).where(BlacklistedToken.expiration_time < int(time.time()))
+    )
+    await db.commit()
+    return result.rowcount or 0
+
+
+async def run_token_purge(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """Purge expired blacklist rows every TOKEN_PURGE_INTERVAL_SECONDS until cancelled."""
+    while True:
+        try:
+            async with session_factory() as db:
+                purged = await purge_expired_tokens(db)
+            if purged:
+                logger.info("Purged %s expired blacklisted tokens", purged)
+        except Exception:  # pragma: no cover - defensive
+            logger.exception("Failed to purge expired blacklisted tokens")
+        await asyncio.sleep(get_token_purge_interval_seconds())
+
+
+async def _authenticate(request: Request, token: str, db: AsyncSession) -> User | None:
+    """Resolve a bearer token to a user. On the hot path (synced revocations, cached claims and
+    user row) this runs no queries."""
+    cache = get_auth_cache(request)
+    if cache.needs_sync():
+        await cache.sync(db)
+    if cache.is_revoked(token):
+        return None
+    user_id = cache.get_claims(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, get_jwt_secret(), algorithms=[get_jwt_algorithm()])
+            sub = payload.get("sub")
+            if sub is None:
+                return None
+            user_id = int(sub)
+        except (JWTError, ValueError):
+            return None
+        exp = payload.get("exp")
+        cache.put_claims(token, user_id, int(exp) if exp is not None else None)
+    return await cache.get_user(db, user_id)
 
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db_session),
 ) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    if await is_token_blacklisted(token, db):
-        raise credentials_exception
-    try:
-        payload = jwt.decode(token, get_jwt_secret(), algorithms=[get_jwt_algorithm()])
-        sub = payload.get("sub")
-        if sub is None:
-            raise credentials_exception
-        user_id = int(sub)
-    except (JWTError, ValueError):
-        raise credentials_exception
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await _authenticate(request, token, db)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -86,21 +213,11 @@ oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error
 
 
 async def get_current_user_optional(
+    request: Request,
     token: str | None = Depends(oauth2_scheme_optional),
     db: AsyncSession = Depends(get_db_session),
 ) -> User | None:
     """Return current user if valid Bearer token present, else None. Use for optional auth."""
     if not token:
         return None
-    try:
-        if await is_token_blacklisted(token, db):
-            return None
-        payload = jwt.decode(token, get_jwt_secret(), algorithms=[get_jwt_algorithm()])
-        sub = payload.get("sub")
-        if sub is None:
-            return None
-        user_id = int(sub)
-    except (JWTError, ValueError):
-        return None
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+    return await _authenticate(request, token, db)
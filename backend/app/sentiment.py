@@ -0,0 +1,323 @@
+"""Sentiment analysis of tweet text: pluggable backends (Gemini REST API, local lexicon, hybrid)
+and micro-batching of many posts per call."""
+import asyncio
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
+from typing import Any, Protocol, Tuple
+
+from . import sentiment_local
+from .http_client import CircuitOpenError, get_outbound_client
+
+logger = logging.getLogger(__name__)
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Use the public Gemini REST model name that supports generateContent.
+# You can override this via the GEMINI_MODEL env var if needed.
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# GEMINI_API_BASE lets tests and staging point at a local fake Gemini server.
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+GEMINI_ENDPOINT = GEMINI_API_BASE.rstrip("/") + "/v1beta/models/{model}:generateContent"
+
+SentimentResult = Tuple[str | None, float | None, str | None]
+NO_SENTIMENT: SentimentResult = (None, None, None)
+
+SYSTEM_INSTRUCTION = (
+    "You are a sentiment analysis assistant. "
+    "Given a short social media post, respond with a single line of strict JSON in the form:\n"
+    '{"label": "positive" | "neutral" | "negative", "score": float}\n'
+    "Label should be the overall sentiment; score should be between -1.0 (very negative) and 1.0 (very positive). "
+    "Do not include any explanation or extra text."
+)
+
+BATCH_INSTRUCTION = (
+    "You are a sentiment analysis assistant. "
+    "You will receive a JSON array of short social media posts, each with an integer index. "
+    "Respond with a single strict JSON array containing one object per post in the form:\n"
+    '{"index": int, "label": "positive" | "neutral" | "negative", "score": float}\n'
+    "Label should be the overall sentiment; score should be between -1.0 (very negative) and 1.0 (very positive). "
+    "Do not include any explanation or extra text."
+)
+
+
+def get_backend_name() -> str:
+    """SENTIMENT_BACKEND: gemini (default), local, or hybrid (local first, Gemini for low confidence)."""
+    return os.getenv("SENTIMENT_BACKEND", "gemini").lower()
+
+
+def get_local_workers() -> int:
+    """Processes in the local scorer pool; 0 scores inline on the event loop thread."""
+    return int(os.getenv("SENTIMENT_LOCAL_WORKERS", "1"))
+
+
+def get_hybrid_min_confidence() -> float:
+    return float(os.getenv("SENTIMENT_HYBRID_MIN_CONFIDENCE", "0.3"))
+
+
+def sentiment_enabled() -> bool:
+    return get_backend_name() != "gemini" or bool(GEMINI_API_KEY)
+
+
+def get_batch_max_items() -> int:
+    return int(os.getenv("SENTIMENT_BATCH_MAX_ITEMS", "16"))
+
+
+def get_batch_max_wait_ms() -> float:
+    return float(os.getenv("SENTIMENT_BATCH_MAX_WAIT_MS", "50"))
+
+
+async def _generate_json(parts: list[str]) -> Any | None:
+    """POST one generateContent request and return the parsed JSON reply, or None on any failure."""
+    payload = {"contents": [{"parts": [{"text": part} for part in parts]}]}
+    url = GEMINI_ENDPOINT.format(model=GEMINI_MODEL)
+    try:
+        resp = await get_outbound_client().post(url, params={"key": GEMINI_API_KEY}, json=payload)
+        if resp.status_code != 200:
+            logger.error(
+                "Gemini sentiment request failed: status=%s body=%s",
+                resp.status_code,
+                resp.text[:500],
+            )
+            return None
+        data = resp.json()
+        candidates = data.get("candidates") or []
+        if not candidates:
+            logger.warning("Gemini sentiment response had no candidates: %s", data)
+            return None
+        content_parts = candidates[0].get("content", {}).get("parts") or []
+        if not content_parts:
+            logger.warning("Gemini sentiment candidate had no parts: %s", candidates[0])
+            return None
+        raw_text = content_parts[0].get("text", "").strip()
+
+        # Gemini sometimes wraps JSON in markdown code fences like ```json ... ```.
+        # Strip any leading/trailing fences before attempting to parse.
+        if raw_text.startswith("```"):
+            lines = raw_text.splitlines()
+            inner_lines: list[str] = []
+            for line in lines:
+                stripped = line.strip()
+                if stripped.startswith("```"):
+                    continue
+                inner_lines.append(line)
+            raw_text = "\n".join(inner_lines).strip()
+
+        try:
+            return json.loads(raw_text)
+        except json.JSONDecodeError as exc:
+            logger.error("Failed to parse Gemini sentiment JSON. raw_text=%r error=%s", raw_text, exc)
+            return None
+    except CircuitOpenError:
+        logger.debug("Gemini circuit breaker open; skipping sentiment request")
+        return None
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.exception("Error calling Gemini sentiment API: %s", exc)
+        return None
+
+
+def _to_result(sentiment: Any) -> SentimentResult:
+    if not isinstance(sentiment, dict):
+        logger.error("Gemini sentiment JSON was not an object: %r", sentiment)
+        return NO_SENTIMENT
+    label = str(sentiment.get("label")) if sentiment.get("label") is not None else None
+    score_value = sentiment.get("score")
+    try:
+        score = float(score_value) if score_value is not None else None
+    except (TypeError, ValueError):
+        logger.error("Gemini sentiment score was not a float: %r", score_value)
+        score = None
+    return label, score, GEMINI_MODEL
+
+
+async def analyze_sentiment_with_gemini(text: str) -> SentimentResult:
+    """Call Gemini to analyze sentiment for the given text.
+
+    Returns (label, score, model) or (None, None, None) on failure or if not configured.
+    """
+    if not text:
+        return NO_SENTIMENT
+    if not GEMINI_API_KEY:
+        logger.info("GEMINI_API_KEY not set; skipping sentiment analysis")
+        return NO_SENTIMENT
+    sentiment = await _generate_json([SYSTEM_INSTRUCTION, f"Post:\n{text}"])
+    if sentiment is None:
+        return NO_SENTIMENT
+    return _to_result(sentiment)
+
+
+async def analyze_sentiment_batch(texts: list[str]) -> list[SentimentResult]:
+    """Analyze many posts with one multi-item Gemini call.
+
+    The reply is demultiplexed by index; any post missing from an unparseable or partial reply
+    falls back to its own single-item call. Results are returned in input order.
+    """
+    results: list[SentimentResult] = [NO_SENTIMENT] * len(texts)
+    pending = [i for i, text in enumerate(texts) if text]
+    if not pending or not GEMINI_API_KEY:
+        return results
+    if len(pending) > 1:
+        posts = json.dumps([{"index": i, "text": texts[i]} for i in pending])
+        reply = await _generate_json([BATCH_INSTRUCTION, f"Posts:\n{posts}"])
+        if isinstance(reply, list):
+            for item in reply:
+                # type() rather than isinstance(): JSON true/false would pass as 1/0.
+                if isinstance(item, dict) and type(item.get("index")) is int and item["index"] in pending:
+                    results[item["index"]] = _to_result(item)
+        else:
+            logger.warning("Gemini batch sentiment reply unusable; falling back to single calls")
+        pending = [i for i in pending if results[i] == NO_SENTIMENT]
+    singles = await asyncio.gather(*(analyze_sentiment_with_gemini(texts[i]) for i in pending))
+    for i, result in zip(pending, singles):
+        results[i] = result
+    return results
+
+
+class SentimentBackend(Protocol):
+    name: str
+
+    async def analyze_batch(self, texts: list[str]) -> list[SentimentResult]: ...
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    async def analyze_batch(self, texts: list[str]) -> list[SentimentResult]:
+        return await analyze_sentiment_batch(texts)
+
+
+class LocalBackend:
+    """Lexicon scorer from sentiment_local, run in a process pool so scoring never blocks the loop."""
+
+    name = sentiment_local.LOCAL_MODEL
+
+    def __init__(self, workers: int | None = None) -> None:
+        self._workers = workers if workers is not None else get_local_workers()
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def score(self, texts: list[str]) -> list[tuple[str, float, float]]:
+        """(label, score, confidence) per text; empty texts are scored as neutral."""
+        if self._workers <= 0:
+            return sentiment_local.score_batch(texts)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, sentiment_local.score_batch, texts)
+
+    async def analyze_batch(self, texts: list[str]) -> list[SentimentResult]:
+        scored = await self.score(texts)
+        return [
+            (label, score, self.name) if text else NO_SENTIMENT
+            for text, (label, score, _confidence) in zip(texts, scored)
+        ]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class HybridBackend:
+    """Score locally; send only low-confidence posts to Gemini, keeping the local result if it fails."""
+
+    name = "hybrid"
+
+    def __init__(self, local: LocalBackend | None = None, min_confidence: float | None = None) -> None:
+        self.local = local or LocalBackend()
+        self._min_confidence = min_confidence if min_confidence is not None else get_hybrid_min_confidence()
+
+    async def analyze_batch(self, texts: list[str]) -> list[SentimentResult]:
+        scored = await self.local.score(texts)
+        results: list[SentimentResult] = [
+            (label, score, self.local.name) if text else NO_SENTIMENT
+            for text, (label, score, _confidence) in zip(texts, scored)
+        ]
+        unsure = [
+            i for i, (text, (_, _, confidence)) in enumerate(zip(texts, scored))
+            if text and confidence < self._min_confidence
+        ]
+        if unsure and GEMINI_API_KEY:
+            remote = await analyze_sentiment_batch([texts[i] for i in unsure])
+            for i, result in zip(unsure, remote):
+                if result != NO_SENTIMENT:
+                    results[i] = result
+        return results
+
+    def shutdown(self) -> None:
+        self.local.shutdown()
+
+
+_backend: SentimentBackend | None = None
+
+
+def get_sentiment_backend() -> SentimentBackend:
+    global _backend
+    if _backend is None:
+        name = get_backend_name()
+        if name == "local":
+            _backend = LocalBackend()
+        elif name == "hybrid":
+            _backend = HybridBackend()
+        else:
+            _backend = GeminiBackend()
+    return _backend
+
+
+def shutdown_sentiment_backend() -> None:
+    global _backend
+    if _backend is not None and hasattr(_backend, "shutdown"):
+        _backend.shutdown()
+    _backend = None
+
+
+class SentimentBatcher:
+    """Coalesce concurrent analyze() calls into batch calls on the configured backend.
+
+    A batch is sent when it reaches max_items or max_wait_ms after its first item arrived,
+    whichever comes first.
+    """
+
+    def __init__(
+        self,
+        max_items: int | None = None,
+        max_wait_ms: float | None = None,
+        analyze_batch: Callable[[list[str]], Awaitable[list[SentimentResult]]] | None = None,
+    ) -> None:
+        self._analyze_batch = analyze_batch
+        self._max_items = max_items if max_items is not None else get_batch_max_items()
+        self._max_wait = (max_wait_ms if max_wait_ms is not None else get_batch_max_wait_ms()) / 1000.0
+        self._pending: list[tuple[str, asyncio.Future[SentimentResult]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def analyze(self, text: str) -> SentimentResult:
+        future: asyncio.Future[SentimentResult] = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self._max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future[SentimentResult]]]) -> None:
+        try:
+            analyze_batch = self._analyze_batch or get_sentiment_backend().analyze_batch
+            results = await analyze_batch([text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,167 @@
+"""Content-addressed sentiment cache: identical (normalized) texts are scored by the model once.
+
+Keys are sha256(model or backend name + normalized text). Tier 1 is an in-process LRU with TTL and a size bound;
+tier 2 (SENTIMENT_CACHE_DB=1) is the shared sentiment_cache table, so previews and posts handled
+by different workers still share results. Only successful results are cached.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import hashlib
+import os
+import time
+import unicodedata
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import db as db_module
+from . import sentiment
+from .metrics import timed
+from .models import SentimentCacheEntry
+from .sentiment import NO_SENTIMENT, SentimentResult
+
+
+def get_cache_max_entries() -> int:
+    return int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "10000"))
+
+
+def get_cache_ttl_seconds() -> float:
+    return float(os.getenv("SENTIMENT_CACHE_TTL_SECONDS", "604800"))
+
+
+def shared_tier_enabled() -> bool:
+    return os.getenv("SENTIMENT_CACHE_DB", "0").lower() in ("1", "true", "yes")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def cache_key(text: str, model: str | None = None) -> str:
+    if model is None:
+        backend = sentiment.get_sentiment_backend()
+        model = sentiment.GEMINI_MODEL if isinstance(backend, sentiment.GeminiBackend) else backend.name
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: float | None = None,
+        session_factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self._max_entries = max_entries if max_entries is not None else get_cache_max_entries()
+        self._ttl = ttl_seconds if ttl_seconds is not None else get_cache_ttl_seconds()
+        self._session_factory = session_factory
+        self._entries: OrderedDict[str, tuple[float, SentimentResult]] = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+        }
+
+    def _get_local(self, key: str) -> SentimentResult | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self._ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put_local(self, key: str, result: SentimentResult) -> None:
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, keys: list[str]) -> dict[str, SentimentResult]:
+        if self._session_factory is None or not keys:
+            return {}
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self._ttl)
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(SentimentCacheEntry).where(
+                    SentimentCacheEntry.key.in_(keys), SentimentCacheEntry.created_at >= cutoff
+                )
+            )
+            return {row.key: (row.label, row.score, row.model) for row in result.scalars().all()}
+
+    async def _put_shared(self, results: dict[str, SentimentResult]) -> None:
+        if self._session_factory is None or not results:
+            return
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        async with self._session_factory() as db:
+            db.add_all(
+                SentimentCacheEntry(key=key, label=label, score=score, model=model, created_at=now)
+                for key, (label, score, model) in results.items()
+            )
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker stored the same text concurrently; the cache is best-effort.
+                await db.rollback()
+
+    async def analyze_batch(self, texts: list[str]) -> list[SentimentResult]:
+        """Like the backend's analyze_batch, but each distinct text hits the model at most once."""
+        keys = [cache_key(text) if text else "" for text in texts]
+        found: dict[str, SentimentResult] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(k for k in keys if k):
+            result = self._get_local(key)
+            if result is not None:
+                self.hits += 1
+                found[key] = result
+            else:
+                missing.append(key)
+        if missing:
+            shared = await self._get_shared(missing)
+            for key, result in shared.items():
+                self.shared_hits += 1
+                self._put_local(key, result)
+            found.update(shared)
+            missing = [key for key in missing if key not in shared]
+        if missing:
+            self.misses += len(missing)
+            wanted = set(missing)
+            first_text = {key: text for key, text in zip(keys, texts) if key in wanted}
+            with timed("model"):
+                computed = await sentiment.get_sentiment_backend().analyze_batch([first_text[key] for key in missing])
+            fresh = {key: result for key, result in zip(missing, computed) if result != NO_SENTIMENT}
+            for key, result in fresh.items():
+                self._put_local(key, result)
+            await self._put_shared(fresh)
+            found.update(zip(missing, computed))
+        return [found.get(key, NO_SENTIMENT) if key else NO_SENTIMENT for key in keys]
+
+    async def analyze(self, text: str) -> SentimentResult:
+        return (await self.analyze_batch([text]))[0]
+
+
+_cache: SentimentCache | None = None
+
+
+def get_sentiment_cache() -> SentimentCache:
+    """Process-wide cache; the shared tier uses the app's primary database when enabled."""
+    global _cache
+    if _cache is None:
+        session_factory = None
+        if shared_tier_enabled():
+            db_module.init_engine()
+            session_factory = db_module.SessionLocal
+        _cache = SentimentCache(session_factory=session_factory)
+    return _cache
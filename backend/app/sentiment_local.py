@@ -0,0 +1,64 @@
+"""Local CPU sentiment scorer: a small lexicon with negation and intensifiers, no network or model files.
+
+Functions here are pure and picklable so batches can be scored in a ProcessPoolExecutor.
+"""
+import math
+import re
+
+LOCAL_MODEL = "local-lexicon-v1"
+
+POSITIVE = frozenset(
+    """
+    amazing awesome beautiful best better brilliant calm celebrate cheerful congrats congratulations
+    cool delight delighted delightful enjoy enjoyed excellent excited exciting fantastic fun glad good
+    grateful great happy helpful hope hopeful impressive incredible inspiring kind laugh liked
+    love loved lovely lucky nice perfect pleased proud recommend relaxing success superb sweet thank
+    thanks thrilled wonderful win won wow yay yes
+    """.split()
+)
+
+NEGATIVE = frozenset(
+    """
+    angry annoyed annoying awful bad boring broken cry crying damn disappointed disappointing
+    disgusting dislike dreadful fail failed failure fear hate hated horrible hurt hurts lame lonely
+    lose lost mad miserable nope pain poor sad scared sick sorry stupid terrible tired ugly
+    unfair unhappy upset useless waste worse worst wrong
+    """.split()
+)
+
+NEGATIONS = frozenset("not no never none nobody nothing neither nor cannot without".split())
+INTENSIFIERS = {"very": 1.5, "so": 1.3, "really": 1.3, "extremely": 1.8, "super": 1.5, "totally": 1.4}
+EMOTICONS = {":)": 1.0, ":-)": 1.0, ":d": 1.2, "<3": 1.2, ":(": -1.0, ":-(": -1.0, ":'(": -1.2}
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|:\-?\)|:\-?\(|:'\(|:d|<3")
+
+
+def score_text(text: str) -> tuple[str, float, float]:
+    """Return (label, score in [-1, 1], confidence in [0, 1]) for one post."""
+    tokens = _TOKEN.findall(text.lower())
+    total = 0.0
+    hits = 0
+    for i, token in enumerate(tokens):
+        if token in EMOTICONS:
+            total += EMOTICONS[token]
+            hits += 1
+            continue
+        value = 1.0 if token in POSITIVE else -1.0 if token in NEGATIVE else 0.0
+        if value == 0.0:
+            continue
+        hits += 1
+        window = tokens[max(0, i - 3):i]
+        if window and window[-1] in INTENSIFIERS:
+            value *= INTENSIFIERS[window[-1]]
+        if any(w in NEGATIONS or w.endswith("n't") for w in window):
+            value *= -0.75
+        total += value
+    score = total / math.sqrt(total * total + 4.0) if hits else 0.0
+    label = "positive" if score >= 0.05 else "negative" if score <= -0.05 else "neutral"
+    confidence = abs(score) if hits else 0.0
+    return label, round(score, 4), round(confidence, 4)
+
+
+def score_batch(texts: list[str]) -> list[tuple[str, float, float]]:
+    """Score a whole batch in one call so a process-pool round trip covers many posts."""
+    return [score_text(text) for text in texts]
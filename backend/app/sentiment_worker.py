@@ -0,0 +1,211 @@
+"""Background sentiment analysis off the request path.
+
+create_tweet inserts a SentimentJob row in the same transaction as the tweet. A SentimentWorker
+(started in the app lifespan) claims due jobs with a short lease, analyzes them with bounded
+concurrency through the sentiment cache and a SentimentBatcher (many posts per model call) and
+either fills the tweet's sentiment_* columns or reschedules with exponential backoff. Jobs survive
+restarts: a crashed worker's leases expire and the jobs are claimed again.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import random
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import sentiment
+from .db import get_max_overflow, get_pool_size
+from .models import SentimentJob, Tweet
+from .sentiment_cache import get_sentiment_cache
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_concurrency() -> int:
+    """Jobs in flight per process; the batcher packs them into far fewer model calls.
+
+    The default stays at half of DB_POOL_SIZE + DB_MAX_OVERFLOW (at most 32): each job briefly
+    takes a connection to read its tweet and to store the result, and API requests need the rest.
+    """
+    default = min(32, max(1, (get_pool_size() + get_max_overflow()) // 2))
+    return int(os.getenv("SENTIMENT_WORKER_CONCURRENCY", str(default)))
+
+
+def get_max_attempts() -> int:
+    return int(os.getenv("SENTIMENT_MAX_ATTEMPTS", "5"))
+
+
+def get_retry_base_seconds() -> float:
+    return float(os.getenv("SENTIMENT_RETRY_BASE_SECONDS", "2"))
+
+
+def get_poll_seconds() -> float:
+    return float(os.getenv("SENTIMENT_POLL_SECONDS", "5"))
+
+
+def get_lease_seconds() -> float:
+    return float(os.getenv("SENTIMENT_LEASE_SECONDS", "60"))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at one hour."""
+    delay = get_retry_base_seconds() * (2 ** max(attempts - 1, 0))
+    return min(delay, 3600.0) * random.uniform(0.5, 1.5)
+
+
+def enqueue_sentiment(db: AsyncSession, tweet_id: int) -> None:
+    """Queue a tweet for analysis; committed together with the caller's transaction."""
+    db.add(SentimentJob(tweet_id=tweet_id, next_attempt_at=_utcnow()))
+
+
+_active_worker: "SentimentWorker | None" = None
+
+
+def notify_sentiment_worker() -> None:
+    """Wake this process's worker (if any) so a new job does not wait for the next poll."""
+    if _active_worker is not None:
+        _active_worker.notify()
+
+
+class SentimentWorker:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        concurrency: int | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._concurrency = concurrency if concurrency is not None else get_worker_concurrency()
+        self._batcher = sentiment.SentimentBatcher(analyze_batch=get_sentiment_cache().analyze_batch)
+        self._wakeup = asyncio.Event()
+        self._inflight: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def start(self) -> None:
+        global _active_worker
+        self._task = asyncio.create_task(self._run())
+        _active_worker = self
+
+    async def stop(self) -> None:
+        global _active_worker
+        if _active_worker is self:
+            _active_worker = None
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+        # Unfinished jobs keep their lease and are retried after it expires.
+        for task in list(self._inflight):
+            task.cancel()
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def run_once(self) -> int:
+        """Claim and process one round of due jobs. Returns the number of jobs claimed."""
+        tweet_ids = await self._claim(self._concurrency)
+        await asyncio.gather(*(self._process(tweet_id) for tweet_id in tweet_ids))
+        return len(tweet_ids)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            # Clear before claiming so a notify() that lands mid-claim is not lost.
+            self._wakeup.clear()
+            claimed: list[int] = []
+            free = self._concurrency - len(self._inflight)
+            if free > 0:
+                try:
+                    claimed = await self._claim(free)
+                except Exception:  # pragma: no cover - defensive
+                    logger.exception("Failed to claim sentiment jobs")
+            for tweet_id in claimed:
+                task = asyncio.create_task(self._process(tweet_id))
+                self._inflight.add(task)
+                task.add_done_callback(self._task_done)
+            if claimed and len(claimed) == free:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=get_poll_seconds())
+            except asyncio.TimeoutError:
+                pass
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        self._wakeup.set()
+        if not task.cancelled() and task.exception() is not None:
+            # The job keeps its lease and is claimed again once it expires.
+            logger.error("Sentiment job failed", exc_info=task.exception())
+
+    async def _claim(self, limit: int) -> list[int]:
+        """Lease up to `limit` due jobs. The conditional UPDATE makes claims safe across workers."""
+        now = _utcnow()
+        lease_until = now + timedelta(seconds=get_lease_seconds())
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(SentimentJob.tweet_id, SentimentJob.next_attempt_at)
+                .where(SentimentJob.next_attempt_at <= now)
+                .order_by(SentimentJob.next_attempt_at)
+                .limit(limit)
+            )
+            claimed: list[int] = []
+            for tweet_id, due in result.all():
+                leased = await db.execute(
+                    update(SentimentJob)
+                    .where(SentimentJob.tweet_id == tweet_id, SentimentJob.next_attempt_at == due)
+                    .values(next_attempt_at=lease_until)
+                )
+                if leased.rowcount:
+                    claimed.append(tweet_id)
+            await db.commit()
+        return claimed
+
+    async def _process(self, tweet_id: int) -> None:
+        # Sessions only around the reads and writes: a connection is never held across the model call.
+        async with self._session_factory() as db:
+            text = await db.scalar(select(Tweet.text).where(Tweet.id == tweet_id))
+            if not text:
+                await db.execute(delete(SentimentJob).where(SentimentJob.tweet_id == tweet_id))
+                await db.commit()
+                return
+        error: str | None = None
+        try:
+            label, score, model = await self._batcher.analyze(text)
+            if label is None and score is None:
+                error = "no sentiment returned"
+        except Exception as exc:
+            error = repr(exc)
+        async with self._session_factory() as db:
+            if error is None:
+                # Bump version in SQL: likes and retweets may have bumped it during the model call.
+                await db.execute(
+                    update(Tweet)
+                    .where(Tweet.id == tweet_id)
+                    .values(
+                        sentiment_label=label,
+                        sentiment_score=score,
+                        sentiment_model=model,
+                        sentiment_analyzed_at=_utcnow(),
+                        version=Tweet.version + 1,
+                    )
+                )
+                await db.execute(delete(SentimentJob).where(SentimentJob.tweet_id == tweet_id))
+                await db.commit()
+                return
+            job = await db.get(SentimentJob, tweet_id)
+            if job is None:
+                return
+            job.attempts += 1
+            job.last_error = error[:255]
+            if job.attempts >= get_max_attempts():
+                logger.warning("Giving up on sentiment for tweet %s after %s attempts: %s", tweet_id, job.attempts, error)
+                await db.delete(job)
+            else:
+                job.next_attempt_at = _utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+            await db.commit()
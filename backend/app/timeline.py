@@ -0,0 +1,283 @@
+"""Home timelines: fan-out on write into timeline_entries, fan-out on read for high-follower authors.
+
+Maintenance: python -m app.timeline rebuild | trim
+"""
+import argparse
+import asyncio
+from collections.abc import Collection, Sequence
+from datetime import datetime
+import os
+
+from sqlalchemy import DateTime, Row, and_, delete, desc, exists, func, insert, literal, or_, select, union, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import db as db_module
+from .models import Block, Follow, TimelineEntry, Tweet, User
+
+ENTRY_COLUMNS = ["user_id", "tweet_id", "author_id", "created_at"]
+
+
+def get_fanout_max_followers() -> int:
+    """Authors with more followers than this are merged into timelines at read time."""
+    return int(os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", "10000"))
+
+
+def get_timeline_max_entries() -> int:
+    return int(os.getenv("TIMELINE_MAX_ENTRIES", "800"))
+
+
+def get_timeline_backfill_limit() -> int:
+    return int(os.getenv("TIMELINE_BACKFILL_LIMIT", "200"))
+
+
+def get_new_count_max() -> int:
+    """GET /feed/new-count stops counting here (clients show "N+")."""
+    return int(os.getenv("FEED_NEW_COUNT_MAX", "99"))
+
+
+def not_blocked(user_col, author_col):
+    """SQL condition: neither user has blocked the other."""
+    return ~exists().where(
+        or_(
+            and_(Block.blocker_id == user_col, Block.blocked_id == author_col),
+            and_(Block.blocker_id == author_col, Block.blocked_id == user_col),
+        )
+    )
+
+
+async def fan_out_tweet(db: AsyncSession, tweet_id: int, author: User) -> None:
+    """Insert a new tweet (or retweet) into its author's timeline and, unless the author
+    is above the fan-out threshold, into every non-blocked follower's timeline."""
+    own = select(Tweet.user_id, Tweet.id, Tweet.user_id, Tweet.created_at).where(Tweet.id == tweet_id)
+    source = own
+    if author.follower_count <= get_fanout_max_followers():
+        followers = (
+            select(Follow.follower_id, Tweet.id, Tweet.user_id, Tweet.created_at)
+            .join(Tweet, Tweet.user_id == Follow.followee_id)
+            .where(Tweet.id == tweet_id)
+            .where(not_blocked(Follow.follower_id, Tweet.user_id))
+        )
+        source = union_all(own, followers)
+    await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, source))
+
+
+async def remove_tweets(db: AsyncSession, tweet_ids: Sequence[int]) -> None:
+    if tweet_ids:
+        await db.execute(delete(TimelineEntry).where(TimelineEntry.tweet_id.in_(tweet_ids)))
+
+
+async def backfill_author(db: AsyncSession, user_id: int, author: User) -> None:
+    """After user_id follows author: copy the author's most recent tweets into the timeline."""
+    if author.follower_count > get_fanout_max_followers():
+        return
+    already = select(TimelineEntry.tweet_id).where(
+        TimelineEntry.user_id == user_id, TimelineEntry.author_id == author.id
+    )
+    recent = (
+        select(literal(user_id), Tweet.id, Tweet.user_id, Tweet.created_at)
+        .where(Tweet.user_id == author.id)
+        .where(Tweet.id.not_in(already))
+        .where(not_blocked(literal(user_id), Tweet.user_id))
+        .order_by(desc(Tweet.created_at), desc(Tweet.id))
+        .limit(get_timeline_backfill_limit())
+    )
+    await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, recent))
+    await trim_timeline(db, user_id)
+
+
+async def remove_author(db: AsyncSession, user_id: int, author_id: int) -> None:
+    """After unfollow or block: drop author_id's tweets from user_id's timeline."""
+    await db.execute(
+        delete(TimelineEntry).where(TimelineEntry.user_id == user_id, TimelineEntry.author_id == author_id)
+    )
+
+
+async def trim_timeline(db: AsyncSession, user_id: int, keep: int | None = None) -> None:
+    """Keep only the newest `keep` entries of a user's timeline."""
+    keep = keep if keep is not None else get_timeline_max_entries()
+    # Derived table (not a bare LIMIT subquery) so MySQL accepts it in DELETE ... NOT IN.
+    newest = (
+        select(TimelineEntry.tweet_id)
+        .where(TimelineEntry.user_id == user_id)
+        .order_by(desc(TimelineEntry.created_at), desc(TimelineEntry.tweet_id))
+        .limit(keep)
+        .subquery()
+    )
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == user_id,
+            TimelineEntry.tweet_id.not_in(select(newest.c.tweet_id)),
+        )
+    )
+
+
+async def read_home_timeline(
+    db: AsyncSession,
+    viewer_id: int,
+    limit: int,
+    before: tuple[datetime, int] | None = None,
+    hidden: Collection[int] | None = None,
+) -> list[Row]:
+    """Return up to limit + 1 (Tweet, username) rows, newest first.
+
+    One range scan on ix_timeline_user_created, merged with the recent tweets of followed
+    authors above the fan-out threshold (those are not materialized). `hidden` is the viewer's
+    precomputed block set (see block_cache); without it blocks are checked in SQL.
+    """
+    stmt = (
+        select(Tweet, User.username)
+        .join(TimelineEntry, TimelineEntry.tweet_id == Tweet.id)
+        .join(User, User.id == Tweet.user_id)
+        .where(TimelineEntry.user_id == viewer_id)
+        .order_by(desc(TimelineEntry.created_at), desc(TimelineEntry.tweet_id))
+        .limit(limit + 1)
+    )
+    if before is not None:
+        before_ts, before_id = before
+        stmt = stmt.where(
+            or_(
+                TimelineEntry.created_at < before_ts,
+                and_(TimelineEntry.created_at == before_ts, TimelineEntry.tweet_id < before_id),
+            )
+        )
+    rows = list((await db.execute(stmt)).all())
+
+    pulled = (
+        select(Follow.followee_id)
+        .join(User, User.id == Follow.followee_id)
+        .where(Follow.follower_id == viewer_id)
+        .where(User.follower_count > get_fanout_max_followers())
+    )
+    if hidden is None:
+        pulled = pulled.where(not_blocked(Follow.follower_id, Follow.followee_id))
+    elif hidden:
+        pulled = pulled.where(Follow.followee_id.not_in(hidden))
+    result = await db.execute(pulled)
+    pulled_ids = result.scalars().all()
+    if pulled_ids:
+        pull = (
+            select(Tweet, User.username)
+            .join(User, User.id == Tweet.user_id)
+            .where(Tweet.user_id.in_(pulled_ids))
+            .order_by(desc(Tweet.created_at), desc(Tweet.id))
+            .limit(limit + 1)
+        )
+        if before is not None:
+            pull = pull.where(
+                or_(
+                    Tweet.created_at < before_ts,
+                    and_(Tweet.created_at == before_ts, Tweet.id < before_id),
+                )
+            )
+        seen = {tweet.id for tweet, _ in rows}
+        rows.extend(row for row in (await db.execute(pull)).all() if row[0].id not in seen)
+        rows.sort(key=lambda row: (row[0].created_at, row[0].id), reverse=True)
+    return rows[: limit + 1]
+
+
+async def count_new_entries(
+    db: AsyncSession,
+    viewer_id: int,
+    after_id: int,
+    after_created_at: datetime | None,
+    cap: int,
+    hidden: Collection[int] | None = None,
+) -> int:
+    """How many feed items are newer than (after_created_at, after_id), counting at most `cap`.
+
+    One statement: a LIMITed range scan on ix_timeline_user_created plus the same for followed
+    authors above the fan-out threshold, so the cost is bounded by `cap`, not the timeline size.
+    """
+    # The cursor tweet's stored created_at keeps the keyset exact on every dialect; the client's
+    # timestamp is only used if that tweet is gone, and without either everything counts.
+    after_ts = func.coalesce(
+        select(Tweet.created_at).where(Tweet.id == after_id).scalar_subquery(),
+        literal(after_created_at or datetime(1970, 1, 1), DateTime),
+    )
+    materialized = (
+        select(TimelineEntry.tweet_id)
+        .where(TimelineEntry.user_id == viewer_id)
+        .where(
+            or_(
+                TimelineEntry.created_at > after_ts,
+                and_(TimelineEntry.created_at == after_ts, TimelineEntry.tweet_id > after_id),
+            )
+        )
+        .limit(cap)
+    )
+    pulled_authors = (
+        select(Follow.followee_id)
+        .join(User, User.id == Follow.followee_id)
+        .where(Follow.follower_id == viewer_id)
+        .where(User.follower_count > get_fanout_max_followers())
+    )
+    if hidden is None:
+        pulled_authors = pulled_authors.where(not_blocked(Follow.follower_id, Follow.followee_id))
+    elif hidden:
+        pulled_authors = pulled_authors.where(Follow.followee_id.not_in(hidden))
+    pulled = (
+        select(Tweet.id)
+        .where(Tweet.user_id.in_(pulled_authors))
+        .where(or_(Tweet.created_at > after_ts, and_(Tweet.created_at == after_ts, Tweet.id > after_id)))
+        .limit(cap)
+    )
+    # UNION, not UNION ALL: an author who crossed the threshold can be in both.
+    newer = union(materialized.subquery().select(), pulled.subquery().select()).subquery()
+    total = await db.scalar(select(func.count()).select_from(newer))
+    return min(total or 0, cap)
+
+
+async def rebuild_timelines(db: AsyncSession) -> None:
+    """Recompute follower counts and every materialized timeline from follows and tweets."""
+    await db.execute(
+        update(User).values(
+            follower_count=select(func.count())
+            .select_from(Follow)
+            .where(Follow.followee_id == User.id)
+            .scalar_subquery()
+        )
+    )
+    await db.execute(delete(TimelineEntry))
+    own = select(Tweet.user_id, Tweet.id, Tweet.user_id, Tweet.created_at)
+    followers = (
+        select(Follow.follower_id, Tweet.id, Tweet.user_id, Tweet.created_at)
+        .join(Tweet, Tweet.user_id == Follow.followee_id)
+        .join(User, User.id == Follow.followee_id)
+        .where(User.follower_count <= get_fanout_max_followers())
+        .where(not_blocked(Follow.follower_id, Follow.followee_id))
+    )
+    await db.execute(insert(TimelineEntry).from_select(ENTRY_COLUMNS, union_all(own, followers)))
+    await trim_timelines(db)
+
+
+async def trim_timelines(db: AsyncSession) -> None:
+    """Trim every timeline that has grown past TIMELINE_MAX_ENTRIES."""
+    keep = get_timeline_max_entries()
+    result = await db.execute(
+        select(TimelineEntry.user_id).group_by(TimelineEntry.user_id).having(func.count() > keep)
+    )
+    for user_id in result.scalars().all():
+        await trim_timeline(db, user_id, keep)
+
+
+async def _run(command: str) -> None:
+    db_module.init_engine()
+    assert db_module.SessionLocal is not None and db_module.engine is not None
+    async with db_module.SessionLocal() as session:
+        if command == "rebuild":
+            await rebuild_timelines(session)
+        else:
+            await trim_timelines(session)
+        await session.commit()
+    await db_module.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Home timeline maintenance jobs.")
+    parser.add_argument("command", choices=["rebuild", "trim"])
+    args = parser.parse_args()
+    asyncio.run(_run(args.command))
+
+
+if __name__ == "__main__":
+    main()
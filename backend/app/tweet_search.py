@@ -0,0 +1,150 @@
+"""Tweet full-text search: an inverted index (tweet_search_terms) over Tweet.text.
+
+create_tweet indexes the text in the same transaction; delete_tweet removes the postings.
+A query matches tweets containing any of its terms. Results are ranked by how many distinct
+query terms a tweet contains, then by how often they occur, then newest first. That ranking is
+an integer, so pages use a (score, tweet id) keyset cursor.
+
+Usage: python -m app.tweet_search rebuild [--batch-size N]
+"""
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Collection
+import re
+import unicodedata
+
+from sqlalchemy import Row, and_, delete, desc, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import db as db_module
+from .models import Tweet, TweetSearchTerm, User
+from .timeline import not_blocked
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+# Per-term frequency cap, so score = matched terms * 100 + sum(tf) keeps terms matched dominant.
+MAX_TF = 9
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its my of on or so that the this "
+    "to was we were will with you your".split()
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    words = _WORD.findall(unicodedata.normalize("NFKC", text).lower())
+    return [w for w in words if 2 <= len(w) <= MAX_TERM_LENGTH and w not in STOPWORDS]
+
+
+def postings_for(tweet_id: int, author_id: int, text: str | None) -> list[dict]:
+    counts = Counter(tokenize(text))
+    return [
+        {"term": term, "tweet_id": tweet_id, "author_id": author_id, "tf": min(tf, MAX_TF)}
+        for term, tf in counts.items()
+    ]
+
+
+async def index_tweet(db: AsyncSession, tweet: Tweet) -> None:
+    """Add postings for a newly inserted tweet (flushed, so it has an id)."""
+    postings = postings_for(tweet.id, tweet.user_id, tweet.text)
+    if postings:
+        await db.execute(insert(TweetSearchTerm), postings)
+
+
+async def unindex_tweets(db: AsyncSession, tweet_ids: list[int]) -> None:
+    if tweet_ids:
+        await db.execute(delete(TweetSearchTerm).where(TweetSearchTerm.tweet_id.in_(tweet_ids)))
+
+
+async def search_tweets(
+    db: AsyncSession,
+    q: str,
+    viewer_id: int,
+    limit: int,
+    author_id: int | None = None,
+    sentiment: str | None = None,
+    before: tuple[int, int] | None = None,
+    hidden: Collection[int] | None = None,
+) -> list[Row]:
+    """Return up to limit + 1 rows of (Tweet, username, score), best first.
+
+    Tweets by users the viewer blocked, or who blocked the viewer, are excluded: by `hidden`
+    (the viewer's precomputed block set, see block_cache) when given, else in SQL.
+    """
+    terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    score = (func.count(TweetSearchTerm.term) * 100 + func.sum(TweetSearchTerm.tf)).label("score")
+    matches = (
+        select(TweetSearchTerm.tweet_id, score)
+        .where(TweetSearchTerm.term.in_(terms))
+        .group_by(TweetSearchTerm.tweet_id)
+    )
+    if hidden is None:
+        matches = matches.where(not_blocked(literal(viewer_id), TweetSearchTerm.author_id))
+    elif hidden:
+        matches = matches.where(TweetSearchTerm.author_id.not_in(hidden))
+    if author_id is not None:
+        matches = matches.where(TweetSearchTerm.author_id == author_id)
+    if sentiment is not None:
+        matches = matches.join(Tweet, Tweet.id == TweetSearchTerm.tweet_id).where(Tweet.sentiment_label == sentiment)
+    if before is not None:
+        before_score, before_id = before
+        matches = matches.having(
+            or_(score < before_score, and_(score == before_score, TweetSearchTerm.tweet_id < before_id))
+        )
+    matches = matches.order_by(desc(score), desc(TweetSearchTerm.tweet_id)).limit(limit + 1).subquery()
+    result = await db.execute(
+        select(Tweet, User.username, matches.c.score)
+        .join(matches, matches.c.tweet_id == Tweet.id)
+        .join(User, User.id == Tweet.user_id)
+        .order_by(desc(matches.c.score), desc(Tweet.id))
+    )
+    return list(result.all())
+
+
+async def rebuild_index(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Rebuild postings for every tweet in id-ordered batches. Returns the number of tweets indexed."""
+    await db.execute(delete(TweetSearchTerm))
+    indexed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Tweet.id, Tweet.user_id, Tweet.text).where(Tweet.id > last_id).order_by(Tweet.id).limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        postings = [p for tweet_id, user_id, text in rows for p in postings_for(tweet_id, user_id, text)]
+        if postings:
+            await db.execute(insert(TweetSearchTerm), postings)
+        await db.commit()
+        indexed += len(rows)
+    return indexed
+
+
+async def _run(batch_size: int) -> None:
+    db_module.init_engine()
+    assert db_module.SessionLocal is not None and db_module.engine is not None
+    async with db_module.SessionLocal() as session:
+        indexed = await rebuild_index(session, batch_size)
+    await db_module.engine.dispose()
+    print(f"indexed {indexed} tweets")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tweet search index maintenance.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""User search index: trigram and short-prefix tokens of username and name words in user_search_tokens.
+
+A query word of three or more characters matches users holding all of its trigrams; shorter
+words match the "^" prefix tokens. Index hits are capped, so usernames starting with the first
+word are added from a range scan of ix_users_username_lower (shortest first): the exact and prefix
+matches survive a broad query. Candidates are then checked with a substring test and ranked
+(exact username, username prefix, name prefix, name word prefix, other substring), so only the
+candidate rows are ever scanned rather than the whole users table.
+
+Usage: python -m app.user_search rebuild [--batch-size N]
+"""
+import argparse
+import asyncio
+import os
+import unicodedata
+
+from sqlalchemy import case, delete, func, insert, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import db as db_module
+from .models import User, UserSearchToken
+
+PREFIX_MAX = 2
+
+
+def get_candidate_limit() -> int:
+    """Index hits ranked per query; bounds the work for very broad queries like a single letter."""
+    return int(os.getenv("USER_SEARCH_CANDIDATES", "1000"))
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _words(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return normalize(text).replace("_", " ").split()
+
+
+def tokens_for(username: str, name: str | None) -> set[str]:
+    """All index tokens for a user: "^"-prefixes up to PREFIX_MAX chars and trigrams of each word.
+
+    The full username is also indexed as one word so queries spanning an underscore still match.
+    """
+    tokens: set[str] = set()
+    words = _words(username) + _words(name) + [normalize(username)]
+    for word in words:
+        for k in range(1, min(len(word), PREFIX_MAX) + 1):
+            tokens.add("^" + word[:k])
+        tokens.update(word[i:i + 3] for i in range(len(word) - 2))
+    return tokens
+
+
+def query_tokens(word: str) -> set[str]:
+    if len(word) < 3:
+        return {"^" + word}
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+async def index_user(db: AsyncSession, user: User, replace: bool = True) -> None:
+    """(Re)write the user's postings; call after username or name changes, before commit.
+    Pass replace=False for a user that has just been inserted."""
+    if replace:
+        await db.execute(delete(UserSearchToken).where(UserSearchToken.user_id == user.id))
+    tokens = tokens_for(user.username, user.name)
+    if tokens:
+        await db.execute(insert(UserSearchToken), [{"token": t, "user_id": user.id} for t in tokens])
+
+
+async def search_users(db: AsyncSession, q: str, limit: int) -> list[User]:
+    words = normalize(q).split()
+    if not words:
+        return []
+    required = set().union(*(query_tokens(w) for w in words))
+    candidates = select(UserSearchToken.user_id).where(UserSearchToken.token.in_(required))
+    if len(required) > 1:
+        candidates = candidates.group_by(UserSearchToken.user_id).having(
+            func.count(UserSearchToken.token.distinct()) == len(required)
+        )
+    username = func.lower(User.username)
+    name = func.lower(func.coalesce(User.name, ""))
+    first = words[0]
+    # A range rather than LIKE so the expression index is used whatever the collation.
+    prefixed = (
+        select(User.id.label("user_id"))
+        .where(username >= first, username < first + "\uffff")
+        .order_by(func.length(User.username), username)
+    )
+    hits = candidates.limit(get_candidate_limit()).subquery()
+    prefixed = prefixed.limit(get_candidate_limit()).subquery()
+    candidates = union(select(prefixed.c.user_id), select(hits.c.user_id)).subquery()
+
+    rank = case(
+        (username == first, 0),
+        (username.startswith(first, autoescape=True), 1),
+        (name.startswith(first, autoescape=True), 2),
+        (name.contains(" " + first, autoescape=True), 3),
+        else_=4,
+    )
+    stmt = select(User).join(candidates, candidates.c.user_id == User.id)
+    for word in words:
+        # Trigram hits are necessary, not sufficient; confirm the substring on candidates only.
+        stmt = stmt.where(or_(username.contains(word, autoescape=True), name.contains(word, autoescape=True)))
+    stmt = stmt.order_by(rank, func.length(User.username), User.username).limit(limit)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def rebuild_index(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Rebuild postings for every user in id-ordered batches. Returns the number of users indexed."""
+    await db.execute(delete(UserSearchToken))
+    indexed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User.id, User.username, User.name).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        postings = [
+            {"token": token, "user_id": user_id}
+            for user_id, username, name in rows
+            for token in tokens_for(username, name)
+        ]
+        if postings:
+            await db.execute(insert(UserSearchToken), postings)
+        await db.commit()
+        indexed += len(rows)
+    return indexed
+
+
+async def _run(batch_size: int) -> None:
+    db_module.init_engine()
+    assert db_module.SessionLocal is not None and db_module.engine is not None
+    async with db_module.SessionLocal() as session:
+        indexed = await rebuild_index(session, batch_size)
+    await db_module.engine.dispose()
+    print(f"indexed {indexed} users")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="User search index maintenance.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
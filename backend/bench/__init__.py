@@ -0,0 +1,11 @@
+"""Reproducible load tests for the API.
+
+    python -m bench generate --database-url sqlite+aiosqlite:///bench.db --users 2000 --reset
+    python -m bench run --database-url sqlite+aiosqlite:///bench.db --mix read-heavy --duration 30
+    python -m bench compare bench/results/<base>.json bench/results/<head>.json
+
+generate builds a deterministic dataset (dataset.py), run drives it with concurrent virtual
+users (driver.py) and writes a JSON report with per-endpoint req/s and p50/p95/p99 under
+bench/results/ (report.py); compare prints the per-endpoint change between two reports.
+Run from backend/ so both `app` and `bench` are importable.
+"""
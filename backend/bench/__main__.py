@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import os
+
+from . import report
+from .dataset import DatasetConfig, generate
+from .driver import MIXES, RunConfig, run
+
+
+def _database_url(value: str | None) -> str:
+    url = value or os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("pass --database-url or set DATABASE_URL")
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Dataset generation and load tests.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="create and fill a benchmark database")
+    gen.add_argument("--database-url")
+    gen.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    defaults = DatasetConfig()
+    gen.add_argument("--users", type=int, default=defaults.users)
+    gen.add_argument("--seed", type=int, default=defaults.seed)
+    gen.add_argument("--tweets-per-user", type=float, default=defaults.tweets_per_user)
+    gen.add_argument("--follows-per-user", type=float, default=defaults.follows_per_user)
+    gen.add_argument("--likes-per-tweet", type=float, default=defaults.likes_per_tweet)
+
+    drive = sub.add_parser("run", help="run a traffic mix and write a JSON report")
+    drive.add_argument("--database-url")
+    drive.add_argument("--mix", choices=sorted(MIXES), default="read-heavy")
+    drive.add_argument("--concurrency", type=int, default=20)
+    drive.add_argument("--duration", type=float, default=30.0, help="seconds of measured traffic")
+    drive.add_argument("--warmup", type=float, default=2.0, help="seconds of unrecorded traffic first")
+    drive.add_argument("--requests", type=int, help="stop after this many recorded requests")
+    drive.add_argument("--seed", type=int, default=1)
+    drive.add_argument("--mode", choices=["asgi", "uvicorn", "url"], default="asgi")
+    drive.add_argument("--base-url", help="server to drive with --mode url")
+    drive.add_argument("--output", help="report path (default bench/results/<time>-<commit>-<mix>.json)")
+
+    cmp = sub.add_parser("compare", help="compare two JSON reports")
+    cmp.add_argument("base")
+    cmp.add_argument("head")
+    cmp.add_argument("--json", action="store_true", help="print the comparison as JSON")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        config = DatasetConfig(
+            users=args.users,
+            seed=args.seed,
+            tweets_per_user=args.tweets_per_user,
+            follows_per_user=args.follows_per_user,
+            likes_per_tweet=args.likes_per_tweet,
+        )
+        print(json.dumps(asyncio.run(generate(_database_url(args.database_url), config, args.reset)), indent=2))
+    elif args.command == "run":
+        config = RunConfig(
+            database_url=_database_url(args.database_url),
+            mix=args.mix,
+            concurrency=args.concurrency,
+            duration_seconds=args.duration,
+            warmup_seconds=args.warmup,
+            max_requests=args.requests,
+            seed=args.seed,
+            mode=args.mode,
+            base_url=args.base_url,
+        )
+        result = report.build_report(asyncio.run(run(config)), config)
+        print(report.format_table(result))
+        print(f"saved {report.save(result, args.output)}")
+    else:
+        base, head = report.load(args.base), report.load(args.head)
+        if args.json:
+            print(json.dumps(report.compare(base, head), indent=2))
+        else:
+            print(report.format_comparison(base, head))
+
+
+if __name__ == "__main__":
+    main()
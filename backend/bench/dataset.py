@@ -0,0 +1,244 @@
+"""Deterministic synthetic dataset: users, a power-law follow graph, tweets, likes, retweets,
+comments and blocks, plus the derived tables (timelines, search indexes, counters).
+
+The same --seed and sizes always produce the same rows (password salts aside), so runs against
+different commits measure the code, not the data. Timestamps are spread over the days before a
+fixed epoch rather than "now" for the same reason.
+
+Usage: python -m bench generate --database-url sqlite+aiosqlite:///bench.db --users 2000 [--reset]
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+import itertools
+import random
+import time
+from typing import Any
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app import tweet_search, user_search
+from app.db import build_engine
+from app.models import Base, Block, Comment, Follow, Like, Tweet, User
+from app.security import pwd_context
+from app.sentiment_local import LOCAL_MODEL, score_text
+from app.timeline import rebuild_timelines
+
+# Every generated user logs in with this password (the load driver relies on it).
+PASSWORD = "benchpass123"
+EPOCH = datetime(2024, 1, 1)
+INSERT_BATCH = 1000
+
+WORDS = (
+    "coffee morning rain python async database latency cache deploy weekend music concert "
+    "football match travel train city coffee lunch pizza garden book movie launch release bug "
+    "fix review team meeting happy great love awesome terrible awful slow fast broken finally "
+    "today tomorrow night sunset beach mountain code api feed search timeline chirp friends"
+).split()
+FIRST_NAMES = "ada alan grace linus guido barbara ken dennis margaret edsger donald frances".split()
+LAST_NAMES = "lovelace turing hopper torvalds rossum liskov thompson ritchie hamilton knuth allen".split()
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 1000
+    seed: int = 42
+    tweets_per_user: float = 20.0
+    follows_per_user: float = 30.0
+    # Zipf exponent for who gets followed / liked; ~1 gives a few celebrities and a long tail.
+    popularity_exponent: float = 1.1
+    likes_per_tweet: float = 3.0
+    retweet_ratio: float = 0.05
+    comments_per_tweet: float = 0.3
+    block_ratio: float = 0.01
+    days: int = 30
+
+
+def _zipf_cum_weights(n: int, exponent: float) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def _activity(rng: random.Random, mean: float) -> int:
+    """Heavy-tailed per-user count with the given mean (Pareto, alpha 2)."""
+    return int(mean / 2 * rng.paretovariate(2.0))
+
+
+def _text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))[:240]
+
+
+def generate_rows(config: DatasetConfig, password_hash: str) -> dict[str, list[dict[str, Any]]]:
+    """Build every row in memory; counters and follower counts are computed here, not repaired later."""
+    rng = random.Random(config.seed)
+    n = config.users
+    span = timedelta(days=config.days).total_seconds()
+
+    def timestamp() -> datetime:
+        return EPOCH - timedelta(seconds=rng.uniform(0, span))
+
+    users = [
+        {
+            "id": uid,
+            "username": f"user{uid:06d}",
+            "name": f"{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}",
+            "email": f"user{uid:06d}@bench.example",
+            "password_hash": password_hash,
+            "bio": _text(rng) if rng.random() < 0.5 else None,
+            "created_at": EPOCH - timedelta(days=config.days + rng.randint(1, 365)),
+            "follower_count": 0,
+        }
+        for uid in range(1, n + 1)
+    ]
+
+    # Popularity rank is a shuffled permutation so celebrities are not simply the lowest ids.
+    by_popularity = list(range(1, n + 1))
+    rng.shuffle(by_popularity)
+    cum_weights = _zipf_cum_weights(n, config.popularity_exponent)
+
+    follows: set[tuple[int, int]] = set()
+    for follower in range(1, n + 1):
+        wanted = min(_activity(rng, config.follows_per_user), n - 1)
+        for followee in rng.choices(by_popularity, cum_weights=cum_weights, k=wanted):
+            if followee != follower:
+                follows.add((follower, followee))
+    follower_counts: dict[int, int] = {}
+    for _follower, followee in follows:
+        follower_counts[followee] = follower_counts.get(followee, 0) + 1
+    for user in users:
+        user["follower_count"] = follower_counts.get(user["id"], 0)
+
+    tweets: list[dict[str, Any]] = []
+    for uid in range(1, n + 1):
+        for _ in range(_activity(rng, config.tweets_per_user)):
+            text = _text(rng)
+            label, score, _confidence = score_text(text)
+            tweets.append(
+                {
+                    "user_id": uid,
+                    "text": text,
+                    "created_at": timestamp(),
+                    "retweeted_from": None,
+                    "sentiment_label": label,
+                    "sentiment_score": score,
+                    "sentiment_model": LOCAL_MODEL,
+                    "like_count": 0,
+                    "retweet_count": 0,
+                    "comment_count": 0,
+                }
+            )
+    # Ids in time order, like a live system.
+    tweets.sort(key=lambda row: row["created_at"])
+    for tweet_id, tweet in enumerate(tweets, start=1):
+        tweet["id"] = tweet_id
+    originals = list(tweets)
+
+    likes: set[tuple[int, int]] = set()
+    comments: list[dict[str, Any]] = []
+    retweets: list[dict[str, Any]] = []
+    retweeted: set[tuple[int, int]] = set()
+    if originals:
+        tweet_weights = _zipf_cum_weights(len(originals), config.popularity_exponent)
+        tweet_order = list(range(len(originals)))
+        rng.shuffle(tweet_order)
+        targets = rng.choices(tweet_order, cum_weights=tweet_weights, k=int(len(originals) * config.likes_per_tweet))
+        for index in targets:
+            user_id = rng.randint(1, n)
+            if (originals[index]["id"], user_id) not in likes:
+                likes.add((originals[index]["id"], user_id))
+                originals[index]["like_count"] += 1
+        for index in rng.choices(tweet_order, cum_weights=tweet_weights, k=int(len(originals) * config.retweet_ratio)):
+            original = originals[index]
+            user_id = rng.randint(1, n)
+            if user_id == original["user_id"] or (user_id, original["id"]) in retweeted:
+                continue
+            retweeted.add((user_id, original["id"]))
+            original["retweet_count"] += 1
+            retweets.append(
+                {
+                    "user_id": user_id,
+                    "text": None,
+                    "created_at": min(original["created_at"] + timedelta(minutes=rng.randint(1, 600)), EPOCH),
+                    "retweeted_from": original["id"],
+                    "sentiment_label": None,
+                    "sentiment_score": None,
+                    "sentiment_model": None,
+                    "like_count": 0,
+                    "retweet_count": 0,
+                    "comment_count": 0,
+                }
+            )
+        for index in rng.choices(tweet_order, cum_weights=tweet_weights, k=int(len(originals) * config.comments_per_tweet)):
+            original = originals[index]
+            original["comment_count"] += 1
+            comments.append(
+                {
+                    "user_id": rng.randint(1, n),
+                    "tweet_id": original["id"],
+                    "contents": _text(rng),
+                    "created_at": min(original["created_at"] + timedelta(minutes=rng.randint(1, 600)), EPOCH),
+                }
+            )
+    retweets.sort(key=lambda row: row["created_at"])
+    for tweet_id, row in enumerate(retweets, start=len(originals) + 1):
+        row["id"] = tweet_id
+
+    blocks: set[tuple[int, int]] = set()
+    for _ in range(int(n * config.block_ratio)):
+        blocker, blocked = rng.randint(1, n), rng.randint(1, n)
+        if blocker != blocked:
+            blocks.add((blocker, blocked))
+
+    return {
+        "users": users,
+        "follows": [{"follower_id": a, "followee_id": b} for a, b in sorted(follows)],
+        "tweets": originals + retweets,
+        "likes": [{"tweet_id": t, "user_id": u} for t, u in sorted(likes)],
+        "comments": comments,
+        "blocks": [{"blocker_id": a, "blocked_id": b} for a, b in sorted(blocks)],
+    }
+
+
+async def _insert(db: AsyncSession, model: type[Base], rows: list[dict[str, Any]]) -> None:
+    for start in range(0, len(rows), INSERT_BATCH):
+        await db.execute(insert(model), rows[start : start + INSERT_BATCH])
+
+
+async def load_dataset(engine: AsyncEngine, config: DatasetConfig, reset: bool = False) -> dict[str, Any]:
+    """Create the schema, insert the dataset and build derived tables. Returns row counts and timings."""
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with session_factory() as db:
+        if await db.scalar(select(func.count()).select_from(User)):
+            raise SystemExit("database already has users; pass --reset to drop and recreate all tables")
+        rows = generate_rows(config, pwd_context.hash(PASSWORD))
+        for model, key in (
+            (User, "users"),
+            (Follow, "follows"),
+            (Tweet, "tweets"),
+            (Like, "likes"),
+            (Comment, "comments"),
+            (Block, "blocks"),
+        ):
+            await _insert(db, model, rows[key])
+        await db.commit()
+        await rebuild_timelines(db)
+        await db.commit()
+        await user_search.rebuild_index(db)
+        await tweet_search.rebuild_index(db)
+    return {
+        "config": asdict(config),
+        "rows": {key: len(value) for key, value in rows.items()},
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def generate(database_url: str, config: DatasetConfig, reset: bool = False) -> dict[str, Any]:
+    engine = build_engine(database_url)
+    try:
+        return await load_dataset(engine, config, reset)
+    finally:
+        await engine.dispose()
@@ -0,0 +1,306 @@
+"""Async load driver: virtual users replay a weighted traffic mix against the API.
+
+Targets:
+- asgi: create_app() in-process through httpx's ASGI transport (no network, lifespan run here);
+- uvicorn: create_app() served by an in-process uvicorn on a local port (real HTTP stack);
+- url: an already running server (--base-url).
+
+Each virtual user logs in as a random generated user, then loops: pick a scenario by weight,
+issue its request(s), record (scenario, latency, status). Scenario choice and parameters come
+from a seeded RNG per virtual user, so a mix is reproducible for a given seed and concurrency.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import itertools
+import os
+import random
+import socket
+import time
+from typing import Any
+
+import httpx
+from sqlalchemy import func, select
+
+from app import db as db_module
+from app.db import build_engine
+from app.models import Tweet, User
+
+from .dataset import PASSWORD, WORDS
+
+
+@dataclass
+class Target:
+    users: int
+    tweets: int
+
+
+@dataclass
+class VirtualUser:
+    client: httpx.AsyncClient
+    rng: random.Random
+    target: Target
+    user_id: int = 0
+    headers: dict[str, str] = field(default_factory=dict)
+    newest: dict[str, Any] | None = None
+
+
+Scenario = Callable[[VirtualUser], Awaitable[httpx.Response]]
+
+
+async def feed(vu: VirtualUser) -> httpx.Response:
+    r = await vu.client.get("/feed", params={"limit": 20}, headers=vu.headers)
+    if r.status_code == 200 and r.json()["items"]:
+        vu.newest = r.json()["items"][0]
+    return r
+
+
+async def feed_next_page(vu: VirtualUser) -> httpx.Response:
+    r = await vu.client.get("/feed", params={"limit": 20}, headers=vu.headers)
+    cursor = r.json().get("next_cursor") if r.status_code == 200 else None
+    if not cursor:
+        return r
+    return await vu.client.get("/feed", params={"limit": 20, **cursor}, headers=vu.headers)
+
+
+async def feed_new_count(vu: VirtualUser) -> httpx.Response:
+    params = {"after_id": vu.newest["id"], "after_created_at": vu.newest["created_at"]} if vu.newest else {"after_id": 0}
+    return await vu.client.get("/feed/new-count", params=params, headers=vu.headers)
+
+
+async def profile(vu: VirtualUser) -> httpx.Response:
+    username = f"user{vu.rng.randint(1, vu.target.users):06d}"
+    return await vu.client.get(f"/users/{username}", params={"limit": 20}, headers=vu.headers)
+
+
+async def tweet(vu: VirtualUser) -> httpx.Response:
+    return await vu.client.get(f"/tweets/{vu.rng.randint(1, vu.target.tweets)}", headers=vu.headers)
+
+
+async def tweets_batch(vu: VirtualUser) -> httpx.Response:
+    ids = ",".join(str(vu.rng.randint(1, vu.target.tweets)) for _ in range(50))
+    return await vu.client.get("/tweets", params={"ids": ids}, headers=vu.headers)
+
+
+async def relationships(vu: VirtualUser) -> httpx.Response:
+    ids = ",".join(str(vu.rng.randint(1, vu.target.users)) for _ in range(50))
+    return await vu.client.get("/users/relationships", params={"ids": ids}, headers=vu.headers)
+
+
+async def comments(vu: VirtualUser) -> httpx.Response:
+    return await vu.client.get(f"/tweets/{vu.rng.randint(1, vu.target.tweets)}/comments", headers=vu.headers)
+
+
+async def search_users(vu: VirtualUser) -> httpx.Response:
+    q = vu.rng.choice(["user0", "ada", "tur", "hop", "user00012", "grace l"])
+    return await vu.client.get("/users/search", params={"q": q}, headers=vu.headers)
+
+
+async def search_tweets(vu: VirtualUser) -> httpx.Response:
+    q = " ".join(vu.rng.sample(WORDS, 2))
+    return await vu.client.get("/tweets/search", params={"q": q}, headers=vu.headers)
+
+
+async def like(vu: VirtualUser) -> httpx.Response:
+    tweet_id = vu.rng.randint(1, vu.target.tweets)
+    r = await vu.client.post(f"/tweets/{tweet_id}/like", headers=vu.headers)
+    if vu.rng.random() < 0.5:
+        await vu.client.delete(f"/tweets/{tweet_id}/like", headers=vu.headers)
+    return r
+
+
+async def create_tweet(vu: VirtualUser) -> httpx.Response:
+    text = " ".join(vu.rng.choice(WORDS) for _ in range(vu.rng.randint(3, 12)))
+    return await vu.client.post("/tweets", json={"text": text}, headers=vu.headers)
+
+
+async def follow(vu: VirtualUser) -> httpx.Response:
+    user_id = vu.rng.randint(1, vu.target.users)
+    if user_id == vu.user_id:
+        user_id = user_id % vu.target.users + 1
+    return await vu.client.post(f"/users/{user_id}/follow", headers=vu.headers)
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "feed": feed,
+    "feed_next_page": feed_next_page,
+    "feed_new_count": feed_new_count,
+    "profile": profile,
+    "tweet": tweet,
+    "tweets_batch": tweets_batch,
+    "relationships": relationships,
+    "comments": comments,
+    "search_users": search_users,
+    "search_tweets": search_tweets,
+    "like": like,
+    "create_tweet": create_tweet,
+    "follow": follow,
+}
+
+# Relative weights per scenario; roughly what a timeline client does.
+MIXES: dict[str, dict[str, float]] = {
+    "read-heavy": {
+        "feed": 30,
+        "feed_next_page": 8,
+        "feed_new_count": 20,
+        "profile": 10,
+        "tweet": 6,
+        "tweets_batch": 4,
+        "relationships": 3,
+        "comments": 4,
+        "search_users": 3,
+        "search_tweets": 3,
+        "like": 5,
+        "create_tweet": 3,
+        "follow": 1,
+    },
+    "write-heavy": {
+        "feed": 20,
+        "feed_new_count": 10,
+        "profile": 5,
+        "tweet": 5,
+        "like": 30,
+        "create_tweet": 25,
+        "follow": 5,
+    },
+    "feed-only": {"feed": 70, "feed_next_page": 10, "feed_new_count": 20},
+}
+
+
+@dataclass
+class RunConfig:
+    database_url: str
+    mix: str = "read-heavy"
+    concurrency: int = 20
+    duration_seconds: float = 30.0
+    warmup_seconds: float = 2.0
+    max_requests: int | None = None
+    seed: int = 1
+    mode: str = "asgi"
+    base_url: str | None = None
+
+
+@dataclass
+class RunResult:
+    samples: list[tuple[str, float, int]]
+    wall_seconds: float
+    target: Target
+
+
+async def read_target(database_url: str) -> Target:
+    engine = build_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            users = await conn.scalar(select(func.max(User.id)))
+            tweets = await conn.scalar(select(func.max(Tweet.id)))
+    finally:
+        await engine.dispose()
+    if not users or not tweets:
+        raise SystemExit("no dataset found; run python -m bench generate first")
+    return Target(users=users, tweets=tweets)
+
+
+async def _login(vu: VirtualUser) -> None:
+    vu.user_id = vu.rng.randint(1, vu.target.users)
+    r = await vu.client.post(
+        "/auth/token",
+        data={"username": f"user{vu.user_id:06d}", "password": PASSWORD},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    r.raise_for_status()
+    vu.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def _drive(client: httpx.AsyncClient, config: RunConfig, target: Target) -> RunResult:
+    weights = MIXES[config.mix]
+    names = list(weights)
+    cum_weights = list(itertools.accumulate(weights[name] for name in names))
+    samples: list[tuple[str, float, int]] = []
+    budget = [config.max_requests]
+    vus = [VirtualUser(client, random.Random(config.seed * 100_003 + i), target) for i in range(config.concurrency)]
+    await asyncio.gather(*(_login(vu) for vu in vus))
+
+    async def loop(vu: VirtualUser, deadline: float, record: bool) -> None:
+        while time.perf_counter() < deadline:
+            if record and budget[0] is not None:
+                if budget[0] <= 0:
+                    return
+                budget[0] -= 1
+            name = vu.rng.choices(names, cum_weights=cum_weights)[0]
+            start = time.perf_counter()
+            try:
+                status = (await SCENARIOS[name](vu)).status_code
+            except httpx.HTTPError:
+                status = 0
+            if record:
+                samples.append((name, time.perf_counter() - start, status))
+
+    if config.warmup_seconds > 0:
+        deadline = time.perf_counter() + config.warmup_seconds
+        await asyncio.gather(*(loop(vu, deadline, False) for vu in vus))
+    started = time.perf_counter()
+    deadline = started + config.duration_seconds
+    await asyncio.gather(*(loop(vu, deadline, True) for vu in vus))
+    return RunResult(samples=samples, wall_seconds=time.perf_counter() - started, target=target)
+
+
+def _use_database(database_url: str) -> None:
+    """Point the app's engine at the benchmark database (in-process modes only)."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("JWT_SECRET", "bench-only-secret")
+    db_module.engine = None
+    db_module.SessionLocal = None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(config: RunConfig) -> RunResult:
+    if config.mix not in MIXES:
+        raise SystemExit(f"unknown mix {config.mix!r}; choose from {', '.join(MIXES)}")
+    target = await read_target(config.database_url)
+    limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+    if config.mode == "url":
+        if not config.base_url:
+            raise SystemExit("--base-url is required with --mode url")
+        async with httpx.AsyncClient(base_url=config.base_url, limits=limits, timeout=60) as client:
+            return await _drive(client, config, target)
+
+    _use_database(config.database_url)
+    from app.main import create_app
+
+    app = create_app()
+    if config.mode == "asgi":
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                result = await _drive(client, config, target)
+        await _dispose_app_engine()
+        return result
+
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            if serving.done():
+                serving.result()
+            await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            return await _drive(client, config, target)
+    finally:
+        server.should_exit = True
+        await serving
+        await _dispose_app_engine()
+
+
+async def _dispose_app_engine() -> None:
+    if db_module.engine is not None:
+        await db_module.engine.dispose()
+    db_module.engine = None
+    db_module.SessionLocal = None
@@ -0,0 +1,146 @@
+"""Summaries of a load run and comparison of two saved runs.
+
+A result file is JSON: {"meta": {...}, "dataset": {...}, "run": {...}, "endpoints": {name: stats}, "total": stats}.
+Percentiles are nearest-rank over every recorded latency (no histogram bucketing), in milliseconds.
+An "error" is any status >= 400 or a transport failure (status 0).
+"""
+from dataclasses import asdict
+from datetime import datetime, timezone
+import json
+import math
+from pathlib import Path
+import platform
+import subprocess
+from typing import Any
+
+from .driver import RunConfig, RunResult
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, wall_seconds: float) -> dict[str, Any]:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def _git(*args: str) -> str | None:
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, timeout=5, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip()
+
+
+def build_report(result: RunResult, config: RunConfig, dataset: dict[str, Any] | None = None) -> dict[str, Any]:
+    by_endpoint: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    for name, seconds, status in result.samples:
+        by_endpoint.setdefault(name, []).append(seconds)
+        if status == 0 or status >= 400:
+            errors[name] = errors.get(name, 0) + 1
+    run = asdict(config)
+    # The URL may carry credentials; keep only the driver name.
+    run["database_url"] = config.database_url.split("://", 1)[0]
+    return {
+        "meta": {
+            "commit": _git("rev-parse", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "dataset": dataset or {"users": result.target.users, "tweets": result.target.tweets},
+        "run": run,
+        "wall_seconds": round(result.wall_seconds, 3),
+        "endpoints": {
+            name: summarize(latencies, errors.get(name, 0), result.wall_seconds)
+            for name, latencies in sorted(by_endpoint.items())
+        },
+        "total": summarize([s for _, s, _ in result.samples], sum(errors.values()), result.wall_seconds),
+    }
+
+
+def save(report: dict[str, Any], path: str | Path | None = None) -> Path:
+    if path is None:
+        commit = (report["meta"].get("commit") or "nogit")[:10]
+        stamp = report["meta"]["timestamp"].replace(":", "").replace("-", "")
+        path = RESULTS_DIR / f"{stamp}-{commit}-{report['run']['mix']}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    return path
+
+
+def load(path: str | Path) -> dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+
+def format_table(report: dict[str, Any]) -> str:
+    header = f"{'endpoint':<16} {'req':>7} {'err':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    lines = [header, "-" * len(header)]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        lines.append(
+            f"{name:<16} {s['requests']:>7} {s['errors']:>5} {s['rps']:>9.1f} "
+            f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(base: dict[str, Any], head: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Per endpoint: base and head values of req/s and percentiles, with the relative change in percent."""
+    out: dict[str, dict[str, Any]] = {}
+    names = sorted(set(base["endpoints"]) | set(head["endpoints"]))
+    for name in names + ["TOTAL"]:
+        a = base["total"] if name == "TOTAL" else base["endpoints"].get(name)
+        b = head["total"] if name == "TOTAL" else head["endpoints"].get(name)
+        if a is None or b is None:
+            out[name] = {"only_in": "base" if b is None else "head"}
+            continue
+        out[name] = {
+            key: {"base": a[key], "head": b[key], "change_pct": _change(a[key], b[key])}
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return out
+
+
+def _change(before: float, after: float) -> float | None:
+    if not before:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def format_comparison(base: dict[str, Any], head: dict[str, Any]) -> str:
+    def short(report: dict[str, Any]) -> str:
+        return (report["meta"].get("commit") or "?")[:10]
+
+    lines = [f"base {short(base)} ({base['run']['mix']})  ->  head {short(head)} ({head['run']['mix']})"]
+    header = f"{'endpoint':<16} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}"
+    lines += [header, "-" * len(header)]
+    for name, row in compare(base, head).items():
+        if "only_in" in row:
+            lines.append(f"{name:<16} (only in {row['only_in']})")
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = row[key]["change_pct"]
+            cells.append(f"{row[key]['head']:>8.1f} {'' if change is None else f'{change:+.0f}%':>7}")
+        lines.append(f"{name:<16} " + " ".join(cells))
+    return "\n".join(lines)
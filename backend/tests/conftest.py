@@ -2,12 +2,13 @@
 import asyncio
 import os
 import tempfile
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -58,7 +59,7 @@ async def register_and_login(ac: AsyncClient, username: str, email: str | None =
         email = f"{username}@example.com"
     await ac.post(
         "/auth/register",
-        json={"username": username, "email": email, "password": "password123"},
+        json={"username": username, "name": username.title(), "email": email, "password": "password123"},
     )
     r = await ac.post(
         "/auth/token",
@@ -67,3 +68,24 @@ async def register_and_login(ac: AsyncClient, username: str, email: str | None =
     )
     assert r.status_code == 200, r.text
     return r.json()["access_token"].strip()
+
+
+async def auth_headers(ac: AsyncClient, username: str) -> dict:
+    """register_and_login, returned as an Authorization header."""
+    return {"Authorization": f"Bearer {await register_and_login(ac, username)}"}
+
+
+@contextmanager
+def capture_statements(engine, select_only: bool = False) -> Iterator[list[str]]:
+    """Collect the SQL run on `engine` inside the block; the listener is removed on exit."""
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not select_only or statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
@@ -43,7 +43,7 @@ async def test_register_success(auth_client):
     ) as ac:
         r = await ac.post(
             "/auth/register",
-            json={"username": "alice", "email": "alice@example.com", "password": "password123"},
+            json={"username": "alice", "name": "Alice", "email": "alice@example.com", "password": "password123"},
         )
         assert r.status_code == 201
         data = r.json()
@@ -60,11 +60,11 @@ async def test_register_duplicate_username(auth_client):
     ) as ac:
         await ac.post(
             "/auth/register",
-            json={"username": "bob", "email": "bob@example.com", "password": "password123"},
+            json={"username": "bob", "name": "Bob", "email": "bob@example.com", "password": "password123"},
         )
         r = await ac.post(
             "/auth/register",
-            json={"username": "bob", "email": "other@example.com", "password": "other123"},
+            json={"username": "bob", "name": "Bob", "email": "other@example.com", "password": "other123"},
         )
         assert r.status_code == 409
 
@@ -76,7 +76,7 @@ async def test_login_returns_jwt_with_sub_id(auth_client):
     ) as ac:
         reg = await ac.post(
             "/auth/register",
-            json={"username": "alice", "email": "alice@example.com", "password": "password123"},
+            json={"username": "alice", "name": "Alice", "email": "alice@example.com", "password": "password123"},
         )
         assert reg.status_code == 201
         user_id = reg.json()["id"]
@@ -104,7 +104,7 @@ async def test_login_invalid_password(auth_client):
     ) as ac:
         await ac.post(
             "/auth/register",
-            json={"username": "alice", "email": "alice@example.com", "password": "password123"},
+            json={"username": "alice", "name": "Alice", "email": "alice@example.com", "password": "password123"},
         )
         r = await ac.post(
             "/auth/token",
@@ -121,7 +121,7 @@ async def test_logout_blacklists_token(auth_client):
     ) as ac:
         await ac.post(
             "/auth/register",
-            json={"username": "alice", "email": "alice@example.com", "password": "password123"},
+            json={"username": "alice", "name": "Alice", "email": "alice@example.com", "password": "password123"},
         )
         r = await ac.post(
             "/auth/token",
@@ -146,11 +146,11 @@ async def test_register_duplicate_email(auth_client):
     ) as ac:
         await ac.post(
             "/auth/register",
-            json={"username": "alice", "email": "same@example.com", "password": "password123"},
+            json={"username": "alice", "name": "Alice", "email": "same@example.com", "password": "password123"},
         )
         r = await ac.post(
             "/auth/register",
-            json={"username": "bob", "email": "same@example.com", "password": "password123"},
+            json={"username": "bob", "name": "Bob", "email": "same@example.com", "password": "password123"},
         )
         assert r.status_code == 409
 
@@ -0,0 +1,116 @@
+"""Auth cache and token blacklist: authenticated requests skip the blacklist and users queries;
+revocation, invalidation and purging of expired entries."""
+import asyncio
+import time
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.auth_cache import AuthCache, token_hash
+from app.models import BlacklistedToken
+from app.security import is_token_blacklisted, purge_expired_tokens
+
+from conftest import capture_statements, register_and_login
+
+
+@pytest.mark.asyncio
+async def test_hot_path_runs_no_auth_queries(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert (await ac.get("/users/me", headers=headers)).status_code == 200
+
+        with capture_statements(engine) as statements:
+            r = await ac.get("/users/me", headers=headers)
+        assert r.status_code == 200
+        assert r.json()["username"] == "alice"
+        assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_immediately(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert (await ac.get("/users/me", headers=headers)).status_code == 200
+        assert (await ac.post("/auth/logout", headers=headers)).status_code == 204
+        assert (await ac.get("/users/me", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_revocation_by_another_worker_is_synced(client):
+    app, engine, _path = client
+    app.state.auth_cache = AuthCache(sync_seconds=0)  # sync on every request
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert (await ac.get("/users/me", headers=headers)).status_code == 200
+        async with async_sessionmaker(bind=engine)() as db:
+            db.add(BlacklistedToken(token_hash=token_hash(token), expiration_time=None))
+            await db.commit()
+        assert (await ac.get("/users/me", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_update_profile_invalidates_cached_user(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert (await ac.get("/users/me", headers=headers)).status_code == 200
+        r = await ac.put("/users/me", json={"bio": "hello"}, headers=headers)
+        assert r.status_code == 200, r.text
+        r = await ac.put("/users/me", json={"name": "Alice A."}, headers=headers)
+        assert r.status_code == 200, r.text
+        me = (await ac.get("/users/me", headers=headers)).json()
+        assert (me["bio"], me["name"]) == ("hello", "Alice A.")
+
+
+@pytest.mark.asyncio
+async def test_blacklist_stores_digests_and_purges_expired(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await register_and_login(ac, "alice")
+        second = await register_and_login(ac, "alice")
+        assert first != second
+        assert (await ac.post("/auth/logout", headers={"Authorization": f"Bearer {first}"})).status_code == 204
+        assert (await ac.get("/users/me", headers={"Authorization": f"Bearer {second}"})).status_code == 200
+
+    sm = async_sessionmaker(bind=engine)
+    async with sm() as db:
+        assert await is_token_blacklisted(first, db)
+        assert (await db.execute(select(BlacklistedToken.token_hash))).scalars().all() == [token_hash(first)]
+        db.add(BlacklistedToken(token_hash="0" * 64, expiration_time=int(time.time()) - 1))
+        await db.commit()
+        assert await purge_expired_tokens(db) == 1
+        assert await is_token_blacklisted(first, db)
+
+
+@pytest.mark.asyncio
+async def test_requests_wait_for_the_first_sync():
+    release = asyncio.Event()
+    revoked = token_hash("revoked-token")
+
+    class SlowResult:
+        def all(self):
+            return [(revoked, None)]
+
+    class SlowSession:
+        async def execute(self, _stmt):
+            await release.wait()
+            return SlowResult()
+
+    cache = AuthCache(sync_seconds=60)
+    first = asyncio.create_task(cache.sync(SlowSession()))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.sync(SlowSession()))
+    await asyncio.sleep(0)
+    assert not second.done()
+    release.set()
+    await asyncio.gather(first, second)
+    assert cache.is_revoked("revoked-token")
+    assert not cache.needs_sync()
@@ -0,0 +1,81 @@
+"""Batch lookups: GET /tweets?ids= and GET /users/relationships?ids= (keyed by id, constant query count)."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from conftest import auth_headers, capture_statements
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_by_ids_keyed_and_constant_queries(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        ids = []
+        for i in range(6):
+            r = await ac.post("/tweets", json={"text": f"tweet {i}"}, headers=bob)
+            ids.append(r.json()["id"])
+        await ac.post(f"/tweets/{ids[0]}/like", headers=alice)
+        r = await ac.post(f"/tweets/{ids[1]}/retweet", headers=alice)
+        retweet_id = r.json()["id"]
+
+        # Warm the auth cache so only the endpoint's own queries are counted.
+        await ac.get(f"/tweets?ids={ids[0]}", headers=alice)
+        requested = [ids[3], 9999, ids[0], retweet_id, ids[1]]
+        with capture_statements(engine, select_only=True) as statements:
+            r = await ac.get("/tweets", params={"ids": ",".join(map(str, requested))}, headers=alice)
+        assert r.status_code == 200, r.text
+        small = len(statements)
+
+        body = r.json()
+        assert list(body["items"]) == [str(ids[3]), str(ids[0]), str(retweet_id), str(ids[1])]
+        assert body["missing"] == [9999]
+        assert body["items"][str(ids[0])]["liked_by_me"] is True
+        assert body["items"][str(ids[0])]["like_count"] == 1
+        assert body["items"][str(retweet_id)]["retweeted_from_text"] == "tweet 1"
+        assert body["items"][str(ids[1])]["retweeted_by_me"] is True
+
+        big = ",".join(map(str, ids + [retweet_id] + list(range(1000, 1300))))
+        with capture_statements(engine, select_only=True) as statements:
+            r = await ac.get("/tweets", params={"ids": big}, headers=alice)
+        assert r.status_code == 200
+        assert len(r.json()["missing"]) == 300
+        assert len(statements) == small
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_rejects_bad_ids(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        assert (await ac.get("/tweets?ids=1,x", headers=alice)).status_code == 400
+        assert (await ac.get("/tweets?ids=,", headers=alice)).status_code == 400
+        too_many = ",".join(str(i) for i in range(501))
+        assert (await ac.get("/tweets", params={"ids": too_many}, headers=alice)).status_code == 400
+        assert (await ac.get("/tweets?ids=1")).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_relationships_by_ids(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        await auth_headers(ac, "bob")
+        carol = await auth_headers(ac, "carol")
+        await auth_headers(ac, "dave")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/users/4/block", headers=alice)
+        await ac.post("/users/1/block", headers=carol)
+
+        await ac.get("/users/relationships?ids=2", headers=alice)
+        with capture_statements(engine, select_only=True) as statements:
+            r = await ac.get("/users/relationships?ids=4,2,3,77,1", headers=alice)
+        assert r.status_code == 200, r.text
+        assert len(statements) == 2
+        body = r.json()
+        assert list(body["items"]) == ["4", "2", "3", "1"]
+        assert body["missing"] == [77]
+        assert body["items"]["2"] == {"is_following": True, "is_blocked_by_me": False, "has_blocked_me": False}
+        assert body["items"]["3"] == {"is_following": False, "is_blocked_by_me": False, "has_blocked_me": True}
+        assert body["items"]["4"] == {"is_following": False, "is_blocked_by_me": True, "has_blocked_me": False}
+        assert body["items"]["1"] == {"is_following": False, "is_blocked_by_me": False, "has_blocked_me": False}
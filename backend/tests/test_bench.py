@@ -0,0 +1,69 @@
+"""bench package: deterministic dataset, a short in-process load run and the JSON report."""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from app import db as db_module
+from bench import report
+from bench.dataset import DatasetConfig, generate, generate_rows
+from bench.driver import RunConfig, run
+
+SMALL = DatasetConfig(users=40, tweets_per_user=5, follows_per_user=6)
+
+
+@pytest.fixture()
+def bench_db(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET", "test-secret")
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    url = f"sqlite+aiosqlite:///{Path(path).resolve().as_posix()}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setattr(db_module, "engine", None)
+    monkeypatch.setattr(db_module, "SessionLocal", None)
+    yield url
+    Path(path).unlink(missing_ok=True)
+
+
+def test_rows_are_deterministic_and_consistent():
+    first = generate_rows(SMALL, "hash")
+    assert first == generate_rows(SMALL, "hash")
+    assert first != generate_rows(DatasetConfig(users=40, tweets_per_user=5, follows_per_user=6, seed=7), "hash")
+
+    tweets = {t["id"]: t for t in first["tweets"]}
+    assert sorted(tweets) == list(range(1, len(tweets) + 1))
+    for tweet_id, tweet in tweets.items():
+        assert tweet["like_count"] == sum(1 for like in first["likes"] if like["tweet_id"] == tweet_id)
+        assert tweet["retweet_count"] == sum(1 for t in tweets.values() if t["retweeted_from"] == tweet_id)
+    for user in first["users"]:
+        assert user["follower_count"] == sum(1 for f in first["follows"] if f["followee_id"] == user["id"])
+    assert all(f["follower_id"] != f["followee_id"] for f in first["follows"])
+
+
+async def test_generate_and_run_asgi(bench_db, tmp_path):
+    summary = await generate(bench_db, SMALL, reset=True)
+    assert summary["rows"]["users"] == 40
+
+    config = RunConfig(
+        database_url=bench_db, concurrency=3, duration_seconds=30, warmup_seconds=0, max_requests=40, seed=3
+    )
+    result = await run(config)
+    assert len(result.samples) == 40
+    assert all(status < 400 for _name, _seconds, status in result.samples), result.samples
+
+    built = report.build_report(result, config)
+    assert built["total"]["requests"] == 40
+    assert built["total"]["errors"] == 0
+    assert built["run"]["database_url"] == "sqlite+aiosqlite"
+    saved = report.save(built, tmp_path / "run.json")
+    assert report.load(saved) == built
+    assert report.compare(built, built)["TOTAL"]["p50_ms"]["change_pct"] in (0.0, None)
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert report.percentile(values, 50) == 50.0
+    assert report.percentile(values, 99) == 99.0
+    assert report.percentile([0.2], 95) == 0.2
+    assert report.percentile([], 50) == 0.0
@@ -0,0 +1,171 @@
+"""Block cache: lazy per-user block sets, invalidation on block/unblock via pubsub, cross-worker polling."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.block_cache import BlockCache
+from app.models import PubSubMessage
+from app.pubsub import PubSub
+
+from conftest import auth_headers, capture_statements
+
+
+@pytest.mark.asyncio
+async def test_block_and_unblock_invalidate_cached_sets(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        r = await ac.get("/users/bob", headers=alice)
+        assert r.json()["has_blocked_me"] is False
+
+        assert (await ac.post("/users/1/block", headers=bob)).status_code == 204
+        r = await ac.get("/users/bob", headers=alice)
+        assert r.json()["has_blocked_me"] is True
+        r = await ac.get("/users/alice", headers=bob)
+        assert r.json()["is_blocked_by_me"] is True
+
+        assert (await ac.delete("/users/1/block", headers=bob)).status_code == 204
+        r = await ac.get("/users/bob", headers=alice)
+        assert r.json()["has_blocked_me"] is False
+        r = await ac.get("/users/relationships?ids=1", headers=bob)
+        assert r.json()["items"]["1"]["is_blocked_by_me"] is False
+
+
+@pytest.mark.asyncio
+async def test_feed_skips_block_filtering_when_user_has_no_blocks(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/tweets", json={"text": "hello"}, headers=bob)
+        await ac.get("/feed", headers=alice)
+
+        with capture_statements(engine) as statements:
+            r = await ac.get("/feed", headers=alice)
+        assert r.status_code == 200
+        assert len(r.json()["items"]) == 1
+        assert not [s for s in statements if "blocks" in s]
+
+
+class SlowBlocksSession:
+    """Stands in for AsyncSession: execute() reads `rows` at once but answers when `release` is set."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.release = asyncio.Event()
+        self.queries = 0
+
+    async def execute(self, _stmt):
+        self.queries += 1
+        snapshot = list(self.rows)
+        await self.release.wait()
+        return SimpleNamespace(all=lambda: snapshot)
+
+
+@pytest.mark.asyncio
+async def test_load_overlapping_an_invalidation_is_not_cached():
+    cache = BlockCache(ttl_seconds=300, max_entries=10)
+    db = SlowBlocksSession([])
+    load = asyncio.create_task(cache.get(db, 1))
+    await asyncio.sleep(0)
+    # Block committed while the load was reading the pre-block rows.
+    cache.invalidate([1, 2])
+    db.rows = [(2, 1)]
+    db.release.set()
+    assert (await load).blocked_by == frozenset()
+    assert (await cache.get(db, 1)).blocked_by == {2}
+    assert (await cache.get(db, 1)).blocked_by == {2}
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_publish_is_not_delivered(client):
+    _app, engine, _path = client
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    pubsub = PubSub(backend="database")
+    received: list[dict] = []
+    pubsub.subscribe("blocks", received.append)
+    async with SessionLocal() as session:
+        pubsub.publish(session, "blocks", {"users": [1, 2]})
+        await session.rollback()
+    async with SessionLocal() as session:
+        pubsub.publish(session, "blocks", {"users": [3, 4]})
+        await session.commit()
+    assert received == [{"users": [3, 4]}]
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_publish_is_not_delivered_on_the_next_commit(client):
+    _app, engine, _path = client
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    pubsub = PubSub(backend="database")
+    received: list[dict] = []
+    pubsub.subscribe("blocks", received.append)
+    async with SessionLocal() as session:
+        pubsub.publish(session, "blocks", {"users": [1, 2]})
+        await session.flush()
+        await session.rollback()
+        session.add(PubSubMessage(channel="other", payload="{}", origin="test", sent_at=int(time.time())))
+        await session.commit()
+        assert received == []
+
+        pubsub.publish(session, "blocks", {"users": [3, 4]})
+        await session.commit()
+        await session.execute(select(1))
+        await session.rollback()
+        await session.commit()
+    assert received == [{"users": [3, 4]}]
+
+
+@pytest.mark.asyncio
+async def test_other_workers_receive_messages_by_polling(client):
+    _app, engine, _path = client
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    worker_a = PubSub(backend="database", retention_seconds=60)
+    worker_b = PubSub(backend="database", retention_seconds=60)
+    received_a: list[dict] = []
+    received_b: list[dict] = []
+    worker_a.subscribe("blocks", received_a.append)
+    worker_b.subscribe("blocks", received_b.append)
+    async with SessionLocal() as session:
+        await worker_a.poll(session)
+        await worker_b.poll(session)
+
+        worker_a.publish(session, "blocks", {"users": [1, 2]})
+        await session.commit()
+        assert received_a == [{"users": [1, 2]}]
+        assert received_b == []
+
+        assert await worker_b.poll(session) == 1
+        assert await worker_b.poll(session) == 0
+        assert await worker_a.poll(session) == 0
+        assert received_a == [{"users": [1, 2]}]
+        assert received_b == [{"users": [1, 2]}]
+
+        session.add(PubSubMessage(channel="blocks", payload="{}", origin="old", sent_at=int(time.time()) - 3600))
+        await session.commit()
+        await worker_a.poll(session)
+        count = await session.scalar(select(func.count()).select_from(PubSubMessage))
+        assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_local_backend_writes_no_rows(client):
+    _app, engine, _path = client
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    pubsub = PubSub(backend="local")
+    received: list[dict] = []
+    pubsub.subscribe("blocks", received.append)
+    async with SessionLocal() as session:
+        pubsub.publish(session, "blocks", {"users": [5]})
+        await session.commit()
+        count = await session.scalar(select(func.count()).select_from(PubSubMessage))
+    assert count == 0
+    assert received == [{"users": [5]}]
@@ -0,0 +1,116 @@
+"""Bulk import: CSV/NDJSON streams into the tables, with derived data rebuilt afterwards."""
+import csv
+import gzip
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, inspect, select
+
+from app.bulk_import import BulkImportError, read_rows, run_import
+from app.models import Tweet, User
+from app.security import hash_password
+
+
+async def login(ac: AsyncClient, username: str) -> dict:
+    r = await ac.post(
+        "/auth/token",
+        data={"username": username, "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token'].strip()}"}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def write_ndjson(path, rows, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, "wt") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+@pytest.fixture()
+def sources(tmp_path):
+    hashed = hash_password("password123")
+    users = [
+        {"id": i, "username": name, "name": name.title(), "email": f"{name}@example.com", "password_hash": hashed}
+        for i, name in enumerate(["alice", "bob", "carol"], start=1)
+    ]
+    tweets = [
+        {"id": 1, "user_id": 2, "text": "hello from bob", "retweeted_from": None, "created_at": "2024-01-01T10:00:00Z"},
+        {"id": 2, "user_id": 3, "text": "carol says hi", "created_at": "2024-01-01T11:00:00"},
+        {"id": 3, "user_id": 1, "retweeted_from": 1, "created_at": "2024-01-01T12:00:00"},
+    ]
+    return {
+        "users": write_csv(tmp_path / "users.csv", users),
+        "tweets": write_ndjson(tmp_path / "tweets.ndjson.gz", tweets, compress=True),
+        "follows": write_csv(tmp_path / "follows.csv", [{"follower_id": 1, "followee_id": 2}, {"follower_id": 3, "followee_id": 2}]),
+        "likes": write_ndjson(tmp_path / "likes.jsonl", [{"tweet_id": 1, "user_id": 1}, {"tweet_id": 1, "user_id": 3}]),
+        "comments": write_csv(tmp_path / "comments.csv", [{"user_id": 1, "tweet_id": 2, "contents": "nice"}]),
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_rebuilds_counters_timelines_and_search(client, sources):
+    app, engine, _path = client
+    summary = await run_import(engine, sources, batch_size=2, drop_indexes=True)
+    assert summary["tables"]["users"]["rows"] == 3
+    assert summary["tables"]["tweets"]["rows"] == 3
+    assert summary["rows"] == 11
+    assert set(summary["derived_seconds"]) == {"counters", "timelines", "user_search", "tweet_search"}
+
+    async with engine.connect() as conn:
+        assert await conn.scalar(select(User.follower_count).where(User.id == 2)) == 2
+        row = (await conn.execute(select(Tweet.like_count, Tweet.retweet_count).where(Tweet.id == 1))).one()
+        assert tuple(row) == (2, 1)
+        indexes = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("tweets")})
+        assert "ix_tweets_user_created" in indexes
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await login(ac, "alice")
+        feed = (await ac.get("/feed", headers=alice)).json()["items"]
+        assert [t["id"] for t in feed] == [3, 1]
+        assert feed[1]["liked_by_me"] is True
+        assert [u["username"] for u in (await ac.get("/users/search", params={"q": "car"}, headers=alice)).json()] == ["carol"]
+        hits = (await ac.get("/tweets/search", params={"q": "carol"}, headers=alice)).json()["items"]
+        assert [t["id"] for t in hits] == [2]
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_plain_passwords(client, tmp_path):
+    _app, engine, _path = client
+    path = write_csv(
+        tmp_path / "users.csv",
+        [{"username": "dave", "email": "dave@example.com", "password_hash": "hunter2"}],
+    )
+    with pytest.raises(BulkImportError, match="users.csv:2: password_hash"):
+        await run_import(engine, {"users": path})
+    async with engine.connect() as conn:
+        assert await conn.scalar(select(func.count()).select_from(User)) == 0
+
+
+def test_read_rows_types_and_errors(tmp_path):
+    path = write_csv(tmp_path / "tweets.csv", [{"user_id": "7", "text": "", "created_at": "2024-02-03T04:05:06+01:00"}])
+    rows = list(read_rows(Tweet.__table__, path))
+    assert rows[0] == ("user_id", "text", "created_at")
+    assert rows[1][0] == 7 and rows[1][1] is None
+    assert rows[1][2].isoformat() == "2024-02-03T03:05:06"
+
+    bad = write_csv(tmp_path / "bad.csv", [{"user_id": "x"}])
+    with pytest.raises(BulkImportError, match="bad.csv:2: bad user_id"):
+        list(read_rows(Tweet.__table__, bad))
+    late = write_ndjson(tmp_path / "late.ndjson", [{"user_id": 1}, {"user_id": 2, "text": "x"}])
+    with pytest.raises(BulkImportError, match="late.ndjson:2: fields \\['text'\\]"):
+        list(read_rows(Tweet.__table__, late))
+    unknown = write_csv(tmp_path / "unknown.csv", [{"handle": "x"}])
+    with pytest.raises(BulkImportError, match="unknown tweets columns"):
+        list(read_rows(Tweet.__table__, unknown))
@@ -12,6 +12,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from collections.abc import AsyncIterator
 
+from conftest import register_and_login
+
 
 @pytest.fixture()
 def client(monkeypatch):
@@ -36,20 +38,6 @@ def client(monkeypatch):
     yield app, engine, path
 
 
-async def register_and_login(ac: AsyncClient, username: str) -> str:
-    await ac.post(
-        "/auth/register",
-        json={"username": username, "email": f"{username}@example.com", "password": "password123"},
-    )
-    r = await ac.post(
-        "/auth/token",
-        data={"username": username, "password": "password123"},
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    assert r.status_code == 200, r.text
-    return r.json()["access_token"].strip()
-
-
 @pytest.mark.asyncio
 async def test_create_comment_success(client):
     app, engine, _path = client
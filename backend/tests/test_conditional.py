@@ -0,0 +1,70 @@
+"""Conditional GET: ETag/Last-Modified on feed, tweet and profile; 304 before hydration; invalidation."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from conftest import auth_headers, capture_statements
+
+
+async def revalidate(ac: AsyncClient, url: str, headers: dict, etag: str) -> int:
+    r = await ac.get(url, headers={**headers, "If-None-Match": etag})
+    if r.status_code == 304:
+        assert r.headers["etag"] == etag
+        assert r.content == b""
+    return r.status_code
+
+
+@pytest.mark.asyncio
+async def test_feed_etag_changes_only_when_content_does(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        tweet_id = (await ac.post("/tweets", json={"text": "hello"}, headers=bob)).json()["id"]
+
+        r = await ac.get("/feed", headers=alice)
+        etag = r.headers["etag"]
+        assert r.headers["last-modified"].endswith("GMT")
+
+        with capture_statements(engine) as statements:
+            assert await revalidate(ac, "/feed", alice, etag) == 304
+        # Timeline page and viewer version only: no hydration queries.
+        assert len(statements) <= 3
+
+        # Someone else's like changes the counter shown in alice's feed.
+        await ac.post(f"/tweets/{tweet_id}/like", headers=bob)
+        assert await revalidate(ac, "/feed", alice, etag) == 200
+        etag = (await ac.get("/feed", headers=alice)).headers["etag"]
+        # Bob's feed is unaffected by alice's request.
+        bob_etag = (await ac.get("/feed", headers=bob)).headers["etag"]
+        # Alice's own like flips liked_by_me; a rename changes the username shown.
+        await ac.post(f"/tweets/{tweet_id}/like", headers=alice)
+        assert await revalidate(ac, "/feed", alice, etag) == 200
+        etag = (await ac.get("/feed", headers=alice)).headers["etag"]
+        await ac.put("/users/me", json={"username": "bobby"}, headers=bob)
+        assert await revalidate(ac, "/feed", alice, etag) == 200
+        assert await revalidate(ac, "/feed", bob, bob_etag) == 200
+
+
+@pytest.mark.asyncio
+async def test_tweet_and_profile_etags(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        tweet_id = (await ac.post("/tweets", json={"text": "hello"}, headers=bob)).json()["id"]
+
+        etag = (await ac.get(f"/tweets/{tweet_id}", headers=alice)).headers["etag"]
+        assert await revalidate(ac, f"/tweets/{tweet_id}", alice, etag) == 304
+        r = await ac.get(f"/tweets/{tweet_id}", headers={**alice, "If-None-Match": f'"other", W/{etag}'})
+        assert r.status_code == 304
+        await ac.post(f"/tweets/{tweet_id}/comments", json={"contents": "hi"}, headers=bob)
+        assert await revalidate(ac, f"/tweets/{tweet_id}", alice, etag) == 200
+
+        etag = (await ac.get("/users/bob", headers=alice)).headers["etag"]
+        assert await revalidate(ac, "/users/bob", alice, etag) == 304
+        await ac.post("/users/2/follow", headers=alice)
+        assert await revalidate(ac, "/users/bob", alice, etag) == 200
+        etag = (await ac.get("/users/bob", headers=alice)).headers["etag"]
+        await ac.put("/users/me", json={"bio": "new bio"}, headers=bob)
+        assert await revalidate(ac, "/users/bob", alice, etag) == 200
@@ -0,0 +1,64 @@
+"""Coverage: denormalized like/retweet/comment counters and drift reconciliation."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.counters import reconcile_counters
+from app.models import Tweet
+
+from conftest import register_and_login
+
+
+async def get_counts(ac: AsyncClient, token: str, tweet_id: int) -> tuple[int, int, int]:
+    r = await ac.get(f"/tweets/{tweet_id}", headers={"Authorization": f"Bearer {token}"})
+    data = r.json()
+    return data["like_count"], data["retweet_count"], data["comment_count"]
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_writes(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        auth_a = {"Authorization": f"Bearer {alice}"}
+        auth_b = {"Authorization": f"Bearer {bob}"}
+        tweet_id = (await ac.post("/tweets", json={"text": "hi"}, headers=auth_a)).json()["id"]
+
+        await ac.post(f"/tweets/{tweet_id}/like", headers=auth_a)
+        await ac.post(f"/tweets/{tweet_id}/like", headers=auth_a)
+        await ac.post(f"/tweets/{tweet_id}/like", headers=auth_b)
+        await ac.post(f"/tweets/{tweet_id}/retweet", headers=auth_b)
+        await ac.post(f"/tweets/{tweet_id}/comments", json={"contents": "nice"}, headers=auth_b)
+        assert await get_counts(ac, alice, tweet_id) == (2, 1, 1)
+
+        await ac.delete(f"/tweets/{tweet_id}/like", headers=auth_b)
+        await ac.delete(f"/tweets/{tweet_id}/like", headers=auth_b)
+        await ac.delete(f"/tweets/{tweet_id}/retweet", headers=auth_b)
+        assert await get_counts(ac, alice, tweet_id) == (1, 0, 1)
+
+        rt = await ac.post(f"/tweets/{tweet_id}/retweet", headers=auth_b)
+        await ac.delete(f"/tweets/{rt.json()['id']}", headers=auth_b)
+        assert await get_counts(ac, alice, tweet_id) == (1, 0, 1)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drift(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        auth = {"Authorization": f"Bearer {alice}"}
+        first = (await ac.post("/tweets", json={"text": "a"}, headers=auth)).json()["id"]
+        second = (await ac.post("/tweets", json={"text": "b"}, headers=auth)).json()["id"]
+        await ac.post(f"/tweets/{first}/like", headers=auth)
+
+        sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with sm() as session:
+            await session.execute(update(Tweet).values(like_count=7, comment_count=3))
+            await session.commit()
+            assert await reconcile_counters(session, batch_size=1) == 2
+            assert await reconcile_counters(session) == 0
+
+        assert await get_counts(ac, alice, first) == (1, 0, 0)
+        assert await get_counts(ac, alice, second) == (0, 0, 0)
@@ -0,0 +1,50 @@
+"""Engine factory: SQLite pragmas, pool settings, warm-up and checkout statistics."""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from app.db import TimedQueuePool, build_engine, pool_status, warm_pool
+
+
+@pytest.fixture()
+def sqlite_url():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    yield f"sqlite+aiosqlite:///{Path(path).resolve().as_posix()}"
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_engine_applies_pragmas_and_pool_settings(sqlite_url, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    monkeypatch.setenv("DB_SQLITE_SYNCHRONOUS", "OFF")
+    engine = build_engine(sqlite_url)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 0
+        pool = engine.sync_engine.pool
+        assert isinstance(pool, TimedQueuePool)
+        assert (pool.size(), pool._max_overflow) == (3, 2)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_opens_connections_and_records_checkouts(sqlite_url, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "4")
+    engine = build_engine(sqlite_url)
+    try:
+        await warm_pool(engine)
+        status = pool_status(engine)
+        assert status["checkouts"] == 4
+        assert status["checked_out"] == 0
+        assert engine.sync_engine.pool.checkedin() == 4
+        assert status["checkout_wait_seconds_max"] >= 0
+    finally:
+        await engine.dispose()
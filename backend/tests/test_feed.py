@@ -0,0 +1,61 @@
+"""Coverage: feed hydration (likes, retweets, viewer flags) with a fixed query count."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from conftest import capture_statements, register_and_login
+
+
+@pytest.mark.asyncio
+async def test_feed_hydrates_likes_and_retweets(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        create = await ac.post("/tweets", json={"text": "original"}, headers={"Authorization": f"Bearer {bob}"})
+        orig_id = create.json()["id"]
+        await ac.post(f"/tweets/{orig_id}/like", headers={"Authorization": f"Bearer {alice}"})
+        await ac.post(f"/tweets/{orig_id}/like", headers={"Authorization": f"Bearer {bob}"})
+        rt = await ac.post(f"/tweets/{orig_id}/retweet", headers={"Authorization": f"Bearer {alice}"})
+        assert rt.status_code == 201
+
+        r = await ac.get("/feed", headers={"Authorization": f"Bearer {alice}"})
+        assert r.status_code == 200, r.text
+        items = {item["id"]: item for item in r.json()["items"]}
+        original = items[orig_id]
+        assert original["like_count"] == 2
+        assert original["liked_by_me"] is True
+        assert original["retweeted_by_me"] is True
+        retweet = items[rt.json()["id"]]
+        assert retweet["retweeted_from"] == orig_id
+        assert retweet["retweeted_from_username"] == "bob"
+        assert retweet["retweeted_from_text"] == "original"
+        assert retweet["retweeted_by_me"] is True
+        assert retweet["like_count"] == 0
+
+        r = await ac.get(f"/tweets/{orig_id}", headers={"Authorization": f"Bearer {bob}"})
+        assert r.json()["like_count"] == 2
+        assert r.json()["liked_by_me"] is True
+        assert r.json()["retweeted_by_me"] is False
+
+
+@pytest.mark.asyncio
+async def test_feed_query_count_independent_of_page_size(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        for i in range(3):
+            await ac.post("/tweets", json={"text": f"t{i}"}, headers={"Authorization": f"Bearer {bob}"})
+        with capture_statements(engine) as statements:
+            await ac.get("/feed", headers={"Authorization": f"Bearer {alice}"})
+        small = len(statements)
+
+        for i in range(20):
+            create = await ac.post("/tweets", json={"text": f"more{i}"}, headers={"Authorization": f"Bearer {bob}"})
+            await ac.post(f"/tweets/{create.json()['id']}/retweet", headers={"Authorization": f"Bearer {alice}"})
+        with capture_statements(engine) as statements:
+            r = await ac.get("/feed", headers={"Authorization": f"Bearer {alice}"})
+        assert len(r.json()["items"]) == 43
+        assert len(statements) <= small + 1
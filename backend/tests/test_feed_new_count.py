@@ -0,0 +1,61 @@
+"""GET /feed/new-count: capped count of feed items newer than the client's newest tweet."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from conftest import auth_headers, capture_statements
+
+
+@pytest.mark.asyncio
+async def test_new_count_after_newest_item(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/tweets", json={"text": "first"}, headers=bob)
+        newest = (await ac.get("/feed", headers=alice)).json()["items"][0]
+        params = {"after_id": newest["id"], "after_created_at": newest["created_at"]}
+
+        r = await ac.get("/feed/new-count", params=params, headers=alice)
+        assert r.status_code == 200
+        assert r.json() == {"count": 0, "capped": False}
+
+        # Same-second tweets still count: the keyset uses the cursor tweet's stored timestamp.
+        await ac.post("/tweets", json={"text": "second"}, headers=bob)
+        await ac.post("/tweets", json={"text": "mine"}, headers=alice)
+        with capture_statements(engine) as statements:
+            r = await ac.get("/feed/new-count", params=params, headers=alice)
+        assert r.json() == {"count": 2, "capped": False}
+        assert len([s for s in statements if "timeline_entries" in s]) == 1
+
+        r = await ac.get("/feed/new-count", params={"after_id": 0}, headers=alice)
+        assert r.json()["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_new_count_is_capped(client, monkeypatch):
+    monkeypatch.setenv("FEED_NEW_COUNT_MAX", "3")
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        for i in range(5):
+            await ac.post("/tweets", json={"text": f"t{i}"}, headers=alice)
+        r = await ac.get("/feed/new-count", params={"after_id": 0}, headers=alice)
+        assert r.json() == {"count": 3, "capped": True}
+        assert (await ac.get("/feed/new-count", headers=alice)).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_new_count_includes_pulled_authors_and_honors_blocks(client, monkeypatch):
+    monkeypatch.setenv("TIMELINE_FANOUT_MAX_FOLLOWERS", "0")
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/tweets", json={"text": "pulled at read time"}, headers=bob)
+        r = await ac.get("/feed/new-count", params={"after_id": 0}, headers=alice)
+        assert r.json()["count"] == 1
+        await ac.post("/users/1/block", headers=bob)
+        r = await ac.get("/feed/new-count", params={"after_id": 0}, headers=alice)
+        assert r.json()["count"] == 0
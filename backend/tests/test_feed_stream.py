@@ -0,0 +1,180 @@
+"""Live feed: FeedHub routing/backpressure, publishing from write endpoints, the SSE generator."""
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.block_cache import BlockCache
+from app.feed_stream import RESYNC, FeedHub, HubFull, stream_events
+from app.models import PubSubMessage
+
+from conftest import auth_headers
+
+
+@pytest.fixture(autouse=True)
+def stream_on(monkeypatch):
+    monkeypatch.setenv("FEED_STREAM_ENABLED", "1")
+
+
+def drain(sub) -> list[dict]:
+    events = []
+    while not sub.queue.empty():
+        events.append(sub.queue.get_nowait())
+    return events
+
+
+def test_hub_routes_by_follow_and_block():
+    hub = FeedHub(queue_size=10, max_connections=10)
+    viewer = hub.connect(1, [2, 3], frozenset({3}))
+    other = hub.connect(4, [], frozenset())
+    hub.dispatch({"type": "tweet", "author_id": 2})
+    hub.dispatch({"type": "tweet", "author_id": 3})
+    hub.dispatch({"type": "tweet", "author_id": 1})
+    hub.dispatch({"type": "tweet", "author_id": 5})
+    assert [e["author_id"] for e in drain(viewer)] == [2, 1]
+    assert drain(other) == []
+
+    hub.on_follow({"follower_id": 4, "followee_id": 5, "following": True})
+    hub.on_follow({"follower_id": 1, "followee_id": 2, "following": False})
+    hub.dispatch({"type": "tweet", "author_id": 5})
+    hub.dispatch({"type": "tweet", "author_id": 2})
+    assert [e["author_id"] for e in drain(other)] == [5]
+    assert drain(viewer) == []
+
+    hub.on_blocks({"users": [1, 9]})
+    assert viewer.stale and not other.stale
+
+    hub.disconnect(viewer)
+    hub.disconnect(other)
+    assert hub.connections == 0
+    assert hub._by_author == {} and hub._by_viewer == {}
+
+
+def test_slow_consumer_gets_resync_instead_of_backlog():
+    hub = FeedHub(queue_size=2, max_connections=10)
+    sub = hub.connect(1, [2], frozenset())
+    for i in range(5):
+        hub.dispatch({"type": "counts", "author_id": 2, "tweet_id": i})
+    assert drain(sub) == [RESYNC]
+    assert sub.dropped == 5
+    hub.dispatch({"type": "counts", "author_id": 2, "tweet_id": 9})
+    assert drain(sub) == [{"type": "counts", "author_id": 2, "tweet_id": 9}]
+
+
+def test_hub_connection_limit():
+    hub = FeedHub(queue_size=2, max_connections=1)
+    hub.connect(1, [], frozenset())
+    with pytest.raises(HubFull):
+        hub.connect(2, [], frozenset())
+
+
+@pytest.mark.asyncio
+async def test_write_endpoints_push_to_connected_followers(client):
+    app, _engine, _path = client
+    hub = app.state.feed_hub
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        carol = await auth_headers(ac, "carol")
+        await ac.post("/users/2/follow", headers=alice)
+        sub = hub.connect(1, [2], frozenset())
+        outsider = hub.connect(3, [], frozenset())
+
+        r = await ac.post("/tweets", json={"text": "live hello"}, headers=bob)
+        tweet_id = r.json()["id"]
+        events = drain(sub)
+        assert [e["type"] for e in events] == ["tweet"]
+        assert events[0]["tweet"]["id"] == tweet_id
+        assert events[0]["tweet"]["text"] == "live hello"
+        assert events[0]["tweet"]["created_at"]
+
+        await ac.post(f"/tweets/{tweet_id}/like", headers=carol)
+        await ac.delete(f"/tweets/{tweet_id}/like", headers=carol)
+        await ac.post(f"/tweets/{tweet_id}/retweet", headers=carol)
+        events = drain(sub)
+        assert [(e["like_delta"], e["retweet_delta"]) for e in events] == [(1, 0), (-1, 0), (0, 1)]
+        # carol's retweet is a tweet event for carol's followers (and carol), not alice.
+        assert [e["type"] for e in drain(outsider)] == ["tweet"]
+
+        await ac.post("/users/3/follow", headers=alice)
+        await ac.post("/tweets", json={"text": "from carol"}, headers=carol)
+        assert [e["tweet"]["text"] for e in drain(sub) if e["type"] == "tweet"] == ["from carol"]
+
+        await ac.post("/users/1/block", headers=bob)
+        assert sub.stale
+        hub.disconnect(sub)
+        hub.disconnect(outsider)
+
+
+@pytest.mark.asyncio
+async def test_events_are_only_published_for_connected_streams(client, monkeypatch):
+    app, engine, _path = client
+    hub = app.state.feed_hub
+
+    async def feed_rows() -> int:
+        async with engine.connect() as conn:
+            return await conn.scalar(select(func.count()).select_from(PubSubMessage).where(PubSubMessage.channel == "feed"))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/tweets", json={"text": "nobody listening"}, headers=bob)
+        assert await feed_rows() == 0
+
+        sub = hub.connect(1, [2], frozenset())
+        await ac.post("/tweets", json={"text": "local"}, headers=bob)
+        assert [e["tweet"]["text"] for e in drain(sub)] == ["local"]
+        assert await feed_rows() == 0
+        hub.disconnect(sub)
+
+        monkeypatch.setenv("FEED_STREAM_BACKEND", "pubsub")
+        await ac.post("/tweets", json={"text": "every worker"}, headers=bob)
+        assert await feed_rows() == 1
+
+        monkeypatch.delenv("FEED_STREAM_ENABLED")
+        assert (await ac.get("/feed/stream", headers=alice)).status_code == 404
+        await ac.post("/tweets", json={"text": "disabled"}, headers=bob)
+        assert await feed_rows() == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_events_reloads_blocks_and_formats_sse(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        await ac.post("/users/2/block", headers=alice)
+
+    hub = FeedHub(queue_size=10, max_connections=10)
+    sub = hub.connect(1, [2], frozenset())
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        stream = stream_events(hub, sub, db, BlockCache(), heartbeat_seconds=0.05)
+        assert await anext(stream) == b"retry: 5000\n\n"
+        assert await anext(stream) == b": keep-alive\n\n"
+        sub.stale = True
+        hub.dispatch({"type": "tweet", "author_id": 2})
+        hub.dispatch({"type": "tweet", "author_id": 1})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        assert chunk.startswith(b"event: tweet\ndata: {")
+        assert b'"author_id":1' in chunk
+        await stream.aclose()
+    assert hub.connections == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_limits(client, monkeypatch):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        app.state.feed_hub = FeedHub(queue_size=1, max_connections=0)
+        r = await ac.get("/feed/stream", headers=alice)
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == "30"
+        monkeypatch.setenv("FEED_STREAM_ENABLED", "0")
+        r = await ac.get("/feed/stream", headers=alice)
+        assert r.status_code == 404
@@ -0,0 +1,83 @@
+"""Circuit breaker state transitions for outbound model calls."""
+import asyncio
+
+import pytest
+
+from app import http_client
+from app.http_client import CircuitBreaker, OutboundClient
+
+
+def test_breaker_opens_then_half_opens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, reset_seconds=10)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_probe_is_released(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    client = OutboundClient()
+    started = asyncio.Event()
+
+    async def hanging_post(url, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(client._client, "post", hanging_post)
+    breaker = client.breaker("model.example")
+    breaker.opened_at = now[0]
+    breaker.failures = breaker.threshold
+    now[0] += breaker.reset_seconds
+
+    probe = asyncio.create_task(client.post("https://model.example/v1"))
+    await started.wait()
+    assert not breaker.allow()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancellations_do_not_open_the_breaker(monkeypatch):
+    monkeypatch.setenv("OUTBOUND_MAX_PER_HOST", "1")
+    client = OutboundClient()
+    started = asyncio.Event()
+
+    async def hanging_post(url, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(client._client, "post", hanging_post)
+    breaker = client.breaker("model.example")
+    calls = [asyncio.create_task(client.post("https://model.example/v1")) for _ in range(breaker.threshold + 1)]
+    await started.wait()
+    # One call is in flight, the rest wait on the per-host limit; cancel them all.
+    for call in calls:
+        call.cancel()
+    await asyncio.gather(*calls, return_exceptions=True)
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    await client.aclose()
@@ -0,0 +1,123 @@
+"""Request metrics: Server-Timing headers, per-route Prometheus output at /metrics."""
+import re
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import api_tweets, main, sentiment
+from app.metrics import MetricsMiddleware, Registry, RequestTimings
+from app.sentiment_cache import SentimentCache
+
+from conftest import auth_headers, capture_statements
+
+
+def metric_value(text: str, name: str, route: str) -> float:
+    match = re.search(rf'^{name}\{{route="{re.escape(route)}"\}} (\S+)$', text, re.M)
+    assert match is not None, f"{name} for {route} missing"
+    return float(match.group(1))
+
+
+@pytest.mark.asyncio
+async def test_server_timing_counts_queries(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        await ac.post("/tweets", json={"text": "hello"}, headers=alice)
+        with capture_statements(engine) as statements:
+            r = await ac.get("/feed", headers=alice)
+        assert r.status_code == 200
+        timing = r.headers["server-timing"]
+        assert f'desc="{len(statements)} queries"' in timing
+        for part in ("db;dur=", "pool;dur=", "serialize;dur=", "model;dur=", "total;dur="):
+            assert part in timing
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_per_route(client, monkeypatch):
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", None)
+    monkeypatch.setenv("SENTIMENT_BACKEND", "local")
+    monkeypatch.setenv("SENTIMENT_LOCAL_WORKERS", "0")
+    sentiment.shutdown_sentiment_backend()
+    cache = SentimentCache()
+    monkeypatch.setattr(api_tweets, "get_sentiment_cache", lambda: cache)
+    monkeypatch.setattr(main, "get_sentiment_cache", lambda: cache)
+    app, _engine, _path = client
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            alice = await auth_headers(ac, "alice")
+            r = await ac.post("/tweets", json={"text": "hello"}, headers=alice)
+            tweet_id = r.json()["id"]
+            await ac.get(f"/tweets/{tweet_id}", headers=alice)
+            await ac.get(f"/tweets/{tweet_id}", headers=alice)
+            await ac.get("/feed", headers=alice)
+            await ac.post("/tweets/sentiment-preview", json={"text": "what a great day"}, headers=alice)
+            await ac.post("/tweets/sentiment-preview", json={"text": "What a great day "}, headers=alice)
+            await ac.get("/no/such/path")
+
+            r = await ac.get("/metrics")
+    finally:
+        sentiment.shutdown_sentiment_backend()
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = r.text
+    assert 'http_requests_total{method="GET",route="/tweets/{tweet_id}",status="200"} 2' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/feed"} 1' in text
+    assert 'db_queries_per_request_bucket{route="/feed",le="+Inf"} 1' in text
+    assert metric_value(text, "db_query_seconds_total", "/feed") > 0
+    assert metric_value(text, "serialize_seconds_total", "/feed") > 0
+    # response_model route: FastAPI's own validation and rendering count as serialization.
+    assert metric_value(text, "serialize_seconds_total", "/tweets/{tweet_id}") > 0
+    assert metric_value(text, "model_calls_total", "/tweets/sentiment-preview") == 1
+    assert metric_value(text, "model_call_seconds_total", "/tweets/sentiment-preview") > 0
+    assert "feed_stream_connections 0" in text
+    assert "sentiment_cache_hits 1" in text
+    assert "sentiment_cache_misses 1" in text
+
+
+@pytest.mark.asyncio
+async def test_server_timing_can_be_disabled(client, monkeypatch):
+    monkeypatch.setenv("METRICS_SERVER_TIMING", "0")
+    from app.main import create_app
+
+    app, _engine, _path = client
+    fresh = create_app()
+    fresh.dependency_overrides = app.dependency_overrides
+    async with AsyncClient(transport=ASGITransport(app=fresh), base_url="http://test") as ac:
+        r = await ac.get("/health")
+        assert r.status_code == 200
+        assert "server-timing" not in r.headers
+        r = await ac.get("/metrics")
+        assert 'route="/health"' in r.text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    for queries in (0, 3, 3, 200):
+        timings = RequestTimings()
+        timings.db_queries = queries
+        registry.observe("GET", "/x", 200, 0.02, timings)
+    text = registry.render()
+    assert 'db_queries_per_request_bucket{route="/x",le="0.0"} 1' in text
+    assert 'db_queries_per_request_bucket{route="/x",le="3.0"} 3' in text
+    assert 'db_queries_per_request_bucket{route="/x",le="100.0"} 3' in text
+    assert 'db_queries_per_request_bucket{route="/x",le="+Inf"} 4' in text
+    assert 'db_queries_per_request_sum{route="/x"} 206.0' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x",le="0.025"} 4' in text
+
+
+@pytest.mark.asyncio
+async def test_event_streams_get_their_own_duration_histogram():
+    async def app(scope, receive, send):
+        content_type = b"text/event-stream" if scope["path"] == "/stream" else b"application/json"
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": b""})
+
+    registry = Registry()
+    async with AsyncClient(transport=ASGITransport(app=MetricsMiddleware(app, registry)), base_url="http://test") as ac:
+        await ac.get("/stream")
+        await ac.get("/plain")
+    text = registry.render()
+    assert 'http_stream_duration_seconds_count{method="GET",route="unmatched"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched"} 1' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="200"} 2' in text
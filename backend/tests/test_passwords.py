@@ -0,0 +1,63 @@
+"""Password hashing off the event loop: register conflicts, load shedding, rehash on login."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import security
+from app.models import User
+
+
+def user_payload(username: str, email: str | None = None) -> dict:
+    return {
+        "username": username,
+        "name": username.title(),
+        "email": email or f"{username}@example.com",
+        "password": "password123",
+    }
+
+
+@pytest.mark.asyncio
+async def test_register_conflicts_come_from_unique_constraints(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/auth/register", json=user_payload("alice"))).status_code == 201
+        r = await ac.post("/auth/register", json=user_payload("alice", "other@example.com"))
+        assert (r.status_code, r.json()["detail"]) == (409, "Username already exists")
+        r = await ac.post("/auth/register", json=user_payload("bob", "alice@example.com"))
+        assert (r.status_code, r.json()["detail"]) == (409, "Email already exists")
+        assert (await ac.post("/auth/register", json=user_payload("bob"))).status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_hasher_sheds_load_when_queue_is_full():
+    hasher = security.PasswordHasher(workers=1, max_queue=1)
+    try:
+        results = await asyncio.gather(*(hasher.hash("password123") for _ in range(4)), return_exceptions=True)
+    finally:
+        hasher.shutdown()
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 2
+    assert rejected[0].status_code == 503
+    assert all(security.verify_password("password123", r) for r in results if isinstance(r, str))
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_when_rounds_change(client, monkeypatch):
+    app, engine, _path = client
+    monkeypatch.setattr(security, "pwd_context", security.make_crypt_context(1000))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/auth/register", json=user_payload("alice"))).status_code == 201
+        monkeypatch.setattr(security, "pwd_context", security.make_crypt_context(2000))
+        r = await ac.post(
+            "/auth/token",
+            data={"username": "alice", "password": "password123"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        assert r.status_code == 200, r.text
+    async with async_sessionmaker(bind=engine)() as db:
+        stored = (await db.execute(select(User.password_hash))).scalar_one()
+    assert stored.startswith("$pbkdf2-sha256$2000$")
@@ -0,0 +1,144 @@
+"""Read replica routing: reads go to a replica, writes pin the caller to the primary, failed replicas are skipped."""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import db as db_module
+from app.main import create_app
+from app.models import Base, Block, User
+
+from conftest import register_and_login
+
+
+@pytest.fixture()
+async def replica(monkeypatch):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    path_url = Path(path).resolve().as_posix()
+    sync_engine = create_engine(f"sqlite:///{path_url}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as session:
+        session.add(User(username="ghost", name="Ghost", email="ghost@example.com", password_hash="x"))
+        session.commit()
+    sync_engine.dispose()
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", f"sqlite+aiosqlite:///{path_url}")
+    await db_module.dispose_replicas()
+    yield db_module.init_replicas()
+    await db_module.dispose_replicas()
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica_until_caller_writes(client, replica):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        # ghost only exists on the replica; alice only on the primary.
+        assert (await ac.get("/users/ghost", headers=headers)).status_code == 200
+        assert (await ac.get("/users/alice", headers=headers)).status_code == 404
+
+        assert (await ac.post("/tweets", json={"text": "hi"}, headers=headers)).status_code == 201
+        assert (await ac.get("/users/alice", headers=headers)).status_code == 200
+        assert (await ac.get("/users/ghost", headers=headers)).status_code == 404
+        # Anonymous readers are not affected by alice's write.
+        assert (await ac.get("/users/ghost")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_write_marker_holds_on_another_worker(client, replica):
+    app, _engine, _path = client
+    other_worker = create_app()
+    other_worker.dependency_overrides = app.dependency_overrides
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        headers = {"Authorization": f"Bearer {token}"}
+        r = await ac.post("/tweets", json={"text": "hi"}, headers=headers)
+        assert r.status_code == 201
+        stamp = r.headers[db_module.LAST_WRITE_HEADER]
+        cookies = dict(ac.cookies)
+    assert cookies == {db_module.LAST_WRITE_COOKIE: stamp}
+
+    # Cookie (browser) and header (API client) both reach the primary on a different process.
+    async with AsyncClient(transport=ASGITransport(app=other_worker), base_url="http://test", cookies=cookies) as ac:
+        assert (await ac.get("/users/alice", headers=headers)).status_code == 200
+    async with AsyncClient(transport=ASGITransport(app=other_worker), base_url="http://test") as ac:
+        assert (await ac.get("/users/alice", headers={**headers, db_module.LAST_WRITE_HEADER: stamp})).status_code == 200
+        assert (await ac.get("/users/alice", headers=headers)).status_code == 404
+        # A stamp far in the future does not pin the caller.
+        future = str(int(stamp) + 3600 * 1000)
+        assert (await ac.get("/users/alice", headers={**headers, db_module.LAST_WRITE_HEADER: future})).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cross_origin_clients_can_read_the_write_marker(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        origin = {"Origin": "http://localhost:5173"}
+        r = await ac.options(
+            "/tweets",
+            headers={**origin, "Access-Control-Request-Method": "GET", "Access-Control-Request-Headers": "x-last-write"},
+        )
+        assert r.status_code == 200
+        r = await ac.post("/tweets", json={"text": "hi"}, headers={**origin, "Authorization": f"Bearer {token}"})
+        assert db_module.LAST_WRITE_HEADER in r.headers["access-control-expose-headers"]
+        assert r.headers[db_module.LAST_WRITE_HEADER]
+
+
+@pytest.mark.asyncio
+async def test_block_sets_load_from_the_primary(client, replica):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = {"Authorization": f"Bearer {await register_and_login(ac, 'alice')}"}
+        bob = {"Authorization": f"Bearer {await register_and_login(ac, 'bob')}"}
+        # The replica has both users but lags: bob's block below never reaches it.
+        sync_engine = create_engine(replica.replicas[0].url.replace("+aiosqlite", ""))
+        with Session(sync_engine) as session:
+            session.query(User).delete()
+            session.add_all(
+                [User(id=i, username=n, email=f"{n}@example.com", password_hash="x") for i, n in ((1, "alice"), (2, "bob"))]
+            )
+            session.commit()
+        assert (await ac.post("/users/1/block", headers=bob)).status_code == 204
+        ac.cookies.clear()
+
+        r = await ac.get("/users/relationships?ids=2", headers=alice)
+        assert r.json()["items"]["2"]["has_blocked_me"] is True
+        r = await ac.get("/users/bob", headers=alice)
+        assert r.json()["has_blocked_me"] is True
+        with Session(sync_engine) as session:
+            assert session.query(Block).count() == 0
+        sync_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failing_replica_falls_back_to_primary(client, replica):
+    app, _engine, _path = client
+    broken = db_module.Replica("sqlite+aiosqlite:////nonexistent-dir/replica.db")
+    replica.replicas[:] = [broken]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await register_and_login(ac, "alice")
+        ac.cookies.clear()
+        r = await ac.get("/users/alice")
+        assert r.status_code == 200
+    assert not broken.healthy
+    await broken.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_replicas_are_skipped(replica):
+    healthy = replica.replicas[0]
+    broken = db_module.Replica("sqlite+aiosqlite:////nonexistent-dir/replica.db")
+    replica.replicas.append(broken)
+    await replica.check()
+    assert healthy.healthy and not broken.healthy
+    assert {replica.pick() for _ in range(4)} == {healthy}
+    healthy.mark_failed()
+    assert replica.pick() is None
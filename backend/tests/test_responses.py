@@ -0,0 +1,81 @@
+"""FastJSONResponse: output must match what the Pydantic response models would have produced."""
+from datetime import datetime, timezone
+import json
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from httpx import ASGITransport, AsyncClient
+from pydantic import TypeAdapter
+
+from app.responses import dumps
+from app.schemas import CommentRead, FeedResponse, ProfileResponse, TweetRead
+
+from conftest import auth_headers
+
+
+def test_dumps_matches_pydantic_encoding():
+    tweet = {
+        "id": 1,
+        "text": "héllo \"world\"",
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456),
+        "user_id": 2,
+        "username": "alice",
+        "retweeted_from": None,
+        "retweeted_from_username": None,
+        "retweeted_from_text": None,
+        "retweeted_by_me": False,
+        "like_count": 3,
+        "liked_by_me": True,
+        "retweet_count": 0,
+        "comment_count": 1,
+        "sentiment_label": "positive",
+        "sentiment_score": 0.75,
+    }
+    comment = {
+        "id": 5,
+        "user_id": 2,
+        "username": "alice",
+        "tweet_id": 1,
+        "contents": "nice",
+        "created_at": datetime(2024, 5, 1, 12, 31, tzinfo=timezone.utc),
+    }
+    for model, data in ((TweetRead, tweet), (CommentRead, comment)):
+        expected = model(**data).model_dump_json().encode()
+        assert dumps(data) == expected
+        assert json.loads(dumps(data)) == jsonable_encoder(model(**data))
+
+
+@pytest.mark.asyncio
+async def test_feed_profile_and_comments_validate_against_schemas(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        await ac.post("/users/2/follow", headers=alice)
+        r = await ac.post("/tweets", json={"text": "hello from bob"}, headers=bob)
+        tweet_id = r.json()["id"]
+        await ac.post(f"/tweets/{tweet_id}/like", headers=alice)
+        await ac.post(f"/tweets/{tweet_id}/retweet", headers=alice)
+        await ac.post(f"/tweets/{tweet_id}/comments", json={"contents": "hi bob"}, headers=alice)
+
+        r = await ac.get("/feed", headers=alice)
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/json"
+        assert r.headers["etag"]
+        feed = FeedResponse.model_validate_json(r.content)
+        assert r.json() == json.loads(feed.model_dump_json())
+        original = next(t for t in feed.items if t.id == tweet_id)
+        assert original.liked_by_me and original.retweeted_by_me and original.like_count == 1
+
+        r = await ac.get("/users/bob", headers=alice)
+        assert r.status_code == 200
+        assert r.headers["etag"]
+        profile = ProfileResponse.model_validate_json(r.content)
+        assert r.json() == json.loads(profile.model_dump_json())
+        assert profile.is_following and profile.user.name == "Bob"
+
+        r = await ac.get(f"/tweets/{tweet_id}/comments", headers=alice)
+        assert r.status_code == 200
+        comments = TypeAdapter(list[CommentRead]).validate_json(r.content)
+        assert [c.contents for c in comments] == ["hi bob"]
+        assert list(r.json()[0]) == list(CommentRead.model_fields)
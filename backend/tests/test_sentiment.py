@@ -0,0 +1,144 @@
+"""Sentiment client against a local fake Gemini server: batching, demultiplexing, fallback, caching."""
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import sentiment
+from app.sentiment_cache import SentimentCache
+
+
+def classify(text: str) -> dict:
+    if "good" in text:
+        return {"label": "positive", "score": 0.8}
+    if "bad" in text:
+        return {"label": "negative", "score": -0.8}
+    return {"label": "neutral", "score": 0.0}
+
+
+def make_fake_gemini(state: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1beta/models/{model}")
+    async def generate(model: str, request: Request):
+        body = await request.json()
+        parts = [p["text"] for p in body["contents"][0]["parts"]]
+        state["requests"].append(parts)
+        if state.get("fail"):
+            return JSONResponse({"error": "overloaded"}, status_code=503)
+        prompt = parts[-1]
+        if prompt.startswith("Posts:\n"):
+            if state.get("break_batches"):
+                reply = "sorry, I cannot do that"
+            else:
+                posts = json.loads(prompt[len("Posts:\n"):])
+                index = (lambda i: True) if state.get("bool_indexes") else (lambda i: i)
+                reply = "```json\n" + json.dumps([{"index": index(p["index"]), **classify(p["text"])} for p in posts]) + "\n```"
+        else:
+            reply = json.dumps(classify(prompt))
+        return {"candidates": [{"content": {"parts": [{"text": reply}]}}]}
+
+    return app
+
+
+@pytest.fixture()
+def fake_gemini(monkeypatch):
+    state: dict = {"requests": []}
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(make_fake_gemini(state), host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", "fake-key")
+    monkeypatch.setattr(
+        sentiment, "GEMINI_ENDPOINT", f"http://127.0.0.1:{port}/v1beta/models/{{model}}:generateContent"
+    )
+    yield state
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_single_call(fake_gemini):
+    label, score, model = await sentiment.analyze_sentiment_with_gemini("a good day")
+    assert (label, score, model) == ("positive", 0.8, sentiment.GEMINI_MODEL)
+
+
+@pytest.mark.asyncio
+async def test_batch_demultiplexes_in_one_request(fake_gemini):
+    results = await sentiment.analyze_sentiment_batch(["good", "", "bad", "fine"])
+    assert [r[0] for r in results] == ["positive", None, "negative", "neutral"]
+    assert len(fake_gemini["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_falls_back_to_single_calls(fake_gemini):
+    fake_gemini["break_batches"] = True
+    results = await sentiment.analyze_sentiment_batch(["good", "bad"])
+    assert [r[0] for r in results] == ["positive", "negative"]
+    assert len(fake_gemini["requests"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_ignores_boolean_indexes(fake_gemini):
+    fake_gemini["bool_indexes"] = True
+    results = await sentiment.analyze_sentiment_batch(["good", "bad"])
+    assert [r[0] for r in results] == ["positive", "negative"]
+    assert len(fake_gemini["requests"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_concurrent_calls(fake_gemini):
+    batcher = sentiment.SentimentBatcher(max_items=3, max_wait_ms=20)
+    results = await asyncio.gather(*(batcher.analyze(t) for t in ["good", "bad", "meh", "good", "bad"]))
+    assert [r[0] for r in results] == ["positive", "negative", "neutral", "positive", "negative"]
+    # One full batch of three, then the remaining two after max_wait_ms.
+    assert len(fake_gemini["requests"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_scores_identical_texts_once(fake_gemini):
+    cache = SentimentCache(max_entries=10)
+    first = await cache.analyze("A  good day")
+    again = await cache.analyze("a good   DAY")
+    assert first == again == ("positive", 0.8, sentiment.GEMINI_MODEL)
+    results = await cache.analyze_batch(["bad", "bad", "a good day"])
+    assert [r[0] for r in results] == ["negative", "negative", "positive"]
+    assert len(fake_gemini["requests"]) == 2
+    assert cache.stats() == {"entries": 2, "hits": 2, "shared_hits": 0, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_cache_lru_bound_and_shared_tier(fake_gemini, client):
+    _app, engine, _path = client
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    writer = SentimentCache(max_entries=1, session_factory=sm)
+    await writer.analyze_batch(["good", "bad"])
+    assert writer.stats()["entries"] == 1
+
+    reader = SentimentCache(session_factory=sm)
+    results = await reader.analyze_batch(["good", "bad"])
+    assert [r[0] for r in results] == ["positive", "negative"]
+    assert reader.stats()["shared_hits"] == 2
+    assert len(fake_gemini["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_skips_calls_while_unhealthy(fake_gemini, monkeypatch):
+    monkeypatch.setenv("OUTBOUND_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("OUTBOUND_BREAKER_RESET_SECONDS", "60")
+    fake_gemini["fail"] = True
+    for _ in range(5):
+        assert await sentiment.analyze_sentiment_with_gemini("good") == sentiment.NO_SENTIMENT
+    assert len(fake_gemini["requests"]) == 2
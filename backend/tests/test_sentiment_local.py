@@ -0,0 +1,63 @@
+"""Local lexicon scorer and the sentiment backend selection (local, hybrid)."""
+import pytest
+
+from app import sentiment
+from app.sentiment_local import LOCAL_MODEL, score_batch, score_text
+
+
+@pytest.fixture(autouse=True)
+def reset_backend():
+    sentiment.shutdown_sentiment_backend()
+    yield
+    sentiment.shutdown_sentiment_backend()
+
+
+def test_score_text_handles_negation_and_intensifiers():
+    assert score_text("what a great day :)")[0] == "positive"
+    assert score_text("this is not good")[0] == "negative"
+    assert score_text("I don't hate it")[0] == "positive"
+    assert score_text("the bus leaves at noon") == ("neutral", 0.0, 0.0)
+    assert score_text("really good")[1] > score_text("good")[1]
+    assert score_batch(["bad", "good"]) == [score_text("bad"), score_text("good")]
+
+
+@pytest.mark.asyncio
+async def test_local_backend_in_process_pool():
+    backend = sentiment.LocalBackend(workers=1)
+    try:
+        results = await backend.analyze_batch(["awful service", "", "love it"])
+    finally:
+        backend.shutdown()
+    assert results[0][0] == "negative" and results[0][2] == LOCAL_MODEL
+    assert results[1] == sentiment.NO_SENTIMENT
+    assert results[2][0] == "positive"
+
+
+@pytest.mark.asyncio
+async def test_backend_selected_from_env(monkeypatch):
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", None)
+    monkeypatch.setenv("SENTIMENT_BACKEND", "local")
+    monkeypatch.setenv("SENTIMENT_LOCAL_WORKERS", "0")
+    assert sentiment.sentiment_enabled()
+    assert isinstance(sentiment.get_sentiment_backend(), sentiment.LocalBackend)
+    monkeypatch.setenv("SENTIMENT_BACKEND", "gemini")
+    assert not sentiment.sentiment_enabled()
+
+
+@pytest.mark.asyncio
+async def test_hybrid_sends_only_low_confidence_posts_remote(monkeypatch):
+    sent: list[list[str]] = []
+
+    async def fake_remote(texts):
+        sent.append(texts)
+        return [("neutral", 0.1, "remote") if t == "meh" else sentiment.NO_SENTIMENT for t in texts]
+
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", "fake-key")
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", fake_remote)
+    backend = sentiment.HybridBackend(sentiment.LocalBackend(workers=0), min_confidence=0.3)
+    results = await backend.analyze_batch(["so happy, love it", "meh", "the bus is late"])
+    assert sent == [["meh", "the bus is late"]]
+    assert results[0][2] == LOCAL_MODEL and results[0][0] == "positive"
+    assert results[1] == ("neutral", 0.1, "remote")
+    # Remote failure keeps the local result.
+    assert results[2] == ("neutral", 0.0, LOCAL_MODEL)
@@ -0,0 +1,162 @@
+"""Coverage: create_tweet enqueues sentiment; worker fills results, retries with backoff, gives up."""
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import sentiment
+from app.models import SentimentJob, Tweet
+from app.sentiment_cache import get_sentiment_cache
+from app.sentiment_worker import SentimentWorker, get_worker_concurrency
+
+from conftest import capture_statements, register_and_login
+
+
+@pytest.fixture(autouse=True)
+def empty_sentiment_cache():
+    get_sentiment_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def sentiment_on(monkeypatch):
+    # Tests replace analyze_sentiment_batch; a configured key is what enables the worker.
+    monkeypatch.setenv("SENTIMENT_BACKEND", "gemini")
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", "test-key")
+
+
+async def post_tweet(app, text: str) -> int:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        token = await register_and_login(ac, "alice")
+        r = await ac.post("/tweets", json={"text": text}, headers={"Authorization": f"Bearer {token}"})
+        assert r.status_code == 201, r.text
+        assert r.json()["sentiment_label"] is None
+        return r.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_no_job_when_sentiment_disabled(client, monkeypatch):
+    monkeypatch.setattr(sentiment, "GEMINI_API_KEY", None)
+    app, engine, _path = client
+    await post_tweet(app, "great day")
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with sm() as session:
+        assert (await session.execute(select(SentimentJob))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_worker_fills_sentiment(client, monkeypatch):
+    app, engine, _path = client
+    calls: list[str] = []
+
+    async def fake_analyze(texts: list[str]):
+        calls.extend(texts)
+        return [("positive", 0.9, "fake-model") for _ in texts]
+
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", fake_analyze)
+    tweet_id = await post_tweet(app, "great day")
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    worker = SentimentWorker(sm, concurrency=2)
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 0
+    async with sm() as session:
+        tweet = await session.get(Tweet, tweet_id)
+        assert (tweet.sentiment_label, tweet.sentiment_score, tweet.sentiment_model) == ("positive", 0.9, "fake-model")
+        assert tweet.sentiment_analyzed_at is not None
+        assert (await session.execute(select(SentimentJob))).first() is None
+    assert calls == ["great day"]
+
+
+@pytest.mark.asyncio
+async def test_worker_holds_no_connection_during_the_model_call(client, monkeypatch):
+    app, engine, _path = client
+    held: list[int] = []
+
+    async def slow_analyze(texts: list[str]):
+        await asyncio.sleep(0.01)
+        held.append(engine.sync_engine.pool.checkedout())
+        return [("positive", 0.9, "fake-model") for _ in texts]
+
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", slow_analyze)
+    await post_tweet(app, "great day")
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    assert await SentimentWorker(sm, concurrency=2).run_once() == 1
+    assert held == [0]
+
+
+def test_default_concurrency_leaves_pool_room_for_requests(monkeypatch):
+    monkeypatch.delenv("SENTIMENT_WORKER_CONCURRENCY", raising=False)
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "10")
+    assert get_worker_concurrency() == 7
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "100")
+    assert get_worker_concurrency() == 32
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_then_gives_up(client, monkeypatch):
+    monkeypatch.setenv("SENTIMENT_MAX_ATTEMPTS", "2")
+    monkeypatch.setenv("SENTIMENT_RETRY_BASE_SECONDS", "0")
+    app, engine, _path = client
+
+    async def failing_analyze(texts: list[str]):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", failing_analyze)
+    tweet_id = await post_tweet(app, "meh")
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    worker = SentimentWorker(sm)
+    assert await worker.run_once() == 1
+    async with sm() as session:
+        job = await session.get(SentimentJob, tweet_id)
+        assert job.attempts == 1
+        assert "model down" in job.last_error
+    assert await worker.run_once() == 1
+    async with sm() as session:
+        assert await session.get(SentimentJob, tweet_id) is None
+        tweet = await session.get(Tweet, tweet_id)
+        assert tweet.sentiment_label is None
+
+
+@pytest.mark.asyncio
+async def test_background_loop_processes_new_jobs(client, monkeypatch):
+    monkeypatch.setenv("SENTIMENT_POLL_SECONDS", "30")
+    app, engine, _path = client
+
+    async def fake_analyze(texts: list[str]):
+        return [("neutral", 0.0, "fake-model") for _ in texts]
+
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", fake_analyze)
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    worker = SentimentWorker(sm)
+    worker.start()
+    try:
+        tweet_id = await post_tweet(app, "ok")
+        for _ in range(100):
+            async with sm() as session:
+                if (await session.get(Tweet, tweet_id)).sentiment_label is not None:
+                    break
+            await asyncio.sleep(0.01)
+    finally:
+        await worker.stop()
+    async with sm() as session:
+        assert (await session.get(Tweet, tweet_id)).sentiment_label == "neutral"
+
+
+
+@pytest.mark.asyncio
+async def test_result_bumps_version_in_sql(client, monkeypatch):
+    app, engine, _path = client
+
+    async def fake_analyze(texts: list[str]):
+        return [("positive", 0.9, "fake-model") for _ in texts]
+
+    monkeypatch.setattr(sentiment, "analyze_sentiment_batch", fake_analyze)
+    await post_tweet(app, "great day")
+    sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+    with capture_statements(engine) as statements:
+        assert await SentimentWorker(sm, concurrency=2).run_once() == 1
+    # Not a read-modify-write: a like committed during the model call must not be overwritten.
+    [write] = [s for s in statements if s.startswith("UPDATE tweets")]
+    assert "version=(tweets.version + " in write
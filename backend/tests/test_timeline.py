@@ -0,0 +1,101 @@
+"""Coverage: materialized home timeline (fan-out on write/read, follow backfill, unfollow/block trim)."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models import TimelineEntry
+from app.timeline import rebuild_timelines, trim_timeline
+
+from conftest import register_and_login
+
+
+async def feed_texts(ac: AsyncClient, token: str) -> list[str]:
+    r = await ac.get("/feed", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200, r.text
+    return [item["text"] for item in r.json()["items"]]
+
+
+@pytest.mark.asyncio
+async def test_feed_only_followed_and_self(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        carol = await register_and_login(ac, "carol")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        await ac.post("/tweets", json={"text": "from bob"}, headers={"Authorization": f"Bearer {bob}"})
+        await ac.post("/tweets", json={"text": "from carol"}, headers={"Authorization": f"Bearer {carol}"})
+        await ac.post("/tweets", json={"text": "from alice"}, headers={"Authorization": f"Bearer {alice}"})
+        assert await feed_texts(ac, alice) == ["from alice", "from bob"]
+        assert await feed_texts(ac, bob) == ["from bob"]
+
+
+@pytest.mark.asyncio
+async def test_follow_backfills_and_unfollow_removes(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/tweets", json={"text": "old bob"}, headers={"Authorization": f"Bearer {bob}"})
+        assert await feed_texts(ac, alice) == []
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        assert await feed_texts(ac, alice) == ["old bob"]
+        await ac.delete("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        assert await feed_texts(ac, alice) == []
+
+
+@pytest.mark.asyncio
+async def test_block_removes_both_directions_and_unblock_restores(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        await ac.post("/users/1/follow", headers={"Authorization": f"Bearer {bob}"})
+        await ac.post("/tweets", json={"text": "a"}, headers={"Authorization": f"Bearer {alice}"})
+        await ac.post("/tweets", json={"text": "b"}, headers={"Authorization": f"Bearer {bob}"})
+        await ac.post("/users/2/block", headers={"Authorization": f"Bearer {alice}"})
+        assert await feed_texts(ac, alice) == ["a"]
+        assert await feed_texts(ac, bob) == ["b"]
+        await ac.post("/tweets", json={"text": "b2"}, headers={"Authorization": f"Bearer {bob}"})
+        assert await feed_texts(ac, alice) == ["a"]
+        await ac.delete("/users/2/block", headers={"Authorization": f"Bearer {alice}"})
+        assert await feed_texts(ac, alice) == ["b2", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_high_follower_author_merged_on_read(client, monkeypatch):
+    monkeypatch.setenv("TIMELINE_FANOUT_MAX_FOLLOWERS", "0")
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        await ac.post("/tweets", json={"text": "celebrity"}, headers={"Authorization": f"Bearer {bob}"})
+        await ac.post("/tweets", json={"text": "mine"}, headers={"Authorization": f"Bearer {alice}"})
+        sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with sm() as session:
+            count = await session.scalar(
+                select(func.count()).select_from(TimelineEntry).where(TimelineEntry.user_id == 1)
+            )
+        assert count == 1
+        assert await feed_texts(ac, alice) == ["mine", "celebrity"]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_and_trim(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await register_and_login(ac, "alice")
+        bob = await register_and_login(ac, "bob")
+        await ac.post("/users/2/follow", headers={"Authorization": f"Bearer {alice}"})
+        for i in range(5):
+            await ac.post("/tweets", json={"text": f"t{i}"}, headers={"Authorization": f"Bearer {bob}"})
+        sm = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with sm() as session:
+            await rebuild_timelines(session)
+            await trim_timeline(session, 1, keep=2)
+            await session.commit()
+        assert await feed_texts(ac, alice) == ["t4", "t3"]
+        assert await feed_texts(ac, bob) == ["t4", "t3", "t2", "t1", "t0"]
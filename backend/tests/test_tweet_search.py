@@ -0,0 +1,75 @@
+"""Tweet search: ranking, filters, keyset pagination, blocks and index maintenance."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models import Tweet
+
+from conftest import auth_headers
+
+
+async def post(ac: AsyncClient, headers: dict, text: str) -> int:
+    r = await ac.post("/tweets", json={"text": text}, headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_filters_and_paginates(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        both = await post(ac, alice, "Coffee and Python this morning")
+        python_only = await post(ac, bob, "python python python")
+        coffee_only = await post(ac, bob, "More coffee please")
+        await post(ac, alice, "nothing to see here")
+
+        r = await ac.get("/tweets/search", params={"q": "python coffee"}, headers=alice)
+        assert r.status_code == 200, r.text
+        ids = [item["id"] for item in r.json()["items"]]
+        assert ids == [both, python_only, coffee_only]
+        assert r.json()["next_cursor"] is None
+
+        r = await ac.get("/tweets/search", params={"q": "python coffee", "author": "bob"}, headers=alice)
+        assert [item["id"] for item in r.json()["items"]] == [python_only, coffee_only]
+
+        async with async_sessionmaker(bind=engine)() as db:
+            await db.execute(update(Tweet).where(Tweet.id == coffee_only).values(sentiment_label="positive"))
+            await db.commit()
+        r = await ac.get("/tweets/search", params={"q": "coffee", "sentiment": "positive"}, headers=alice)
+        assert [item["id"] for item in r.json()["items"]] == [coffee_only]
+
+        seen = []
+        params = {"q": "python coffee", "limit": 1}
+        while True:
+            page = (await ac.get("/tweets/search", params=params, headers=alice)).json()
+            seen += [item["id"] for item in page["items"]]
+            if page["next_cursor"] is None:
+                break
+            params = {"q": "python coffee", "limit": 1, **page["next_cursor"]}
+        assert seen == ids
+
+
+@pytest.mark.asyncio
+async def test_search_respects_blocks_and_deletes(client):
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        alice = await auth_headers(ac, "alice")
+        bob = await auth_headers(ac, "bob")
+        mine = await post(ac, alice, "sunny weather")
+        theirs = await post(ac, bob, "sunny day")
+
+        r = await ac.get("/tweets/search", params={"q": "sunny"}, headers=alice)
+        assert {item["id"] for item in r.json()["items"]} == {mine, theirs}
+
+        assert (await ac.post("/users/1/block", headers=bob)).status_code == 204
+        r = await ac.get("/tweets/search", params={"q": "sunny"}, headers=alice)
+        assert [item["id"] for item in r.json()["items"]] == [mine]
+
+        assert (await ac.delete(f"/tweets/{mine}", headers=alice)).status_code == 204
+        r = await ac.get("/tweets/search", params={"q": "sunny"}, headers=alice)
+        assert r.json()["items"] == []
+        r = await ac.get("/tweets/search", params={"q": "the"}, headers=alice)
+        assert r.json()["items"] == []
@@ -14,6 +14,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from collections.abc import AsyncIterator
 
+from conftest import register_and_login
+
 
 @pytest.fixture()
 def client(monkeypatch):
@@ -46,22 +48,6 @@ def client(monkeypatch):
         pass
 
 
-async def register_and_login(ac: AsyncClient, username: str, email: str | None = None) -> str:
-    if email is None:
-        email = f"{username}@example.com"
-    await ac.post(
-        "/auth/register",
-        json={"username": username, "email": email, "password": "password123"},
-    )
-    r = await ac.post(
-        "/auth/token",
-        data={"username": username, "password": "password123"},
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    assert r.status_code == 200, r.text
-    return r.json()["access_token"].strip()
-
-
 @pytest.mark.asyncio
 async def test_create_and_delete_tweet(client) -> None:
     app, engine, _path = client
@@ -0,0 +1,77 @@
+"""User search index: prefix-first ranking, name matching, maintenance on profile updates, rebuild."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models import UserSearchToken
+from app.user_search import rebuild_index
+
+
+async def register(ac: AsyncClient, username: str, name: str) -> str:
+    r = await ac.post(
+        "/auth/register",
+        json={"username": username, "name": name, "email": f"{username}@example.com", "password": "password123"},
+    )
+    assert r.status_code == 201, r.text
+    r = await ac.post(
+        "/auth/token",
+        data={"username": username, "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    return r.json()["access_token"].strip()
+
+
+async def search(ac: AsyncClient, q: str) -> list[str]:
+    r = await ac.get("/users/search", params={"q": q})
+    assert r.status_code == 200, r.text
+    return [u["username"] for u in r.json()]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefixes_first_and_matches_names(client):
+    app, engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await register(ac, "malice", "Mal Ice")
+        await register(ac, "alice_w", "Alice Wonder")
+        await register(ac, "alice", "Alice")
+        await register(ac, "bob", "Robert Alicea")
+        await register(ac, "carol", "Carol")
+
+        assert await search(ac, "alice") == ["alice", "alice_w", "bob", "malice"]
+        assert await search(ac, "al") == ["alice", "alice_w", "bob"]
+        assert await search(ac, "wonder") == ["alice_w"]
+        assert await search(ac, "rob ali") == ["bob"]
+        assert await search(ac, "lic") == ["bob", "alice", "malice", "alice_w"]
+        assert await search(ac, "zzz") == []
+        assert await search(ac, "%") == []
+
+        token = await register(ac, "dave", "Dave")
+        r = await ac.put("/users/me", json={"name": "Wonder Woman"}, headers={"Authorization": f"Bearer {token}"})
+        assert r.status_code == 200
+        assert await search(ac, "wonder") == ["dave", "alice_w"]
+        assert await search(ac, "dave") == ["dave"]
+
+    sm = async_sessionmaker(bind=engine)
+    async with sm() as db:
+        before = (await db.execute(select(func.count()).select_from(UserSearchToken))).scalar_one()
+        await db.execute(delete(UserSearchToken))
+        await db.commit()
+        assert await rebuild_index(db, batch_size=2) == 6
+        after = (await db.execute(select(func.count()).select_from(UserSearchToken))).scalar_one()
+    assert after == before
+
+
+@pytest.mark.asyncio
+async def test_exact_and_prefix_matches_survive_the_candidate_cap(client, monkeypatch):
+    monkeypatch.setenv("USER_SEARCH_CANDIDATES", "3")
+    app, _engine, _path = client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for i in range(5):
+            await register(ac, f"xann{i}", "Joanne")
+        await register(ac, "Annie", "Annie")
+        await register(ac, "ann", "Ann")
+
+        found = await search(ac, "ann")
+        assert found[:2] == ["ann", "Annie"]
+        assert len(found) == 5
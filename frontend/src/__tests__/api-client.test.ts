@@ -20,6 +20,7 @@ import {
   previewSentiment,
   retweetTweet,
   unretweetTweet,
+  LAST_WRITE_HEADER,
   type FeedResponse,
   type Tweet,
   type ProfileResponse,
@@ -295,4 +296,18 @@ describe("api client helpers", () => {
     expect(String(url)).toMatch(/\/users\/1\/block$/);
     expect((options as RequestInit).method).toBe("DELETE");
   });
+
+  it("echoes the last write stamp so later reads see the write", async () => {
+    mockFetchOnce({}, true, {
+      headers: { "Content-Type": "application/json", [LAST_WRITE_HEADER]: "1700000000000" }
+    });
+    await likeTweet(1, "token");
+    mockFetchOnce({ items: [], next_cursor: null });
+    await fetchFeed("token");
+    const [, options] = (global.fetch as vi.Mock).mock.calls[0];
+    expect((options as RequestInit).headers).toEqual({
+      Authorization: "Bearer token",
+      [LAST_WRITE_HEADER]: "1700000000000"
+    });
+  });
 });
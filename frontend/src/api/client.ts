@@ -61,12 +61,30 @@ function withBase(path: string): string {
   return `${API_BASE_URL.replace(/\/+$/, "")}${path}`;
 }
 
+// Read-your-writes with database replicas: the API stamps each successful write with this
+// header, and sending the latest stamp back routes our reads to the primary for a few seconds.
+export const LAST_WRITE_HEADER = "X-Last-Write";
+let lastWrite: string | null = null;
+
+async function apiFetch(
+  path: string,
+  init: Omit<RequestInit, "headers"> & { headers?: Record<string, string> } = {}
+): Promise<Response> {
+  const headers = lastWrite ? { ...init.headers, [LAST_WRITE_HEADER]: lastWrite } : init.headers;
+  const resp = await fetch(withBase(path), { ...init, headers });
+  const stamp = resp.headers.get(LAST_WRITE_HEADER);
+  if (stamp) {
+    lastWrite = stamp;
+  }
+  return resp;
+}
+
 export async function loginRequest(username: string, password: string): Promise<TokenResponse> {
   const body = new URLSearchParams();
   body.set("username", username);
   body.set("password", password);
 
-  const resp = await fetch(withBase("/auth/token"), {
+  const resp = await apiFetch("/auth/token", {
     method: "POST",
     headers: {
       "Content-Type": "application/x-www-form-urlencoded"
@@ -87,7 +105,7 @@ export async function registerRequest(params: {
   email: string;
   password: string;
 }): Promise<void> {
-  const resp = await fetch(withBase("/auth/register"), {
+  const resp = await apiFetch("/auth/register", {
     method: "POST",
     headers: {
       "Content-Type": "application/json"
@@ -102,7 +120,7 @@ export async function registerRequest(params: {
 }
 
 export async function fetchFeed(token: string): Promise<FeedResponse> {
-  const resp = await fetch(withBase("/feed"), {
+  const resp = await apiFetch("/feed", {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -116,7 +134,7 @@ export async function fetchFeed(token: string): Promise<FeedResponse> {
 }
 
 export async function createTweet(text: string, token: string): Promise<Tweet> {
-  const resp = await fetch(withBase("/tweets"), {
+  const resp = await apiFetch("/tweets", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -132,7 +150,7 @@ export async function createTweet(text: string, token: string): Promise<Tweet> {
 }
 
 export async function deleteTweet(tweetId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}`), {
+  const resp = await apiFetch(`/tweets/${tweetId}`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`
@@ -148,7 +166,7 @@ export async function fetchProfile(
   username: string,
   token: string | null
 ): Promise<ProfileResponse> {
-  const resp = await fetch(withBase(`/users/${encodeURIComponent(username)}`), {
+  const resp = await apiFetch(`/users/${encodeURIComponent(username)}`, {
     headers: token
       ? {
           Authorization: `Bearer ${token}`
@@ -162,7 +180,7 @@ export async function fetchProfile(
 }
 
 export async function followUser(userId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/users/${userId}/follow`), {
+  const resp = await apiFetch(`/users/${userId}/follow`, {
     method: "POST",
     headers: {
       Authorization: `Bearer ${token}`
@@ -175,7 +193,7 @@ export async function followUser(userId: number, token: string): Promise<void> {
 }
 
 export async function unfollowUser(userId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/users/${userId}/follow`), {
+  const resp = await apiFetch(`/users/${userId}/follow`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`
@@ -201,7 +219,7 @@ export async function updateMyProfile(
   params: { bio?: string | null; name?: string | null; username?: string | null },
   token: string
 ): Promise<CurrentUser> {
-  const resp = await fetch(withBase("/users/me"), {
+  const resp = await apiFetch("/users/me", {
     method: "PUT",
     headers: {
       "Content-Type": "application/json",
@@ -217,7 +235,7 @@ export async function updateMyProfile(
 }
 
 export async function blockUser(userId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/users/${userId}/block`), {
+  const resp = await apiFetch(`/users/${userId}/block`, {
     method: "POST",
     headers: {
       Authorization: `Bearer ${token}`
@@ -230,7 +248,7 @@ export async function blockUser(userId: number, token: string): Promise<void> {
 }
 
 export async function unblockUser(userId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/users/${userId}/block`), {
+  const resp = await apiFetch(`/users/${userId}/block`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`
@@ -245,7 +263,7 @@ export async function unblockUser(userId: number, token: string): Promise<void>
 export async function searchUsers(query: string): Promise<UserMinimal[]> {
   const params = new URLSearchParams();
   params.set("q", query);
-  const resp = await fetch(withBase(`/users/search?${params.toString()}`));
+  const resp = await apiFetch(`/users/search?${params.toString()}`);
   if (!resp.ok) {
     const detail = await resp.text();
     throw new Error(detail || "Failed to search users");
@@ -254,7 +272,7 @@ export async function searchUsers(query: string): Promise<UserMinimal[]> {
 }
 
 export async function likeTweet(tweetId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/like`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/like`, {
     method: "POST",
     headers: {
       Authorization: `Bearer ${token}`
@@ -267,7 +285,7 @@ export async function likeTweet(tweetId: number, token: string): Promise<void> {
 }
 
 export async function unlikeTweet(tweetId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/like`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/like`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`
@@ -280,7 +298,7 @@ export async function unlikeTweet(tweetId: number, token: string): Promise<void>
 }
 
 export async function unretweetTweet(tweetId: number, token: string): Promise<void> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/retweet`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/retweet`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`
@@ -293,7 +311,7 @@ export async function unretweetTweet(tweetId: number, token: string): Promise<vo
 }
 
 export async function listComments(tweetId: number, token: string): Promise<Comment[]> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/comments`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/comments`, {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -310,7 +328,7 @@ export async function createComment(
   contents: string,
   token: string
 ): Promise<Comment> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/comments`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/comments`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -326,7 +344,7 @@ export async function createComment(
 }
 
 export async function fetchTweet(tweetId: number, token: string): Promise<Tweet> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}`), {
+  const resp = await apiFetch(`/tweets/${tweetId}`, {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -342,7 +360,7 @@ export async function previewSentiment(
   text: string,
   token: string
 ): Promise<SentimentPreviewResponse> {
-  const resp = await fetch(withBase("/tweets/sentiment-preview"), {
+  const resp = await apiFetch("/tweets/sentiment-preview", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -358,7 +376,7 @@ export async function previewSentiment(
 }
 
 export async function retweetTweet(tweetId: number, token: string): Promise<Tweet> {
-  const resp = await fetch(withBase(`/tweets/${tweetId}/retweet`), {
+  const resp = await apiFetch(`/tweets/${tweetId}/retweet`, {
     method: "POST",
     headers: {
       Authorization: `Bearer ${token}`